@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark reports produced by run_benchmarks.py:
+
+    python benchmarks/compare.py before.json after.json
+
+Prints wall time, CPU time and peak RSS per case with the after/before ratio.
+"""
+import sys
+import json
+
+METRICS = ('wall_seconds', 'cpu_seconds', 'peak_rss_mb')
+
+def load_cases(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {(case['processor'], case.get('variant', 'default'), case['input']): case
+            for case in report['cases']}
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python compare.py <before.json> <after.json>", file=sys.stderr)
+        sys.exit(1)
+
+    before = load_cases(sys.argv[1])
+    after = load_cases(sys.argv[2])
+
+    print(f"{'case':<48}" + ''.join(f"{metric:>28}" for metric in METRICS))
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        if 'skipped' in old or 'skipped' in new:
+            continue
+        row = f"{'/'.join(key):<48}"
+        for metric in METRICS:
+            if old.get(metric) and new.get(metric) is not None:
+                row += f"{old[metric]:>10.2f} -> {new[metric]:>7.2f} ({new[metric] / old[metric]:.2f}x)"
+            else:
+                row += f"{'n/a':>28}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
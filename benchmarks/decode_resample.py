@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Timings for the audio loading front-end.
+
+Writes a synthetic mix (see server/services/synthetic.py) as WAV and, if this
+libsndfile build can encode it, MP3 at 44.1kHz and 48kHz, then times librosa.load
+against audio_io.load_audio with each resampling choice at the processor
+rates (16kHz, 22.05kHz) and at the native rate, printing JSON:
+
+    python benchmarks/decode_resample.py --seconds 60
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import soundfile as sf
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'server', 'services'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from synthetic import make_signal
+from audio_io import load_audio
+
+NATIVE_RATES = (44100, 48000)
+TARGET_RATES = (16000, 22050)
+QUALITIES = ('auto', 'polyphase', 'soxr_hq', 'soxr_mq')
+
+def best_of(function, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        y, sr = function()
+        best = min(best, time.perf_counter() - start)
+    return best, y.shape[-1] / sr
+
+def write_inputs(directory, seconds):
+    """
+    (format, native rate, path) for every input this build can write
+    """
+    formats = ['WAV'] + (['MP3'] if 'MP3' in sf.available_formats() else [])
+    inputs = []
+    for native_sr in NATIVE_RATES:
+        signal = make_signal('mix', seconds, sr=native_sr)
+        for file_format in formats:
+            path = os.path.join(directory, f"mix_{native_sr}.{file_format.lower()}")
+            subtype = 'PCM_16' if file_format == 'WAV' else None
+            sf.write(path, signal, native_sr, format=file_format, subtype=subtype)
+            inputs.append((file_format, native_sr, path))
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode + resample: librosa.load vs audio_io.load_audio")
+    parser.add_argument('--seconds', type=float, default=60, help="Input duration")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    import librosa
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format, native_sr, path in write_inputs(directory, args.seconds):
+            cases = {'audio_io native': lambda: load_audio(path, sr=None)}
+            for target_sr in TARGET_RATES:
+                cases[f'librosa.load {target_sr}'] = (
+                    lambda target_sr=target_sr: librosa.load(path, sr=target_sr, mono=True))
+                for quality in QUALITIES:
+                    cases[f'audio_io {quality} {target_sr}'] = (
+                        lambda target_sr=target_sr, quality=quality:
+                        load_audio(path, sr=target_sr, quality=quality))
+
+            for case, function in cases.items():
+                seconds, duration = best_of(function, args.repeats)
+                results.append({
+                    'format': file_format,
+                    'native_sr': native_sr,
+                    'case': case,
+                    'seconds': round(seconds, 4),
+                    'realtime_factor': round(duration / seconds, 1),
+                })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Demucs inference backend benchmark.
+
+Separates one fixed test file with every backend of demucs_backends.py, each
+in a fresh interpreter, and prints a JSON report with model load time (first
+run converts and caches the model, second run loads the cached artifact),
+inference time, peak RSS and how far each backend's sources are from the
+float32 torch baseline (max absolute difference and SDR in dB, higher is
+closer):
+
+    python benchmarks/demucs_backends.py --model mdx_extra_q --threads 4 --output demucs_backends.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import importlib.util
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(BENCHMARKS_DIR, '..', 'server', 'services')
+sys.path.insert(0, SERVICES_DIR)
+
+from subprocess_case import report_result, run_in_fresh_interpreter
+
+def run_case(backend, model_name, input_path, sources_path, threads):
+    """
+    Child side: load the model for one backend, separate the input once and print the measurements
+    """
+    import numpy as np
+    import demucs_engine as engine
+    from demucs_backends import resolve_backend, set_num_threads
+
+    resolved = resolve_backend(backend)
+    start = time.perf_counter()
+    model = engine.get_model(model_name, resolved)
+    load_seconds = time.perf_counter() - start
+    load_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    wav = engine.load_audio(input_path, model)
+    set_num_threads(threads)
+    start = time.perf_counter()
+    sources = engine.separate_tensor(model, wav)
+    inference_seconds = time.perf_counter() - start
+    np.save(sources_path, sources.numpy())
+
+    result = {
+        'backend': resolved,
+        'sources': list(model.sources),
+        'load_seconds': round(load_seconds, 3),
+        'inference_seconds': round(inference_seconds, 3),
+        'load_rss_mb': round(load_rss_mb, 1),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    report_result(result)
+
+def measure(backend, model_name, input_path, sources_path, threads, cache_dir, timeout):
+    """
+    Parent side: run a case in a fresh interpreter so load time and peak RSS are isolated
+    """
+    env = dict(os.environ, DEMUCS_MODEL_CACHE_DIR=cache_dir)
+    return run_in_fresh_interpreter(__file__, [backend, model_name, input_path, sources_path, threads],
+                                    timeout, env=env)
+
+def difference(reference, estimate, source_names):
+    """
+    Max absolute difference and per-source SDR of estimate against reference
+    """
+    import numpy as np
+
+    reference = reference.astype(np.float64)
+    estimate = estimate[..., :reference.shape[-1]].astype(np.float64)
+    sdr = {}
+    for index, name in enumerate(source_names):
+        error = np.sum((reference[index] - estimate[index]) ** 2)
+        sdr[name] = round(float(10 * np.log10(np.sum(reference[index] ** 2) / (error + 1e-12) + 1e-12)), 2)
+    return {'max_abs_diff': float(np.max(np.abs(reference - estimate))), 'sdr_vs_torch_db': sdr}
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == '--run-case':
+        backend, model_name, input_path, sources_path, threads = sys.argv[2:7]
+        run_case(backend, model_name, input_path, sources_path, int(threads))
+        return
+
+    from demucs_backends import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Demucs inference backend benchmark")
+    parser.add_argument('--input', help="Audio file to separate (default: generated 30s test mix)")
+    parser.add_argument('--model', default='mdx_extra_q')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help="Intra-op threads")
+    parser.add_argument('--timeout', type=float, default=1800, help="Per-case timeout in seconds")
+    parser.add_argument('--output', help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('demucs') is None:
+        print(json.dumps({'skipped': 'demucs is not installed'}))
+        return
+
+    import numpy as np
+
+    work_dir = tempfile.mkdtemp(prefix='demucs-backends-')
+    try:
+        input_path = args.input
+        if not input_path:
+            from synthetic import write_signal
+            input_path = os.path.join(work_dir, 'input.wav')
+            write_signal(input_path, 'mix', 30)
+
+        # The torch run is the reference every other backend is compared with
+        backends = ['torch'] + [backend for backend in args.backends if backend != 'torch']
+        cache_dir = os.path.join(work_dir, 'models')
+        reference = None
+        results = []
+        for backend in backends:
+            sources_path = os.path.join(work_dir, f"{backend}.npy")
+            cold = measure(backend, args.model, input_path, sources_path, args.threads, cache_dir, args.timeout)
+            result = measure(backend, args.model, input_path, sources_path, args.threads, cache_dir, args.timeout)
+            if 'error' in cold or 'error' in result:
+                result = {'backend': backend, 'error': cold.get('error') or result.get('error')}
+            else:
+                result['requested'] = backend
+                result['cold_load_seconds'] = cold['load_seconds']
+                sources = np.load(sources_path)
+                if backend == 'torch':
+                    reference = sources
+                if reference is not None:
+                    result.update(difference(reference, sources, result.pop('sources')))
+            results.append(result)
+            print(f"{backend}: {result.get('inference_seconds', result.get('error'))}", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results[0].get('inference_seconds')
+    for result in results:
+        if baseline and 'inference_seconds' in result:
+            result['speedup'] = round(baseline / result['inference_seconds'], 2)
+
+    report = {
+        'model': args.model,
+        'input': args.input or 'synthetic 30s mix',
+        'threads': args.threads,
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
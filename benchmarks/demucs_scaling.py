@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Demucs CPU scaling benchmark.
+
+Separates one fixed test file with 1..N cores, either as N segment workers
+with one thread each or as one worker with N intra-op threads, and prints a
+JSON report with wall time and speedup over the single-core run:
+
+    python benchmarks/demucs_scaling.py --cores 1 2 4 8 --output demucs_scaling.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'services'))
+
+def run_case(engine, model_name, wav, workers, threads):
+    model = engine.get_model(model_name)
+    if workers > 1:
+        # First call spawns the pool and loads the model in every worker
+        engine.separate_tensor_parallel(model_name, wav[:, :model.samplerate * 5], workers, threads)
+        start = time.perf_counter()
+        engine.separate_tensor_parallel(model_name, wav, workers, threads)
+    else:
+        import torch
+        torch.set_num_threads(threads)
+        start = time.perf_counter()
+        engine.separate_tensor(model, wav)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Demucs segment-parallel scaling benchmark")
+    parser.add_argument('--input', help="Audio file to separate (default: generated 60s test mix)")
+    parser.add_argument('--model', default='htdemucs')
+    parser.add_argument('--cores', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--output', help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('demucs') is None:
+        print(json.dumps({'skipped': 'demucs is not installed'}))
+        return
+
+    import demucs_engine as engine
+
+    input_path = args.input
+    if not input_path:
+        from synthetic import write_signal
+        input_path = os.path.join(tempfile.gettempdir(), 'demucs_scaling_input.wav')
+        write_signal(input_path, 'mix', 60)
+
+    model = engine.get_model(args.model)
+    wav = engine.load_audio(input_path, model)
+
+    results = []
+    for cores in args.cores:
+        for mode, workers, threads in (('segments', cores, 1), ('threads', 1, cores)):
+            if cores == 1 and mode == 'threads':
+                continue
+            seconds = run_case(engine, args.model, wav, workers, threads)
+            results.append({'cores': cores, 'mode': mode, 'workers': workers,
+                            'threads': threads, 'wall_seconds': round(seconds, 3)})
+            print(f"{cores} cores ({mode}): {seconds:.1f}s", file=sys.stderr)
+
+    baseline = results[0]['wall_seconds']
+    for result in results:
+        result['speedup'] = round(baseline / result['wall_seconds'], 2)
+
+    report = {
+        'model': args.model,
+        'input': input_path,
+        'audio_seconds': round(wav.shape[-1] / model.samplerate, 2),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the mask and reconstruction stage of the fast processor.
+
+Compares the original pipeline (four full-size float64 masks, then
+magnitude * mask * phase per stem) against mask_engine.MaskEngine (per-bin
+float32 weights, one reused complex64 stem buffer) on a random spectrum of a
+track of the given length. The inverse STFT is left out: both pipelines hand
+it the same spectra. Checks the stem spectra match and prints time and peak
+traced memory as JSON:
+
+    python benchmarks/mask_pipeline.py --seconds 300
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'services'))
+
+from mask_engine import MaskEngine
+
+SR = 16000
+N_FFT = 1024
+HOP = 256
+
+# stem -> (floor, (low_hz, high_hz), band value), as in fast_stems()
+BANDS = {
+    'vocals': (0.1, (80, 1000), 1.0),
+    'bass': (0.1, (20, 200), 1.0),
+    'drums': (0.2, (60, 8000), 0.8),
+    'other': (0.3, (500, 12000), 0.9),
+}
+
+class Spectrum:
+    """
+    The part of SpectralAnalysis that MaskEngine uses, without running an STFT
+    """
+    def __init__(self, stft, sr, n_fft):
+        self.stft = stft
+        self.magnitude = np.abs(stft)
+        self.freqs = np.linspace(0, sr / 2, 1 + n_fft // 2)
+        self.phase = np.ones_like(stft)
+        np.divide(stft, self.magnitude, out=self.phase, where=self.magnitude != 0)
+
+    def band(self, low_hz, high_hz):
+        return (self.freqs >= low_hz) & (self.freqs <= high_hz)
+
+def original_pipeline(analysis, drums_gain, consume):
+    magnitude, phase, freqs = analysis.magnitude, analysis.phase, analysis.freqs
+    for name, (floor, (low_hz, high_hz), value) in BANDS.items():
+        mask = np.ones_like(magnitude, dtype=np.float64)
+        bins = np.where((freqs >= low_hz) & (freqs <= high_hz))[0]
+        mask[:] = floor
+        mask[bins, :] = value
+        if name == 'drums':
+            mask[bins, :] *= drums_gain
+        consume(name, magnitude * mask * phase)
+
+def engine_pipeline(analysis, drums_gain, consume):
+    engine = MaskEngine(analysis)
+    for name, (floor, band, value) in BANDS.items():
+        weights = engine.weights(floor, [(band, value)])
+        if name == 'drums':
+            spectrum = engine.spectrum(weights, frame_gain=drums_gain, gain_rows=engine.band_rows(*band))
+        else:
+            spectrum = engine.spectrum(weights)
+        consume(name, spectrum)
+
+def measure(pipeline, analysis, drums_gain, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pipeline(analysis, drums_gain, lambda name, spectrum: None)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    pipeline(analysis, drums_gain, lambda name, spectrum: None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Mask pipeline: full float64 masks vs MaskEngine")
+    parser.add_argument('--seconds', type=float, default=300, help="Audio duration the spectrum covers")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1234)
+    n_frames = int(args.seconds * SR / HOP) + 1
+    shape = (1 + N_FFT // 2, n_frames)
+    stft = (rng.standard_normal(shape, dtype=np.float32)
+            + 1j * rng.standard_normal(shape, dtype=np.float32)).astype(np.complex64)
+    analysis = Spectrum(stft, SR, N_FFT)
+    drums_gain = np.where(rng.random(n_frames) < 0.1, 1.5, 1.0)
+
+    expected = {}
+    original_pipeline(analysis, drums_gain, lambda name, spectrum: expected.__setitem__(name, spectrum))
+    max_diff = 0.0
+    def compare(name, spectrum):
+        nonlocal max_diff
+        max_diff = max(max_diff, float(np.max(np.abs(expected[name] - spectrum))))
+    engine_pipeline(analysis, drums_gain, compare)
+    expected.clear()
+
+    original_seconds, original_peak = measure(original_pipeline, analysis, drums_gain, args.repeats)
+    engine_seconds, engine_peak = measure(engine_pipeline, analysis, drums_gain, args.repeats)
+
+    result = {
+        'shape': list(shape),
+        'original_seconds': round(original_seconds, 4),
+        'engine_seconds': round(engine_seconds, 4),
+        'speedup': round(original_seconds / engine_seconds, 1),
+        'original_peak_mb': round(original_peak / 2**20, 1),
+        'engine_peak_mb': round(engine_peak / 2**20, 1),
+        'max_abs_diff': max_diff,
+        'match': max_diff <= 1e-4 * float(np.max(analysis.magnitude)),
+    }
+    print(json.dumps(result, indent=2))
+    if not result['match']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Model store startup benchmark.
+
+Starts N worker interpreters that each load one Demucs model, first with the
+download/deserialize path of demucs.pretrained and then from the offline model
+store (memory-mapped weights), and prints a JSON report with each worker's
+model load time and memory while all of them hold the model: RSS, USS (pages
+only that worker has) and PSS (shared pages split between the workers). With
+the store, the weights are shared page cache, so USS and PSS per worker drop
+while RSS still counts the mapped file:
+
+    python benchmarks/model_store.py --model htdemucs --workers 4 --output model_store.json
+
+The store is populated in a temporary directory unless --store points at an existing one.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(BENCHMARKS_DIR, '..', 'server', 'services')
+sys.path.insert(0, SERVICES_DIR)
+
+from subprocess_case import report_result, start_in_fresh_interpreter, wait_for_result
+
+def run_worker(model_name):
+    """
+    Child side: load the model like a separation worker does, report, then hold it until stdin closes
+    """
+    start = time.perf_counter()
+    import demucs_engine as engine
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.get_model(model_name, 'torch')
+    load_seconds = time.perf_counter() - start
+
+    report_result({'import_seconds': round(import_seconds, 3), 'load_seconds': round(load_seconds, 3)})
+    sys.stdin.read()
+
+def measure(model_name, workers, store, timeout):
+    """
+    Parent side: start the workers together and sample their memory once all have loaded the model
+    """
+    import psutil
+
+    env = dict(os.environ, SEPARATION_MODEL_STORE=store, DEMUCS_BACKEND='torch')
+    processes = [start_in_fresh_interpreter(__file__, [model_name], env=env) for _ in range(workers)]
+    results = []
+    try:
+        deadline = time.time() + timeout
+        for process in processes:
+            results.append(wait_for_result(process, deadline))
+
+        for process, result in zip(processes, results):
+            if 'error' in result:
+                continue
+            memory = psutil.Process(process.pid).memory_full_info()
+            result.update({
+                'rss_mb': round(memory.rss / 2**20, 1),
+                'uss_mb': round(memory.uss / 2**20, 1),
+                'pss_mb': round(memory.pss / 2**20, 1),
+            })
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    return results
+
+def summary(results):
+    loaded = [result for result in results if 'error' not in result]
+    if not loaded:
+        return {'error': results[0]['error'] if results else 'no workers'}
+    return {
+        'mean_load_seconds': round(sum(result['load_seconds'] for result in loaded) / len(loaded), 3),
+        'total_pss_mb': round(sum(result['pss_mb'] for result in loaded), 1),
+        'mean_uss_mb': round(sum(result['uss_mb'] for result in loaded) / len(loaded), 1),
+        'mean_rss_mb': round(sum(result['rss_mb'] for result in loaded) / len(loaded), 1),
+        'workers': results,
+    }
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == '--run-case':
+        run_worker(sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description="Model load time and per-worker memory with and without the model store")
+    parser.add_argument('--model', default='htdemucs')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--store', help="Existing model store to use (default: populate a temporary one)")
+    parser.add_argument('--timeout', type=float, default=600, help="Per-run timeout in seconds")
+    parser.add_argument('--output', help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('demucs') is None:
+        print(json.dumps({'skipped': 'demucs is not installed'}))
+        return
+
+    import model_store
+
+    work_dir = tempfile.mkdtemp(prefix='model-store-bench-')
+    try:
+        store = args.store
+        if not store:
+            store = os.path.join(work_dir, 'store')
+            if model_store.install([f"demucs:{args.model}"], store):
+                print(json.dumps({'error': f"could not store {args.model}"}))
+                return
+
+        # An empty store falls back to demucs.pretrained (torch hub cache, deserialized per process)
+        without_store = summary(measure(args.model, args.workers, os.path.join(work_dir, 'empty'), args.timeout))
+        print(f"without store: {without_store.get('mean_load_seconds', without_store.get('error'))}", file=sys.stderr)
+        with_store = summary(measure(args.model, args.workers, store, args.timeout))
+        print(f"with store: {with_store.get('mean_load_seconds', with_store.get('error'))}", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'model': args.model,
+        'workers': args.workers,
+        'cpu_count': os.cpu_count(),
+        'without_store': without_store,
+        'with_store': with_store,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
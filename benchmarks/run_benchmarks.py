@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the separation processors.
+
+Generates deterministic synthetic mixes (see server/services/synthetic.py) of
+several durations, optionally adds real clips, runs every processor on every
+input in a fresh interpreter and records wall time, CPU time, peak RSS and
+output duration in a JSON report that can be diffed between commits:
+
+    python benchmarks/run_benchmarks.py --durations 10 30 60 --output bench.json
+    python benchmarks/compare.py old.json bench.json
+
+--scratch adds a variant of the advanced processor with its spectrograms in
+memmap files (scratch_dir), to compare peak RSS with and without them.
+
+Demucs and Spleeter cases are skipped automatically when not installed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import importlib.util
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(BENCHMARKS_DIR, '..', 'server', 'services')
+sys.path.insert(0, SERVICES_DIR)
+
+from subprocess_case import report_result, run_in_fresh_interpreter
+
+# Processor name -> (script, entry point, required module or None)
+PROCESSORS = {
+    'simple': ('simple-processor.py', 'create_simple_separation', None),
+    'fast': ('fast-processor.py', 'fast_separation', None),
+    'optimized': ('optimized-processor.py', 'optimized_separation', None),
+    'wiener': ('wiener-processor.py', 'wiener_separation', None),
+    'advanced': ('advanced-processor.py', 'advanced_separation', None),
+    'demo': ('demo-processor.py', 'create_demo_separation', None),
+    'demucs': ('demucs-processor.py', 'lightweight_demucs', 'demucs'),
+    'spleeter': ('audio-processor.py', 'separate_audio', 'spleeter'),
+}
+
+# Processors that accept streaming=True (benchmarked as an extra variant with --stream)
+STREAMING_PROCESSORS = ('simple', 'fast', 'optimized', 'advanced', 'wiener')
+
+# Processors that accept scratch_dir (benchmarked as an extra variant with --scratch)
+SCRATCH_PROCESSORS = ('advanced',)
+
+def run_case(processor, input_path, output_dir, kwargs):
+    """
+    Child side: run one processor once in this interpreter and print the measurements
+    """
+    import soundfile as sf
+    from processor_modules import load_processor_module
+
+    script, function_name, _ = PROCESSORS[processor]
+    start = time.perf_counter()
+    separation_function = getattr(load_processor_module(script), function_name)
+    import_seconds = time.perf_counter() - start
+    baseline_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    success = separation_function(input_path, output_dir, **kwargs)
+    wall_seconds = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    output_seconds = None
+    for stem in ('vocals', 'drums', 'bass', 'other'):
+        stem_path = os.path.join(output_dir, f"{stem}.wav")
+        if os.path.exists(stem_path):
+            output_seconds = sf.info(stem_path).duration
+            break
+
+    result = {
+        'success': bool(success),
+        'import_seconds': round(import_seconds, 3),
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round((usage_after.ru_utime - usage_before.ru_utime)
+                             + (usage_after.ru_stime - usage_before.ru_stime), 3),
+        'baseline_rss_mb': round(baseline_rss_mb, 1),
+        'peak_rss_mb': round(usage_after.ru_maxrss / 1024, 1),
+        'output_seconds': round(output_seconds, 3) if output_seconds is not None else None,
+    }
+    report_result(result)
+
+def measure(processor, input_path, work_dir, kwargs, timeout, verbose):
+    """
+    Parent side: run a case in a fresh interpreter so import cost and peak RSS are isolated
+    """
+    output_dir = tempfile.mkdtemp(prefix=f"{processor}-", dir=work_dir)
+    try:
+        result = run_in_fresh_interpreter(__file__, [processor, input_path, output_dir, json.dumps(kwargs)],
+                                          timeout, verbose=verbose)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    if 'error' in result:
+        return {'success': False, 'error': result['error']}
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == '--run-case':
+        processor, input_path, output_dir, kwargs = sys.argv[2:6]
+        run_case(processor, input_path, output_dir, json.loads(kwargs))
+        return
+
+    import soundfile as sf
+    from synthetic import KINDS, write_signal
+
+    parser = argparse.ArgumentParser(description="Benchmark every separation processor")
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30, 60],
+                        help="Synthetic input durations in seconds")
+    parser.add_argument('--kinds', nargs='+', default=['mix'], choices=KINDS,
+                        help="Synthetic signal kinds")
+    parser.add_argument('--clips', nargs='*', default=[], help="Real audio files to include")
+    parser.add_argument('--processors', nargs='+', default=list(PROCESSORS), choices=list(PROCESSORS))
+    parser.add_argument('--stream', action='store_true',
+                        help="Also benchmark the streaming variant of processors that support it")
+    parser.add_argument('--scratch', action='store_true',
+                        help="Also benchmark the memmap scratch variant of processors that support it")
+    parser.add_argument('--timeout', type=float, default=1800, help="Per-case timeout in seconds")
+    parser.add_argument('--output', help="Write the JSON report here as well as to stdout")
+    parser.add_argument('--verbose', action='store_true', help="Show processor logs")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='separation-bench-')
+    try:
+        inputs = []
+        for kind in args.kinds:
+            for seconds in args.durations:
+                path = os.path.join(work_dir, f"{kind}_{seconds:g}s.wav")
+                write_signal(path, kind, seconds)
+                inputs.append({'input': os.path.basename(path), 'path': path, 'kind': kind})
+        for clip in args.clips:
+            inputs.append({'input': os.path.basename(clip), 'path': os.path.abspath(clip), 'kind': 'clip'})
+
+        cases = []
+        for item in inputs:
+            input_seconds = round(sf.info(item['path']).duration, 3)
+            for processor in args.processors:
+                variants = [('default', {})]
+                if args.stream and processor in STREAMING_PROCESSORS:
+                    variants.append(('stream', {'streaming': True}))
+                if args.scratch and processor in SCRATCH_PROCESSORS:
+                    variants.append(('scratch', {'scratch_dir': os.path.join(work_dir, 'scratch')}))
+
+                for variant, kwargs in variants:
+                    case = {
+                        'processor': processor,
+                        'variant': variant,
+                        'input': item['input'],
+                        'kind': item['kind'],
+                        'input_seconds': input_seconds,
+                    }
+                    required = PROCESSORS[processor][2]
+                    if required and importlib.util.find_spec(required) is None:
+                        case['skipped'] = f"{required} is not installed"
+                    else:
+                        case.update(measure(processor, item['path'], work_dir, kwargs,
+                                            args.timeout, args.verbose))
+                    cases.append(case)
+                    print(f"{processor}/{variant} on {item['input']}: "
+                          f"{case.get('skipped') or case.get('wall_seconds', case.get('error'))}",
+                          file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'cases': cases,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the simple processor's filter bank.
+
+Compares the original seven filtfilt calls (each redesigning its Butterworth
+filter) against the FFT-domain crossover in simple_stems() on synthetic mixes
+of increasing length, so the scaling is visible, and reports the relative
+RMS difference away from the edges. Prints JSON:
+
+    python benchmarks/simple_filter_bank.py --durations 30 120 600
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from scipy.signal import butter, filtfilt
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'server', 'services'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from synthetic import make_signal
+from processor_modules import load_processor_module
+
+SR = 16000
+
+def filtfilt_stems(y, sr):
+    """
+    Reference: the original pipeline, one filtfilt (and butter design) per band
+    """
+    def bandpass(data, low, high, order=3):
+        b, a = butter(order, [low / (0.5 * sr), high / (0.5 * sr)], btype='band')
+        return filtfilt(b, a, data)
+
+    def lowpass(data, cutoff, order=3):
+        b, a = butter(order, cutoff / (0.5 * sr), btype='low')
+        return filtfilt(b, a, data)
+
+    def highpass(data, cutoff, order=3):
+        b, a = butter(order, cutoff / (0.5 * sr), btype='high')
+        return filtfilt(b, a, data)
+
+    vocals = (bandpass(y, 100, 3400) + bandpass(y, 1000, 2000) * 0.4) * 0.85
+    bass = (lowpass(y, 250) + bandpass(y, 40, 100) * 0.6) * 1.4
+    drums = np.tanh(bandpass(highpass(y, 80), 80, 7000) * 2.2) * 0.85 + bandpass(y, 150, 300) * 0.3
+    other = (bandpass(y, 500, 7000) - vocals * 0.15 - bass * 0.1) * 0.75
+    return {'vocals': vocals, 'bass': bass, 'drums': drums, 'other': other}
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Simple filter bank: filtfilt per band vs FFT crossover")
+    parser.add_argument('--durations', type=float, nargs='+', default=[30, 120, 600])
+    args = parser.parse_args()
+
+    simple_stems = load_processor_module('simple-processor.py').simple_stems
+
+    results = []
+    for seconds in args.durations:
+        y = make_signal('mix', seconds, sr=SR).mean(axis=1)
+        filtfilt_seconds, expected = timed(filtfilt_stems, y, SR)
+        crossover_seconds, actual = timed(simple_stems, y, SR)
+
+        # Both use odd-extension padding but not identical edge handling; compare the interior
+        interior = slice(SR, len(y) - SR)
+        errors = {
+            name: float(np.sqrt(np.mean((expected[name][interior] - actual[name][interior]) ** 2))
+                        / (np.sqrt(np.mean(expected[name][interior] ** 2)) + 1e-12))
+            for name in expected
+        }
+        results.append({
+            'seconds_of_audio': seconds,
+            'filtfilt_seconds': round(filtfilt_seconds, 4),
+            'crossover_seconds': round(crossover_seconds, 4),
+            'speedup': round(filtfilt_seconds / crossover_seconds, 1),
+            'relative_rms_error': {name: round(error, 6) for name, error in errors.items()},
+        })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
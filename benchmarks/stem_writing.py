@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Write-phase timings for the stem output.
+
+Builds four stems of the given length (mono at 22.05kHz like the spectral
+processors, and real stereo at 44.1kHz like Demucs) and times the original
+sequential loop (normalize, column_stack, sf.write per stem) against
+audio_io.write_stems() in each output format, printing seconds, the time
+saved and the bytes written as JSON:
+
+    python benchmarks/stem_writing.py --seconds 300
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import soundfile as sf
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'server', 'services'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from synthetic import make_signal
+from audio_io import write_stems, OUTPUT_FORMATS
+
+STEMS = ('vocals', 'bass', 'drums', 'other')
+
+# name -> (sample rate, stereo stems)
+LAYOUTS = {
+    'mono_22050': (22050, False),
+    'stereo_44100': (44100, True),
+}
+
+def make_stems(seconds, sr, stereo):
+    """
+    Four different stems: the synthetic kinds plus the full mix
+    """
+    stems = {}
+    for name, kind in zip(STEMS, ('tones', 'tones', 'clicks', 'mix')):
+        signal = make_signal(kind, seconds, sr=sr).T
+        stems[name] = signal if stereo else signal.mean(axis=0)
+    return stems
+
+def sequential_write(tracks, output_dir, sr):
+    """
+    Reference: the loop the processors used to run, one stem after the other
+    """
+    for track_name, track_data in tracks.items():
+        if np.max(np.abs(track_data)) > 0:
+            track_data = track_data / np.max(np.abs(track_data)) * 0.8
+        if track_data.ndim == 1:
+            stereo_data = np.column_stack([track_data, track_data])
+        else:
+            stereo_data = track_data.T
+        sf.write(os.path.join(output_dir, f"{track_name}.wav"), stereo_data, sr)
+
+def output_bytes(output_dir):
+    return sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+
+def best_of(function, repeats):
+    best = float('inf')
+    written = 0
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            function(output_dir)
+            best = min(best, time.perf_counter() - start)
+            written = output_bytes(output_dir)
+    return best, written
+
+def main():
+    parser = argparse.ArgumentParser(description="Stem writing: sequential loop vs write_stems")
+    parser.add_argument('--seconds', type=float, default=300, help="Stem duration")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for layout, (sr, stereo) in LAYOUTS.items():
+        tracks = make_stems(args.seconds, sr, stereo)
+        baseline, baseline_bytes = best_of(lambda output_dir: sequential_write(tracks, output_dir, sr),
+                                           args.repeats)
+        results.append({'layout': layout, 'case': 'sequential wav', 'seconds': round(baseline, 4),
+                        'saved_seconds': 0.0, 'bytes': baseline_bytes})
+
+        for output_format in OUTPUT_FORMATS:
+            seconds, written = best_of(
+                lambda output_dir: write_stems(tracks, output_dir, sr, headroom=0.8,
+                                               output_format=output_format),
+                args.repeats)
+            results.append({
+                'layout': layout,
+                'case': f'write_stems {output_format}',
+                'seconds': round(seconds, 4),
+                'saved_seconds': round(baseline - seconds, 4),
+                'bytes': written,
+            })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the advanced processor's vocal confidence.
+
+Compares the original full-spectrogram version (formant loop, scaled vocal
+range, 3x5 median over all 1025 bins) against the band-only
+vocal_confidence() kernel and its separable-median approximation on the
+harmonic part of a synthetic mix. Checks that the exact kernel reproduces the
+reference (and that the reference is zero outside the vocal band), reports
+the approximation's relative RMS error and prints the timings as JSON; exits
+with status 1 if the exact kernel does not match:
+
+    python benchmarks/vocal_confidence.py --durations 30 120 600
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from scipy.ndimage import median_filter
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'server', 'services'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from synthetic import make_signal
+from spectral_analysis import SpectralAnalysis
+from processor_modules import load_processor_module
+
+SR = 22050
+
+def reference_confidence(S_harmonic, freqs, vocal_rows):
+    """
+    Reference: the original computation over the full (freq, frames) matrix
+    """
+    vocal_confidence = np.zeros_like(S_harmonic)
+    for formant in [800, 1200, 2600]:
+        formant_idx = np.argmin(np.abs(freqs - formant))
+        vocal_confidence[formant_idx-5:formant_idx+5, :] += S_harmonic[formant_idx-5:formant_idx+5, :]
+    vocal_confidence[vocal_rows, :] += S_harmonic[vocal_rows, :] * 1.5
+    return median_filter(vocal_confidence, size=(3, 5))
+
+def best_of(function, repeats, *args, **kwargs):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Vocal confidence: full median vs band-only kernel")
+    parser.add_argument('--durations', type=float, nargs='+', default=[30, 120, 600])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    advanced = load_processor_module('advanced-processor.py')
+
+    results = []
+    for seconds in args.durations:
+        y = make_signal('mix', seconds, sr=SR).mean(axis=1)
+        analysis = SpectralAnalysis(y, SR, n_fft=2048, hop_length=512, hpss_margin=(1.0, 5.0))
+        S_harmonic = analysis.harmonic
+        freqs = analysis.freqs
+        band = analysis.band(85, 3400)
+        vocal_rows = slice(np.flatnonzero(band)[0], np.flatnonzero(band)[-1] + 1)
+        formant_rows = [slice(idx - 5, idx + 5)
+                        for idx in (np.argmin(np.abs(freqs - formant)) for formant in advanced.FORMANT_FREQS)]
+
+        reference_seconds, expected = best_of(reference_confidence, args.repeats, S_harmonic, freqs, vocal_rows)
+        kernel_seconds, exact = best_of(advanced.vocal_confidence, args.repeats, S_harmonic, formant_rows,
+                                        vocal_rows)
+        separable_seconds, approximate = best_of(advanced.vocal_confidence, args.repeats, S_harmonic,
+                                                 formant_rows, vocal_rows, separable=True)
+
+        outside = np.ones(len(freqs), dtype=bool)
+        outside[vocal_rows] = False
+        target = expected[vocal_rows]
+        results.append({
+            'seconds_of_audio': seconds,
+            'reference_seconds': round(reference_seconds, 4),
+            'kernel_seconds': round(kernel_seconds, 4),
+            'separable_seconds': round(separable_seconds, 4),
+            'kernel_speedup': round(reference_seconds / kernel_seconds, 1),
+            'separable_speedup': round(reference_seconds / separable_seconds, 1),
+            'kernel_matches': bool(np.array_equal(exact, target) and not expected[outside].any()),
+            'separable_relative_rms_error': round(float(np.sqrt(np.mean((approximate - target) ** 2))
+                                                        / (np.sqrt(np.mean(target ** 2)) + 1e-12)), 6),
+        })
+
+    print(json.dumps(results, indent=2))
+    if not all(result['kernel_matches'] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
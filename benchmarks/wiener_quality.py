@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Speed and separation quality of the spectral processors.
+
+Builds a synthetic mix from known sources (the synthetic.py bass line, the
+vocal-like chord and the drum clicks / noise bursts), runs each processor's
+stems function on it in memory and reports wall time and scale-invariant SDR
+per stem (dB, higher is better; scale-invariant because the band-mask
+processors rescale their stems), plus how far the stems' sum is from the mix:
+
+    python benchmarks/wiener_quality.py --seconds 30 --stereo
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'server', 'services'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from synthetic import clicks, noise_bursts
+from processor_modules import load_processor_module
+
+SR = 22050
+
+# name -> (script, stems function)
+PROCESSORS = {
+    'wiener': ('wiener-processor.py', 'wiener_stems'),
+    'advanced': ('advanced-processor.py', 'advanced_stems'),
+    'optimized': ('optimized-processor.py', 'optimized_stems'),
+    'fast': ('fast-processor.py', 'fast_stems'),
+}
+
+def make_sources(seconds, sr, stereo):
+    """
+    Reference stems {vocals, bass, drums} as float32 ([2,] samples); stereo sources
+    are panned differently so the channels carry spatial information
+    """
+    rng = np.random.default_rng(1234)
+    t = np.arange(int(seconds * sr)) / sr
+    vibrato = 1 + 0.01 * np.sin(2 * np.pi * 5 * t)
+    sources = {
+        'vocals': sum(0.15 / k * np.sin(2 * np.pi * 220 * k * vibrato * t) for k in range(1, 6)),
+        'bass': 0.4 * np.sin(2 * np.pi * 55 * t + 0.5 * np.sin(2 * np.pi * 0.5 * t)),
+        'drums': clicks(t, sr) + noise_bursts(t, sr, rng),
+    }
+    if stereo:
+        pans = {'vocals': (0.7, 0.7), 'bass': (0.8, 0.6), 'drums': (0.5, 0.9)}
+        sources = {name: np.stack([signal * pans[name][0], signal * pans[name][1]])
+                   for name, signal in sources.items()}
+    return {name: signal.astype(np.float32) for name, signal in sources.items()}
+
+def si_sdr(reference, estimate):
+    """
+    Scale-invariant SDR in dB over all channels
+    """
+    reference = reference.ravel().astype(np.float64)
+    estimate = estimate.ravel().astype(np.float64)
+    target = np.dot(estimate, reference) / (np.dot(reference, reference) + 1e-12) * reference
+    noise = estimate - target
+    return 10 * np.log10((np.dot(target, target) + 1e-12) / (np.dot(noise, noise) + 1e-12))
+
+def main():
+    parser = argparse.ArgumentParser(description="Spectral processors: speed and SI-SDR on a synthetic mix")
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--stereo', action='store_true', help="Separate a stereo mix")
+    parser.add_argument('--processors', nargs='+', default=list(PROCESSORS), choices=list(PROCESSORS))
+    args = parser.parse_args()
+
+    sources = make_sources(args.seconds, SR, args.stereo)
+    mix = sum(sources.values())
+
+    results = []
+    for processor in args.processors:
+        script, function_name = PROCESSORS[processor]
+        stems_function = getattr(load_processor_module(script), function_name)
+        start = time.perf_counter()
+        tracks = stems_function(mix, SR)
+        seconds = time.perf_counter() - start
+
+        total = sum(np.asarray(track, dtype=np.float64) for track in tracks.values())
+        results.append({
+            'processor': processor,
+            'seconds': round(seconds, 3),
+            'si_sdr_db': {name: round(float(si_sdr(reference, np.asarray(tracks[name])[..., :reference.shape[-1]])), 2)
+                          for name, reference in sources.items()},
+            # Residual energy relative to the mix; about -120 when the stems add back up to it
+            'sum_error_db': round(float(10 * np.log10(np.sum((total - mix) ** 2) / np.sum(mix ** 2) + 1e-12)), 1),
+        })
+
+    print(json.dumps({'seconds_of_audio': args.seconds, 'stereo': args.stereo, 'results': results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -414,8 +414,31 @@ export default function Home() {
                   <p className="text-sm text-gray-500 mt-3">Analyzing audio structure...</p>
                 </div>
 
+                {/* Preview stems: registered as the file's tracks until the full result replaces them */}
+                {audioFile?.tracks && audioFile.tracks.length > 0 && (
+                  <div className="max-w-lg mx-auto mb-8 text-left">
+                    <p className="text-sm text-gray-600 mb-4">
+                      Quick preview of the first 45 seconds while the full-quality separation finishes
+                    </p>
+                    {trackConfigs.map((config) => {
+                      if (!audioFile.tracks?.find(t => t.trackType === config.type)) return null;
+
+                      return (
+                        <div key={config.type} className="mb-4">
+                          <h4 className="text-sm font-semibold text-gray-900 mb-2">{config.title}</h4>
+                          <AudioPlayer
+                            audioFileId={audioFileId!}
+                            trackType={config.type}
+                            config={config}
+                          />
+                        </div>
+                      );
+                    })}
+                  </div>
+                )}
+
                 <ProgressSteps currentStep={audioFile?.status || 'processing'} />
-                
+
                 {/* Reset button for stuck processing */}
                 <div className="mt-8 pt-6 border-t border-gray-200">
                   <Button
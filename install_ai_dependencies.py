@@ -17,7 +17,23 @@ def install_package(package):
         print(f"❌ Error instalando {package}: {e}")
         return False
 
+def populate_model_store(models):
+    """Descarga los modelos al almacén local (server/services/model_store.py)"""
+    store_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server", "services", "model_store.py")
+    try:
+        print(f"Guardando modelos en el almacén local: {', '.join(models) or 'por defecto'}...")
+        subprocess.check_call([sys.executable, store_script, "install"] + models)
+        print("✅ Modelos guardados: los workers los cargarán sin red y mapeados en memoria")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error guardando modelos: {e}")
+        return False
+
 def main():
+    # --models [demucs:htdemucs spleeter:4stems-wq-16kHz ...] también llena el almacén de modelos
+    populate_models = "--models" in sys.argv
+    models = sys.argv[sys.argv.index("--models") + 1:] if populate_models else []
+    
     print("🎵 Configurando dependencias de IA para separación de audio...")
     print("=" * 60)
     
@@ -71,6 +87,11 @@ def main():
         print("❌ Error en la instalación de paquetes core")
         sys.exit(1)
     
+    if populate_models:
+        print("\n📁 Preparando el almacén de modelos offline...")
+        if not ai_success or not populate_model_store(models):
+            print("⚠️  Almacén de modelos incompleto: los modelos se descargarán en el primer uso")
+    
     print("\n🚀 Tu aplicación de separación de audio está lista!")
     print("💡 El sistema seleccionará automáticamente el mejor procesador")
 
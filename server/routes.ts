@@ -5,7 +5,11 @@ import { insertAudioFileSchema, insertSeparatedTrackSchema } from "../shared/sch
 import multer from "multer";
 import path from "path";
 import fs from "fs";
-import { spawn } from "child_process";
+import { separationWorker, type SeparationPreview } from "./separation-worker.js";
+
+// Quick preview stems while the full separation runs (SEPARATION_PROGRESSIVE=0 turns them off)
+const progressive = process.env.SEPARATION_PROGRESSIVE !== "0";
+const trackTypes = ["vocals", "drums", "bass", "other"];
 
 const upload = multer({
   dest: "uploads/",
@@ -111,69 +115,53 @@ export async function registerRoutes(app: Express): Promise<Server> {
             fs.mkdirSync(outputPath, { recursive: true });
           }
 
-          // Run AI-powered audio separation with intelligent processor selection
-          const pythonProcess = spawn("python", [
-            path.join(process.cwd(), "server/services/ai-processor.py"),
-            inputPath,
-            outputPath,
-          ], {
-            stdio: ['pipe', 'pipe', 'pipe'],
-            env: { ...process.env, PYTHONPATH: process.cwd() }
-          });
-
-          // Set timeout for long-running processes (10 minutes)
-          const timeoutId = setTimeout(() => {
-            console.error("Process timeout reached, killing Python process");
-            pythonProcess.kill('SIGTERM');
-          }, 10 * 60 * 1000); // 10 minutes
-
-          // Log Python process output
-          pythonProcess.stdout?.on('data', (data) => {
-            console.log(`Python stdout: ${data}`);
-          });
-
-          pythonProcess.stderr?.on('data', (data) => {
-            console.error(`Python stderr: ${data}`);
-          });
-
-          pythonProcess.on("close", async (code) => {
-            clearTimeout(timeoutId);
-            console.log(`Python process exited with code ${code}`);
-            if (code === 0) {
-              // Process completed successfully, create track records
-              const trackTypes = ["vocals", "drums", "bass", "other"];
+          const registerTracks = async (directory: string, extension: string) => {
+            for (const trackType of trackTypes) {
+              const trackFileName = `${trackType}.${extension}`;
+              const trackFilePath = path.join(directory, trackFileName);
               
-              for (const trackType of trackTypes) {
-                const trackFileName = `${trackType}.wav`;
-                const trackFilePath = path.join(outputPath, trackFileName);
-                
-                if (fs.existsSync(trackFilePath)) {
-                  await storage.createSeparatedTrack({
-                    audioFileId,
-                    trackType,
-                    fileName: trackFileName,
-                    filePath: trackFilePath,
-                  });
-                  console.log(`Created track record for ${trackType}`);
-                }
+              if (fs.existsSync(trackFilePath)) {
+                await storage.createSeparatedTrack({
+                  audioFileId,
+                  trackType,
+                  fileName: trackFileName,
+                  filePath: trackFilePath,
+                });
+                console.log(`Created track record for ${trackType}`);
               }
-
-              await storage.updateAudioFileStatus(audioFileId, "completed");
-              console.log(`Audio file ${audioFileId} processing completed`);
-            } else {
-              console.error(`Spleeter process failed with code ${code}`);
-              await storage.updateAudioFileStatus(audioFileId, "error");
             }
-          });
-
-          pythonProcess.on("error", async (error) => {
-            clearTimeout(timeoutId);
-            console.error("Spleeter process error:", error);
+          };
+
+          // Preview stems (fast processor, first 45s, always WAV) are the file's tracks
+          // while it is still processing; the full result replaces them
+          let previewRegistered: Promise<void> = Promise.resolve();
+          const onPreview = (preview: SeparationPreview) => {
+            previewRegistered = registerTracks(preview.path, "wav").catch((error) => {
+              console.error("Preview registration error:", error);
+            });
+          };
+
+          // Run AI-powered audio separation on the long-lived worker (warm models, no per-job startup)
+          const result = await separationWorker.separate(inputPath, outputPath, progressive ? { onPreview } : {});
+          console.log(`Separation job finished: ${JSON.stringify(result)}`);
+          await previewRegistered;
+          await storage.deleteSeparatedTracksByAudioFileId(audioFileId);
+
+          if (result.success) {
+            // Process completed successfully, create track records;
+            // stems are written as WAV or FLAC (SEPARATION_OUTPUT_FORMAT)
+            await registerTracks(outputPath, result.output_format ?? "wav");
+
+            await storage.updateAudioFileStatus(audioFileId, "completed");
+            console.log(`Audio file ${audioFileId} processing completed`);
+          } else {
+            console.error(`Separation failed: ${result.error ?? "processor error"}`);
             await storage.updateAudioFileStatus(audioFileId, "error");
-          });
+          }
 
         } catch (error) {
           console.error("Separation error:", error);
+          await storage.deleteSeparatedTracksByAudioFileId(audioFileId);
           await storage.updateAudioFileStatus(audioFileId, "error");
         }
       }, 1000);
@@ -243,6 +231,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const stat = fs.statSync(track.filePath);
       const fileSize = stat.size;
       const range = req.headers.range;
+      const contentType = path.extname(track.filePath) === ".flac" ? "audio/flac" : "audio/wav";
 
       if (range) {
         const parts = range.replace(/bytes=/, "").split("-");
@@ -254,14 +243,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
           'Content-Range': `bytes ${start}-${end}/${fileSize}`,
           'Accept-Ranges': 'bytes',
           'Content-Length': chunksize,
-          'Content-Type': 'audio/wav',
+          'Content-Type': contentType,
         };
         res.writeHead(206, head);
         file.pipe(res);
       } else {
         const head = {
           'Content-Length': fileSize,
-          'Content-Type': 'audio/wav',
+          'Content-Type': contentType,
         };
         res.writeHead(200, head);
         fs.createReadStream(track.filePath).pipe(res);
@@ -0,0 +1,191 @@
+import { spawn, type ChildProcess } from "child_process";
+import path from "path";
+import readline from "readline";
+
+export interface SeparationJobResult {
+  id: string;
+  success: boolean;
+  processor?: string;
+  // Container of the written stems (<output>/<stem>.<output_format>), see audio_io.OUTPUT_FORMATS
+  output_format?: "wav" | "flac";
+  error?: string;
+  timings?: Record<string, number | null>;
+  // Seconds spent per processing stage (load, stft, hpss, mask, istft, write, ...)
+  stages?: Record<string, number> | null;
+  // Hits / misses of the job's shared spectral feature cache (see spectral_cache.py)
+  spectral_cache?: { hits: number; misses: number; entries: number } | null;
+  // Admission by the worker's job scheduler (see job_scheduler.py)
+  scheduler?: { wait_seconds: number; reserved_mb: number; queue_depth: number };
+  // Set when the scheduler's queue was full and the job was not accepted
+  rejected?: boolean;
+}
+
+// Preview stems of a progressive job, written before the full-quality result
+export interface SeparationPreview {
+  id: string;
+  path: string;
+  processor: string;
+  time_to_first_audio_seconds: number;
+}
+
+// Constraints for calibrated processor selection (see processor_calibration.py)
+export interface SeparationJobOptions {
+  latencyBudgetSeconds?: number;
+  memoryLimitMb?: number;
+  // Higher runs first when jobs are queued
+  priority?: number;
+  // Called when quick preview stems (in <output>/preview) are ready, before the result
+  onPreview?: (preview: SeparationPreview) => void;
+}
+
+type PendingJob = {
+  resolve: (result: SeparationJobResult) => void;
+  onPreview?: (preview: SeparationPreview) => void;
+  timeoutMs: number;
+  // Set once the job leaves the worker's queue: waiting for a slot does not count
+  timeoutId?: NodeJS.Timeout;
+};
+
+// Keeps one long-lived Python worker (server/services/separation-worker.py)
+// and talks to it over its stdin/stdout JSON-lines protocol. A job that times
+// out cannot be interrupted inside the worker's pool, so the worker is killed
+// (with its pool processes) and respawned for the next job.
+class SeparationWorkerClient {
+  private worker: ChildProcess | null = null;
+  private pending = new Map<string, PendingJob>();
+  private nextJobId = 1;
+
+  private ensureWorker(): ChildProcess {
+    if (this.worker && this.worker.exitCode === null) {
+      return this.worker;
+    }
+
+    const worker = spawn("python", [
+      path.join(process.cwd(), "server/services/separation-worker.py"),
+    ], {
+      stdio: ['pipe', 'pipe', 'pipe'],
+      env: { ...process.env, PYTHONPATH: process.cwd() },
+      // Own process group, so a restart also kills the pool processes
+      detached: true,
+    });
+
+    readline.createInterface({ input: worker.stdout! }).on("line", (line) => {
+      let message: any;
+      try {
+        message = JSON.parse(line);
+      } catch {
+        console.log(`Python stdout: ${line}`);
+        return;
+      }
+
+      if (message.event === "ready") {
+        console.log(`Separation worker ready: ${line}`);
+        return;
+      }
+
+      if (message.event === "queued") {
+        console.log(`Separation job ${message.id} queued at position ${message.position}`);
+        return;
+      }
+
+      const job = this.pending.get(String(message.id));
+      if (message.event === "started") {
+        if (job && !job.timeoutId) {
+          job.timeoutId = this.startTimeout(String(message.id), job);
+        }
+        return;
+      }
+
+      if (message.event === "preview") {
+        console.log(`Separation job ${message.id} preview ready: ${message.path}`);
+        job?.onPreview?.(message);
+        return;
+      }
+
+      if (job) {
+        clearTimeout(job.timeoutId);
+        this.pending.delete(String(message.id));
+        job.resolve(message);
+      }
+    });
+
+    worker.stderr?.on('data', (data) => {
+      console.error(`Python stderr: ${data}`);
+    });
+
+    // A worker killed by restartWorker() has already failed its jobs
+    worker.on("exit", (code) => {
+      if (this.worker !== worker) return;
+      console.error(`Separation worker exited with code ${code}`);
+      this.worker = null;
+      this.failPending(`Separation worker exited with code ${code}`);
+    });
+
+    worker.on("error", (error) => {
+      if (this.worker !== worker) return;
+      console.error("Separation worker error:", error);
+      this.worker = null;
+      this.failPending(error.message);
+    });
+
+    this.worker = worker;
+    return worker;
+  }
+
+  private failPending(error: string) {
+    for (const [id, job] of Array.from(this.pending.entries())) {
+      clearTimeout(job.timeoutId);
+      job.resolve({ id, success: false, error });
+    }
+    this.pending.clear();
+  }
+
+  // Kill the worker and its pool processes and fail its other jobs; the next job spawns a new one
+  private restartWorker(reason: string) {
+    const worker = this.worker;
+    if (!worker) return;
+    this.worker = null;
+    this.failPending(`Separation worker restarted: ${reason}`);
+    try {
+      process.kill(-worker.pid!, "SIGKILL");
+    } catch {
+      worker.kill("SIGKILL");
+    }
+  }
+
+  private startTimeout(id: string, job: PendingJob): NodeJS.Timeout {
+    return setTimeout(() => {
+      console.error(`Separation job ${id} timed out, restarting the separation worker`);
+      this.pending.delete(id);
+      job.resolve({ id, success: false, error: "timeout" });
+      this.restartWorker(`job ${id} timed out`);
+    }, job.timeoutMs);
+  }
+
+  separate(
+    inputPath: string,
+    outputPath: string,
+    options: SeparationJobOptions = {},
+    timeoutMs = 10 * 60 * 1000,
+  ): Promise<SeparationJobResult> {
+    const worker = this.ensureWorker();
+    const id = String(this.nextJobId++);
+
+    return new Promise((resolve) => {
+      // The timeout starts on the worker's "started" notice, when the job leaves the queue
+      this.pending.set(id, { resolve, timeoutMs, onPreview: options.onPreview });
+      const job = {
+        id,
+        input: inputPath,
+        output: outputPath,
+        latency_budget: options.latencyBudgetSeconds,
+        memory_limit_mb: options.memoryLimitMb,
+        priority: options.priority,
+        progressive: options.onPreview !== undefined,
+      };
+      worker.stdin!.write(JSON.stringify(job) + "\n");
+    });
+  }
+}
+
+export const separationWorker = new SeparationWorkerClient();
@@ -2,171 +2,262 @@
 import sys
 import os
 import logging
+from functools import partial
 import numpy as np
 import librosa
-import soundfile as sf
 from scipy import signal
 from scipy.ndimage import median_filter
+from spectral_analysis import SpectralAnalysis, onset_gain
+from mask_engine import MaskEngine
+from streaming import stream_separation
+from audio_io import load_audio, write_stems
+from stage_timer import stage
+from scratch import ScratchSpace
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def advanced_separation(input_path, output_dir):
+# Stereo placement per stem (left gain, right gain), only used for mono processing
+STEREO_GAINS = {
+    'vocals': (1.0, 1.0),   # Center vocals
+    'bass': (1.05, 0.95),   # Center bass with slight emphasis
+    'drums': (0.9, 1.1),    # Wide drums
+    'other': (0.95, 1.05),  # Slight stereo spread
+}
+
+# Drum emphasis around onsets: frames before/after each onset and the gain applied
+ONSET_WINDOW = (3, 3)
+ONSET_GAIN = 2.0
+
+# Typical vocal formants (Hz); their +-5 bin rows lie inside the 85-3400Hz vocal band
+FORMANT_FREQS = (800, 1200, 2600)
+
+def vocal_confidence(harmonic, formant_rows, vocal_rows, separable=False):
     """
-    Advanced audio separation using multiple techniques similar to modern AI approaches
+    Vocal confidence over the vocal band rows only, as float32 (..., band rows, frames):
+    harmonic magnitude * 1.5 across the band plus the formant rows, median filtered
+    over 3 bins x 5 frames for temporal consistency.
+    
+    Outside the band the confidence is zero before filtering and a 3-bin median
+    keeps it zero, so only the band and one row of context either side are built
+    and filtered instead of the full spectrogram. separable=True replaces the 3x5
+    median with a 3-bin median followed by a 5-frame one, a cheaper approximation.
     """
-    try:
-        logger.info(f"Loading audio file: {input_path}")
-        
-        # Load audio with optimized settings
-        y, sr = librosa.load(input_path, sr=22050, mono=False, duration=60.0)
-        
-        # Convert to mono for processing
-        if len(y.shape) > 1:
-            y_mono = librosa.to_mono(y)
-            y_stereo = y
-        else:
-            y_mono = y
-            y_stereo = np.column_stack([y, y])
-            
-        logger.info(f"Loaded: {len(y_mono)/sr:.1f}s at {sr}Hz")
-        logger.info("Performing advanced harmonic-percussive separation...")
-        
-        # Enhanced harmonic-percussive separation with multiple iterations
-        y_harmonic, y_percussive = librosa.effects.hpss(y_mono, margin=(1.0, 5.0))
-        
-        # Get detailed spectral information
-        S_full = np.abs(librosa.stft(y_mono, n_fft=2048, hop_length=512))
-        S_harmonic = np.abs(librosa.stft(y_harmonic, n_fft=2048, hop_length=512))
-        S_percussive = np.abs(librosa.stft(y_percussive, n_fft=2048, hop_length=512))
-        
-        # Get phase information
-        _, phase = librosa.magphase(librosa.stft(y_mono, n_fft=2048, hop_length=512))
-        
-        # Frequency analysis
-        freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
-        times = librosa.frames_to_time(np.arange(S_full.shape[1]), sr=sr, hop_length=512)
-        
-        logger.info("Analyzing spectral features...")
-        
-        # Advanced vocal detection using spectral features
-        vocal_confidence = np.zeros_like(S_full)
-        
+    start = max(vocal_rows.start - 1, 0)
+    stop = min(vocal_rows.stop + 1, harmonic.shape[-2])
+    band = slice(vocal_rows.start - start, vocal_rows.stop - start)
+    
+    confidence = np.zeros(harmonic[..., start:stop, :].shape, dtype=np.float32)
+    np.multiply(harmonic[..., vocal_rows, :], np.float32(1.5), out=confidence[..., band, :])
+    for rows in formant_rows:
+        confidence[..., rows.start - start:rows.stop - start, :] += harmonic[..., rows, :]
+    
+    # Per channel: no filtering across leading axes
+    size = (1,) * (confidence.ndim - 2)
+    if separable:
+        confidence = median_filter(median_filter(confidence, size=size + (3, 1)), size=size + (1, 5))
+    else:
+        confidence = median_filter(confidence, size=size + (3, 5))
+    return confidence[..., band, :]
+
+def advanced_stems(y, sr, onset_window=ONSET_WINDOW, onset_gain_factor=ONSET_GAIN, mid_side=False, scratch=None,
+                   separable_median=False, cache=None, levels=None):
+    """
+    Advanced mask pipeline: mono (samples,) or stereo (2, samples) signal -> {track_name: signal}.
+    Stereo is separated per channel in one batched pass, or with masks from the mid
+    channel applied to mid and side if mid_side is set.
+    With a file-backed scratch (scratch.ScratchSpace) every spectrogram-sized array
+    is a memmap and the masks are built one frame block at a time.
+    separable_median selects the approximate median in vocal_confidence().
+    cache is the job's spectral_cache.SpectralCache, if it has one.
+    
+    The masks are normalized by peak levels (vocal confidence, bass and drum
+    magnitudes, residual strength, onset envelope range). By default they come
+    from this signal; a levels dict shares them between calls: missing levels
+    are measured and stored, present ones are used as they are, so streamed
+    blocks keep one track-level balance (see stream_separation's prime_block).
+    """
+    levels = {} if levels is None else levels
+    
+    def level(name, measure):
+        if name not in levels:
+            levels[name] = measure()
+        return levels[name]
+    
+    # Single STFT pass; HPSS runs on the spectrogram instead of re-analysing separated signals
+    analysis = SpectralAnalysis(y, sr, n_fft=2048, hop_length=512, hpss_margin=(1.0, 5.0),
+                                mid_side=mid_side, scratch=scratch, cache=cache)
+    scratch = analysis.scratch
+    engine = MaskEngine(analysis)
+    S_full = analysis.magnitude
+    S_harmonic = analysis.harmonic
+    S_percussive = analysis.percussive
+    
+    # Frequency analysis
+    freqs = analysis.freqs
+    
+    logger.info("Analyzing spectral features...")
+    
+    with stage('mask'):
         # Vocal formant detection (human voice has specific formant frequencies)
-        formant_freqs = [800, 1200, 2600]  # Typical vocal formants
-        for formant in formant_freqs:
+        formant_rows = []
+        for formant in FORMANT_FREQS:
             formant_idx = np.argmin(np.abs(freqs - formant))
-            vocal_confidence[formant_idx-5:formant_idx+5, :] += S_harmonic[formant_idx-5:formant_idx+5, :]
+            formant_rows.append(slice(formant_idx-5, formant_idx+5))
         
-        # Vocal frequency range emphasis (fundamental + harmonics)
-        vocal_range = (freqs >= 85) & (freqs <= 3400)
-        vocal_confidence[vocal_range, :] += S_harmonic[vocal_range, :] * 1.5
+        # Vocal frequency range emphasis (fundamental + harmonics); the confidence is
+        # zero outside this band, so only the band is stored
+        vocal_rows = engine.band_rows(85, 3400)
+        vocal_band = scratch.empty(S_full[..., vocal_rows, :].shape, np.float32)
         
-        # Temporal consistency for vocals (vocals tend to be more stable)
-        vocal_confidence = median_filter(vocal_confidence, size=(3, 5))
+        # Temporal consistency for vocals (vocals tend to be more stable), per channel;
+        # blocks carry 2 extra frames either side for the 5-frame median
+        for read, inner, frames in scratch.frame_blocks(analysis.n_frames, halo=2):
+            vocal_band[..., frames] = vocal_confidence(S_harmonic[..., read], formant_rows, vocal_rows,
+                                                       separable=separable_median)[..., inner]
         
         logger.info("Creating intelligent masks...")
         
-        # Create adaptive masks based on spectral analysis
-        
-        # Vocals mask: harmonic content in vocal range with formant emphasis
-        vocals_mask = np.zeros_like(S_full)
-        vocals_mask[vocal_range, :] = vocal_confidence[vocal_range, :] / (np.max(vocal_confidence) + 1e-8)
-        vocals_mask = np.clip(vocals_mask, 0.1, 1.0)
-        
-        # Bass mask: low frequency harmonic content with emphasis on fundamental
-        bass_range = (freqs >= 20) & (freqs <= 250)
-        bass_mask = np.zeros_like(S_full)
-        bass_mask[bass_range, :] = S_harmonic[bass_range, :] / (np.max(S_harmonic[bass_range, :]) + 1e-8)
-        bass_mask = np.clip(bass_mask, 0.2, 1.0)
-        
-        # Drums mask: percussive content with transient emphasis
-        drums_mask = np.zeros_like(S_full)
+        # Create adaptive masks based on spectral analysis. Each mask only covers its
+        # band; outside it the mask is the constant floor the clip would have produced.
+        bass_rows = engine.band_rows(20, 250)
+        drum_rows = engine.band_rows(60, 8000)
+        other_rows = engine.band_rows(500, 12000)
+        vocal_peak = level('vocals', lambda: scratch.max(vocal_band) + 1e-8)
+        bass_peak = level('bass', lambda: scratch.max(S_harmonic[..., bass_rows, :]) + 1e-8)
+        drum_peak = level('drums', lambda: scratch.max(S_percussive) + 1e-8)
+        full_peak = level('full', lambda: scratch.max(S_full))
         
         # Detect onsets for drum enhancement
-        onset_strength = librosa.onset.onset_strength(y=y_mono, sr=sr, hop_length=512)
-        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_strength, sr=sr, hop_length=512)
-        
-        # Base drums mask from percussive content
-        drum_range = (freqs >= 60) & (freqs <= 8000)
-        drums_mask[drum_range, :] = S_percussive[drum_range, :] / (np.max(S_percussive) + 1e-8)
-        
-        # Enhance drums around onset times
-        for onset_frame in onset_frames:
-            if onset_frame < drums_mask.shape[1]:
-                start_frame = max(0, onset_frame - 3)
-                end_frame = min(drums_mask.shape[1], onset_frame + 3)
-                drums_mask[drum_range, start_frame:end_frame] *= 2.0
-        
-        drums_mask = np.clip(drums_mask, 0.1, 1.0)
+        onset_frames = analysis.onset_frames(levels)
+        drums_gain = onset_gain(onset_frames, analysis.n_frames, *onset_window,
+                                gain=onset_gain_factor).astype(np.float32)
+        
+        vocals_mask = scratch.empty(S_full[..., vocal_rows, :].shape, np.float32)
+        bass_mask = scratch.empty(S_full[..., bass_rows, :].shape, np.float32)
+        drums_mask = scratch.empty(S_full[..., drum_rows, :].shape, np.float32)
+        other_strength = scratch.empty(S_full.shape, np.float32)
+        for _, _, frames in scratch.frame_blocks(analysis.n_frames):
+            # Vocals mask: harmonic content in vocal range with formant emphasis
+            mask = vocals_mask[..., frames]
+            np.divide(vocal_band[..., frames], vocal_peak, out=mask)
+            np.clip(mask, 0.1, 1.0, out=mask)
+            
+            # Bass mask: low frequency harmonic content with emphasis on fundamental
+            mask = bass_mask[..., frames]
+            np.divide(S_harmonic[..., bass_rows, frames], bass_peak, out=mask)
+            np.clip(mask, 0.2, 1.0, out=mask)
+            
+            # Drums mask: percussive content, enhanced around onset times
+            mask = drums_mask[..., frames]
+            np.divide(S_percussive[..., drum_rows, frames], drum_peak, out=mask)
+            mask *= drums_gain[frames]
+            np.clip(mask, 0.1, 1.0, out=mask)
+            
+            # Adaptive other mask: stronger where vocals, bass, and drums are weak
+            strength = other_strength[..., frames]
+            np.copyto(strength, S_full[..., frames])
+            strength[..., vocal_rows, :] -= vocal_band[..., frames]
+            residual = engine.masked(bass_mask[..., frames], S_harmonic[..., frames], bass_rows, floor=0.2,
+                                     out=np.empty(strength.shape, dtype=np.float32))
+            strength -= residual
+            strength -= engine.masked(drums_mask[..., frames], S_percussive[..., frames], drum_rows, floor=0.1,
+                                      out=residual)
+            np.clip(strength, 0, full_peak, out=strength)
+        del vocal_band
         
         # Other instruments mask: residual with mid-high frequency emphasis
-        other_mask = np.ones_like(S_full) * 0.3
-        other_range = (freqs >= 500) & (freqs <= 12000)
-        
-        # Adaptive other mask: stronger where vocals, bass, and drums are weak
-        other_strength = S_full - (vocal_confidence + S_harmonic * bass_mask + S_percussive * drums_mask)
-        other_strength = np.clip(other_strength, 0, np.max(S_full))
-        other_mask[other_range, :] = other_strength[other_range, :] / (np.max(other_strength) + 1e-8)
-        other_mask = np.clip(other_mask, 0.2, 0.9)
-        
-        logger.info("Generating separated tracks...")
-        
-        # Apply masks and reconstruct audio
-        tracks = {}
-        
+        other_peak = level('other', lambda: scratch.max(other_strength) + 1e-8)
+        other_mask = scratch.empty(S_full[..., other_rows, :].shape, np.float32)
+        for _, _, frames in scratch.frame_blocks(analysis.n_frames):
+            mask = other_mask[..., frames]
+            np.divide(other_strength[..., other_rows, frames], other_peak, out=mask)
+            np.clip(mask, 0.2, 0.9, out=mask)
+        del other_strength
+    
+    logger.info("Generating separated tracks...")
+    
+    # Apply masks and reconstruct audio (one batched inverse STFT)
+    tracks = {}
+    stems = engine.reconstruct_stems({
+        'vocals': dict(mask=vocals_mask, source=S_harmonic, rows=vocal_rows, floor=0.1),
+        'bass': dict(mask=bass_mask, source=S_harmonic, rows=bass_rows, floor=0.2),
+        'drums': dict(mask=drums_mask, source=S_percussive, rows=drum_rows, floor=0.1),
+        # Mixture spectrum, no phase multiply
+        'other': dict(mask=other_mask, rows=other_rows, floor=0.3),
+    })
+    
+    # Per-stem post-filtering (normalizing and encoding run later, in the write pool)
+    with stage('postprocess'):
         # Vocals: enhanced harmonic content with vocal-specific processing
-        vocals_stft = S_harmonic * vocals_mask * phase
-        vocals = librosa.istft(vocals_stft, hop_length=512)
+        vocals = stems['vocals']
         # Apply vocal enhancement (slight reverb and formant boosting)
         vocals = librosa.effects.preemphasis(vocals, coef=0.97)
         tracks['vocals'] = vocals
-        
+    
         # Bass: low-frequency harmonic content with bass enhancement
-        bass_stft = S_harmonic * bass_mask * phase
-        bass = librosa.istft(bass_stft, hop_length=512)
+        bass = stems['bass']
         # Bass enhancement with low-pass filtering
         bass = signal.sosfilt(signal.butter(4, 300, 'low', fs=sr, output='sos'), bass)
         tracks['bass'] = bass
-        
+    
         # Drums: percussive content with dynamic enhancement
-        drums_stft = S_percussive * drums_mask * phase
-        drums = librosa.istft(drums_stft, hop_length=512)
+        drums = stems['drums']
         # Drum enhancement with compression and EQ
         drums = np.tanh(drums * 1.5) * 0.8
         tracks['drums'] = drums
-        
+    
         # Other: residual content with intelligent filtering
-        other_stft = S_full * other_mask * phase
-        other = librosa.istft(other_stft, hop_length=512)
-        tracks['other'] = other
+        tracks['other'] = stems['other']
+    
+    return tracks
+
+def advanced_separation(input_path, output_dir, streaming=False, channels='mono', native_rate=False,
+                        output_format='wav', scratch_dir=None, separable_median=False, cache=None):
+    """
+    Advanced audio separation using multiple techniques similar to modern AI approaches.
+    With streaming=True the whole track is processed in blocks instead of the first 60s.
+    channels is 'mono', 'stereo' or 'mid_side' (see streaming.CHANNEL_MODES); only
+    mono output gets the fixed STEREO_GAINS panning.
+    With native_rate=True the input is processed at its own sample rate (no resampling).
+    output_format is 'wav' or 'flac' (see audio_io.OUTPUT_FORMATS).
+    With scratch_dir the intermediate spectrograms are memmap files under it and the
+    whole track is analysed in one pass, so long tracks fit in little RAM.
+    separable_median=True uses the faster approximate vocal-confidence median.
+    cache is the job's spectral_cache.SpectralCache, if it has one.
+    """
+    try:
+        separate = partial(advanced_stems, mid_side=(channels == 'mid_side'), separable_median=separable_median)
+        target_sr = None if native_rate else 22050
+        if streaming and not scratch_dir:
+            # Mask levels measured once on the loudest block and shared by all blocks
+            separate = partial(separate, levels={})
+            separate = cache.streamed(separate) if cache else separate
+            stream_separation(input_path, output_dir, separate, sr=target_sr, headroom=0.85,
+                              stereo_gains=STEREO_GAINS, channels=channels, output_format=output_format,
+                              prime_block=separate)
+            logger.info("Advanced separation completed successfully!")
+            return True
+        
+        logger.info(f"Loading audio file: {input_path}")
+        
+        # Load audio with optimized settings (folded to mono unless processing in stereo)
+        y, sr = load_audio(input_path, sr=target_sr, mono=(channels == 'mono'),
+                           duration=None if scratch_dir else 60.0)
+        
+        logger.info(f"Loaded: {y.shape[-1]/sr:.1f}s at {sr}Hz")
+        
+        logger.info("Performing advanced harmonic-percussive separation...")
+        with ScratchSpace(scratch_dir) as scratch:
+            tracks = separate(y, sr, scratch=scratch, cache=cache)
         
         logger.info("Post-processing and saving tracks...")
         
-        # Advanced normalization and stereo processing
-        for track_name, track_data in tracks.items():
-            # Normalize with headroom
-            if np.max(np.abs(track_data)) > 0:
-                track_data = track_data / np.max(np.abs(track_data)) * 0.85
-            
-            # Create stereo with slight panning for realistic effect
-            if track_name == 'vocals':
-                # Center vocals
-                stereo_data = np.column_stack([track_data, track_data])
-            elif track_name == 'bass':
-                # Center bass with slight emphasis
-                stereo_data = np.column_stack([track_data * 1.05, track_data * 0.95])
-            elif track_name == 'drums':
-                # Wide drums
-                stereo_data = np.column_stack([track_data * 0.9, track_data * 1.1])
-            else:  # other
-                # Slight stereo spread
-                stereo_data = np.column_stack([track_data * 0.95, track_data * 1.05])
-            
-            output_path = os.path.join(output_dir, f"{track_name}.wav")
-            sf.write(output_path, stereo_data, sr)
-            logger.info(f"Saved enhanced {track_name} track ({len(track_data)/sr:.1f}s)")
+        # Normalize with headroom; stereo stems keep their real image, mono stems get
+        # slight panning. All stems are post-processed and encoded concurrently.
+        write_stems(tracks, output_dir, sr, headroom=0.85, stereo_gains=STEREO_GAINS,
+                    output_format=output_format)
         
         logger.info("Advanced separation completed successfully!")
         return True
@@ -178,12 +269,22 @@ def advanced_separation(input_path, output_dir):
         return False
 
 def main():
-    if len(sys.argv) != 3:
-        logger.error("Usage: python advanced-processor.py <input_file> <output_directory>")
+    flags = sys.argv[1:]
+    streaming = '--stream' in flags
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else 'mono'
+    native_rate = '--native-rate' in flags
+    output_format = 'flac' if '--flac' in flags else 'wav'
+    separable_median = '--separable-median' in flags
+    scratch_dir = next((arg.split('=', 1)[1] for arg in flags if arg.startswith('--scratch-dir=')), None)
+    args = [arg for arg in flags
+            if arg not in ('--stream', '--stereo', '--mid-side', '--native-rate', '--flac', '--separable-median')
+            and not arg.startswith('--scratch-dir=')]
+    if len(args) != 2:
+        logger.error("Usage: python advanced-processor.py <input_file> <output_directory> [--stream] [--stereo | --mid-side] [--native-rate] [--flac] [--scratch-dir=DIR] [--separable-median]")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_path = args[0]
+    output_dir = args[1]
     
     if not os.path.exists(input_path):
         logger.error(f"Input file does not exist: {input_path}")
@@ -191,7 +292,9 @@ def main():
     
     os.makedirs(output_dir, exist_ok=True)
     
-    success = advanced_separation(input_path, output_dir)
+    success = advanced_separation(input_path, output_dir, streaming=streaming, channels=channels,
+                                  native_rate=native_rate, output_format=output_format, scratch_dir=scratch_dir,
+                                  separable_median=separable_median)
     
     if success:
         logger.info("SUCCESS: Advanced audio separation completed!")
@@ -3,9 +3,23 @@ import sys
 import os
 import logging
 import time
+import json
+import shutil
+import threading
 import psutil
+import importlib.util
 import librosa
+import soundfile as sf
 from pathlib import Path
+from processor_modules import load_processor_module
+from streaming import should_stream, STREAMING_THRESHOLD_SECONDS, CHANNEL_MODES
+from result_cache import get_result_cache, cache_key, hash_file
+from audio_io import output_format_from_env
+from scratch import scratch_dir_from_env
+from demucs_backends import resolve_backend
+from spectral_cache import SpectralCache
+from stage_timer import set_context, profile_run, emit
+from processor_calibration import QUALITY_ORDER, load_cost_model, predict
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,7 +32,8 @@ def analyze_audio_file(input_path):
     try:
         # Get file info
         file_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
-        duration = librosa.get_duration(path=input_path)
+        # Header metadata only, the audio is not decoded
+        duration = sf.info(input_path).duration
         
         # Get system resources
         memory_available = psutil.virtual_memory().available / (1024 * 1024 * 1024)  # GB
@@ -37,9 +52,52 @@ def analyze_audio_file(input_path):
         logger.error(f"Error analyzing audio: {e}")
         return None
 
-def select_processor(audio_info):
+def selection_limits(latency_budget=None, memory_limit_mb=None):
     """
-    Intelligently select the best processor based on audio and system characteristics
+    Latency budget (seconds) and memory limit (MB) for a job: explicit values first,
+    then SEPARATION_LATENCY_BUDGET / SEPARATION_MEMORY_LIMIT_MB, else no budget and
+    80% of the currently available memory
+    """
+    if latency_budget is None and os.environ.get('SEPARATION_LATENCY_BUDGET'):
+        latency_budget = float(os.environ['SEPARATION_LATENCY_BUDGET'])
+    if memory_limit_mb is None and os.environ.get('SEPARATION_MEMORY_LIMIT_MB'):
+        memory_limit_mb = float(os.environ['SEPARATION_MEMORY_LIMIT_MB'])
+    if memory_limit_mb is None:
+        memory_limit_mb = psutil.virtual_memory().available / (1024 * 1024) * 0.8
+    return latency_budget, memory_limit_mb
+
+def select_calibrated_processor(cost_model, duration, latency_budget, memory_limit_mb):
+    """
+    Best-quality calibrated processor predicted to meet the latency budget and memory limit
+    """
+    candidates = [p for p in QUALITY_ORDER if p in cost_model['processors']]
+    if not candidates:
+        return None
+    
+    predictions = {}
+    for processor_type in candidates:
+        streamed = processor_type in STREAMING_PROCESSORS and duration > STREAMING_THRESHOLD_SECONDS
+        # Streamed runs only hold one 30s block (plus overlap) in memory
+        predictions[processor_type] = predict(cost_model, processor_type, duration,
+                                              streaming_seconds=31.0 if streamed else None)
+        seconds, peak_mb = predictions[processor_type]
+        if (latency_budget is None or seconds <= latency_budget) and peak_mb <= memory_limit_mb:
+            budget = f"{latency_budget:g}s" if latency_budget is not None else "none"
+            logger.info(f"Selecting {processor_type} (predicted {seconds:.1f}s, {peak_mb:.0f}MB; "
+                        f"budget {budget}, limit {memory_limit_mb:.0f}MB)")
+            return processor_type
+    
+    # Nothing fits: take the fastest so the job at least finishes as soon as possible
+    processor_type = min(candidates, key=lambda p: predictions[p][0])
+    logger.warning(f"No processor meets the budget, selecting fastest: {processor_type} "
+                   f"(predicted {predictions[processor_type][0]:.1f}s)")
+    return processor_type
+
+def select_processor(audio_info, latency_budget=None, memory_limit_mb=None):
+    """
+    Intelligently select the best processor based on audio and system characteristics.
+    Uses the host's calibrated cost model when there is one (see processor_calibration.py),
+    otherwise fixed thresholds.
     """
     if not audio_info:
         return 'simple'
@@ -48,11 +106,22 @@ def select_processor(audio_info):
     duration = audio_info['duration_seconds']
     memory = audio_info['memory_gb']
     
-    # Decision matrix
+    cost_model = load_cost_model()
+    if cost_model:
+        latency_budget, memory_limit_mb = selection_limits(latency_budget, memory_limit_mb)
+        processor_type = select_calibrated_processor(cost_model, duration, latency_budget, memory_limit_mb)
+        if processor_type:
+            return processor_type
+    
+    # Decision matrix; file-backed spectrograms keep the advanced processor's RAM use low
+    advanced_memory = 1.0 if scratch_dir_from_env() else 2.0
     if memory >= 4.0 and file_size <= 50 and duration <= 300:  # 4GB+ RAM, small file
         logger.info("Selecting Demucs (high quality)")
         return 'demucs'
-    elif memory >= 2.0 and file_size <= 100 and duration <= 600:  # 2GB+ RAM, medium file
+    elif memory >= 3.0 and file_size <= 100 and duration <= 600:  # 3GB+ RAM, medium file
+        logger.info("Selecting Wiener processor (soft masks)")
+        return 'wiener'
+    elif memory >= advanced_memory and file_size <= 100 and duration <= 600:  # 2GB+ RAM (1GB with scratch), medium file
         logger.info("Selecting Advanced processor")
         return 'advanced'
     elif memory >= 1.0 and file_size <= 200:  # 1GB+ RAM, large file
@@ -62,61 +131,219 @@ def select_processor(audio_info):
         logger.info("Selecting Simple processor (fallback)")
         return 'simple'
 
-def run_processor(processor_type, input_path, output_dir):
+# Processor type -> (script, entry point)
+PROCESSORS = {
+    'demucs': ('demucs-processor.py', 'lightweight_demucs'),
+    'wiener': ('wiener-processor.py', 'wiener_separation'),
+    'advanced': ('advanced-processor.py', 'advanced_separation'),
+    'fast': ('fast-processor.py', 'fast_separation'),
+    'simple': ('simple-processor.py', 'create_simple_separation'),
+}
+
+# Processors that can run block by block on full-length tracks
+STREAMING_PROCESSORS = ('wiener', 'advanced', 'fast', 'simple')
+
+# Processors that accept a channels mode and native_rate (the rest decide their own
+# channel layout and sample rate)
+CHANNEL_PROCESSORS = ('wiener', 'advanced', 'fast', 'simple')
+
+# Processors that take the job's SpectralCache
+SPECTRAL_PROCESSORS = ('wiener', 'advanced', 'fast')
+
+def native_rate_enabled():
+    """
+    SEPARATION_NATIVE_RATE=1 runs the spectral processors at the input's own sample rate
+    """
+    return os.environ.get('SEPARATION_NATIVE_RATE', '0').lower() in ('1', 'on', 'true')
+
+def demucs_segmented():
+    """
+    True when Demucs separates segments in parallel (DEMUCS_WORKERS > 1); the
+    crossfaded merge does not match a single pass, so the result cache keys on it
+    """
+    from demucs_engine import parallel_settings
+    return parallel_settings()[0] > 1
+
+def channel_mode(channels=None):
+    """
+    Channel mode for a job: explicit value first, then SEPARATION_CHANNELS, else 'mono'
+    """
+    channels = channels or os.environ.get('SEPARATION_CHANNELS') or 'mono'
+    if channels not in CHANNEL_MODES:
+        logger.warning(f"Unknown channel mode {channels!r}, using mono")
+        return 'mono'
+    return channels
+
+def get_processor_function(processor_type):
+    """
+    Resolve the separation function for a processor type (raises ImportError if unavailable)
     """
-    Run the selected processor
+    script_name, function_name = PROCESSORS.get(processor_type, PROCESSORS['simple'])
+    if processor_type == 'demucs' and importlib.util.find_spec('demucs') is None:
+        raise ImportError("demucs package is not installed")
+    module = load_processor_module(script_name)
+    return getattr(module, function_name)
+
+def resolve_processor(processor_type):
     """
+    Downgrade to the simple processor up front if the selected one cannot be imported
+    """
+    try:
+        get_processor_function(processor_type)
+        return processor_type
+    except ImportError as e:
+        logger.warning(f"Processor {processor_type} not available ({e}), using simple processor")
+        return 'simple'
+
+def warm_up(processor_types=('wiener', 'advanced', 'fast', 'simple')):
+    """
+    Import processor modules and prime librosa's caches so later jobs start immediately.
+    Used by long-lived workers; returns the processor types that loaded successfully.
+    """
+    import numpy as np
+    
+    loaded = []
+    for processor_type in processor_types:
+        try:
+            get_processor_function(processor_type)
+            loaded.append(processor_type)
+        except ImportError as e:
+            logger.warning(f"Processor {processor_type} not available for warm-up: {e}")
+    
+    if 'demucs' in loaded:
+        try:
+            # Model used by lightweight_demucs, kept resident for later jobs
+            from demucs_engine import get_model
+            get_model('mdx_extra_q')
+        except Exception as e:
+            logger.warning(f"Demucs model not available for warm-up: {e}")
+    
+    # A short dummy signal triggers librosa's lazy imports and FFT plan setup,
+    # through the same cached STFT -> HPSS / onset path the processors use
+    y = np.random.default_rng(0).standard_normal(22050).astype(np.float32)
+    cache = SpectralCache()
+    librosa.decompose.hpss(cache.stft(y))
+    cache.onset_envelope(y, 22050)
+    
+    return loaded
+
+def run_processor(processor_type, input_path, output_dir, metrics=None, channels='mono', spectral_cache=None):
+    """
+    Run the selected processor; spectral processors share spectral_cache (one per job)
+    """
+    if metrics is None:
+        metrics = {}
+    metrics['processor'] = processor_type
+    
     start_time = time.time()
+    set_context(processor=processor_type)
     
+    with profile_run(processor_type) as summary:
+        success = _run_separation(processor_type, input_path, output_dir, metrics, channels, spectral_cache)
+    metrics['stages'] = summary.get('stages')
+    
+    processing_time = time.time() - start_time
+    logger.info(f"{metrics['processor'].capitalize()} processor completed in {processing_time:.1f}s")
+    
+    return success
+
+def _run_separation(processor_type, input_path, output_dir, metrics, channels='mono', spectral_cache=None):
+    """
+    Call the processor's separation function, falling back to simple if it cannot be imported
+    """
     try:
-        if processor_type == 'demucs':
-            from demucs_processor import lightweight_demucs
-            success = lightweight_demucs(input_path, output_dir)
-        elif processor_type == 'advanced':
-            from advanced_processor import advanced_separation
-            success = advanced_separation(input_path, output_dir)
-        elif processor_type == 'fast':
-            from fast_processor import fast_separation
-            success = fast_separation(input_path, output_dir)
-        else:  # simple
-            from simple_processor import create_simple_separation
-            success = create_simple_separation(input_path, output_dir)
-        
-        processing_time = time.time() - start_time
-        logger.info(f"{processor_type.capitalize()} processor completed in {processing_time:.1f}s")
-        
-        return success
+        separation_function = get_processor_function(processor_type)
+        # Every processor writes stems in the configured format
+        options = {'output_format': output_format_from_env()}
+        if processor_type in CHANNEL_PROCESSORS:
+            options.update(channels=channels, native_rate=native_rate_enabled())
+        if processor_type in SPECTRAL_PROCESSORS and spectral_cache is not None:
+            options['cache'] = spectral_cache
+        if processor_type == 'advanced' and scratch_dir_from_env():
+            # Whole track in one memmap-backed analysis instead of streamed blocks
+            return separation_function(input_path, output_dir, scratch_dir=scratch_dir_from_env(), **options)
+        if processor_type in STREAMING_PROCESSORS and should_stream(input_path):
+            logger.info("Long input, using streaming mode")
+            return separation_function(input_path, output_dir, streaming=True, **options)
+        return separation_function(input_path, output_dir, **options)
         
     except ImportError as e:
         logger.error(f"Processor {processor_type} not available: {e}")
         # Fallback to simple processor
         if processor_type != 'simple':
             logger.info("Falling back to simple processor")
-            from simple_processor import create_simple_separation
-            return create_simple_separation(input_path, output_dir)
+            metrics['processor'] = 'simple'
+            set_context(processor='simple')
+            return get_processor_function('simple')(input_path, output_dir,
+                                                    streaming=should_stream(input_path),
+                                                    channels=channels,
+                                                    native_rate=native_rate_enabled(),
+                                                    output_format=output_format_from_env())
         return False
     except Exception as e:
         logger.error(f"Error in {processor_type} processor: {e}")
         return False
 
-def ai_separation(input_path, output_dir):
+def ai_separation(input_path, output_dir, metrics=None, latency_budget=None, memory_limit_mb=None,
+                  channels=None, processor_type=None):
     """
-    Main AI-powered separation function with intelligent processor selection
+    Main AI-powered separation function with intelligent processor selection.
+    If a metrics dict is given it is filled with the chosen processor and stage timings.
+    latency_budget (seconds) and memory_limit_mb constrain the calibrated selection.
+    channels ('mono', 'stereo' or 'mid_side', see channel_mode()) applies to the
+    spectral processors.
+    processor_type skips the selection, for callers that already chose (e.g. the
+    job scheduler, which plans against the memory other jobs have reserved).
     """
+    if metrics is None:
+        metrics = {}
+    channels = channel_mode(channels)
+    
     try:
         logger.info(f"Starting AI-powered separation: {input_path}")
         
         # Step 1: Analyze audio file and system resources
+        start_time = time.time()
         audio_info = analyze_audio_file(input_path)
         
-        # Step 2: Select best processor
-        processor_type = select_processor(audio_info)
+        # Step 2: Select best processor (unless the caller already did)
+        if processor_type is None:
+            processor_type = select_processor(audio_info, latency_budget, memory_limit_mb)
+        processor_type = resolve_processor(processor_type)
+        metrics['analysis_seconds'] = round(time.time() - start_time, 3)
+        # Container every processor writes the stems in (and the result cache keys on)
+        metrics['output_format'] = output_format_from_env()
+        
+        # Step 3: Reuse stems from an identical earlier job (same audio, processor and parameters)
+        cache = get_result_cache()
+        metrics['cache_hit'] = False
+        if cache:
+            key = cache_key(hash_file(input_path), processor_type,
+                            {'streaming': should_stream(input_path), 'channels': channels,
+                             'native_rate': native_rate_enabled(), 'output_format': output_format_from_env(),
+                             'scratch': processor_type == 'advanced' and bool(scratch_dir_from_env()),
+                             'demucs_backend': processor_type == 'demucs' and resolve_backend(),
+                             'demucs_segmented': processor_type == 'demucs' and demucs_segmented()})
+            if cache.lookup(key, output_dir):
+                metrics['processor'] = processor_type
+                metrics['cache_hit'] = True
+                metrics['processing_seconds'] = 0.0
+                logger.info(f"AI separation served from cache ({processor_type} processor)")
+                return True
+            cache.detach(output_dir)
         
-        # Step 3: Run separation
-        success = run_processor(processor_type, input_path, output_dir)
+        # Step 4: Run separation, with one spectral feature cache for the whole job
+        start_time = time.time()
+        spectral_cache = SpectralCache()
+        success = run_processor(processor_type, input_path, output_dir, metrics, channels, spectral_cache)
+        metrics['processing_seconds'] = round(time.time() - start_time, 3)
+        metrics['spectral_cache'] = spectral_cache.stats()
+        
+        if success and cache and metrics['processor'] == processor_type:
+            cache.store(key, output_dir, {'processor': processor_type})
         
         if success:
-            logger.info(f"AI separation completed successfully using {processor_type} processor")
+            logger.info(f"AI separation completed successfully using {metrics['processor']} processor")
             return True
         else:
             logger.error("AI separation failed")
@@ -128,13 +355,219 @@ def ai_separation(input_path, output_dir):
         traceback.print_exc()
         return False
 
+# Progressive mode: preview stems from the fast processor on the first PREVIEW_SECONDS
+PREVIEW_PROCESSOR = 'fast'
+PREVIEW_SECONDS = 45.0
+PREVIEW_DIR = 'preview'
+
+def preview_dir(output_dir):
+    return os.path.join(output_dir, PREVIEW_DIR)
+
+def preview_separation(input_path, output_dir, metrics=None):
+    """
+    Low-cost preview stems in output_dir/preview: the fast processor on the start of the track
+    """
+    if metrics is None:
+        metrics = {}
+    start_time = time.time()
+    set_context(processor=PREVIEW_PROCESSOR)
+    try:
+        os.makedirs(preview_dir(output_dir), exist_ok=True)
+        success = get_processor_function(PREVIEW_PROCESSOR)(input_path, preview_dir(output_dir),
+                                                            duration=PREVIEW_SECONDS)
+    except Exception as e:
+        logger.error(f"Preview failed: {e}")
+        success = False
+    metrics['preview_seconds'] = round(time.time() - start_time, 3)
+    return bool(success)
+
+def discard_preview(output_dir):
+    """
+    Remove the preview once the full-quality stems have replaced it
+    """
+    shutil.rmtree(preview_dir(output_dir), ignore_errors=True)
+
+def progressive_separation(input_path, output_dir, metrics=None, on_preview=None, **options):
+    """
+    Two-phase separation: preview stems first (see preview_separation()), announced with
+    on_preview(info) (default: a "preview" event line on stdout), then the full
+    ai_separation(input_path, output_dir, **options) result, which replaces the preview.
+    metrics gets time_to_first_audio_seconds alongside total_seconds.
+    """
+    if metrics is None:
+        metrics = {}
+    start_time = time.time()
+    
+    if preview_separation(input_path, output_dir, metrics):
+        metrics['time_to_first_audio_seconds'] = round(time.time() - start_time, 3)
+        info = {'path': preview_dir(output_dir), 'processor': PREVIEW_PROCESSOR,
+                'time_to_first_audio_seconds': metrics['time_to_first_audio_seconds']}
+        logger.info(f"Preview ready after {info['time_to_first_audio_seconds']:.1f}s: {info['path']}")
+        (on_preview or (lambda preview: emit('preview', **preview)))(info)
+    else:
+        logger.warning("No preview, continuing with the full separation")
+    
+    success = ai_separation(input_path, output_dir, metrics=metrics, **options)
+    metrics['total_seconds'] = round(time.time() - start_time, 3)
+    if success:
+        discard_preview(output_dir)
+    return success
+
+def load_batch_items(manifest_path, output_root='separated'):
+    """
+    Batch items from a JSON-lines manifest ({"input": ..., "output": ..., "id": ...} per line)
+    or, if manifest_path is a directory, one item per file in it
+    """
+    items = []
+    if os.path.isdir(manifest_path):
+        for name in sorted(os.listdir(manifest_path)):
+            input_path = os.path.join(manifest_path, name)
+            if name.startswith('.') or not os.path.isfile(input_path):
+                continue
+            items.append({
+                'id': name,
+                'input': input_path,
+                'output': os.path.join(output_root, f"{name}_separated"),
+            })
+        return items
+    
+    with open(manifest_path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if 'input' not in item:
+                raise ValueError(f"Manifest line {line_number} has no 'input'")
+            item.setdefault('id', item['input'])
+            item.setdefault('output', os.path.join(output_root, f"{Path(item['input']).name}_separated"))
+            items.append(item)
+    return items
+
+def completed_batch_items(report_path):
+    """
+    Ids already separated successfully according to an existing batch report
+    """
+    completed = set()
+    if not os.path.exists(report_path):
+        return completed
+    
+    with open(report_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # Truncated last line from an interrupted run
+                continue
+            if result.get('success'):
+                completed.add(result.get('id'))
+    return completed
+
+def batch_separation(manifest_path, workers=1, report_path=None, output_root='separated'):
+    """
+    Separate many files in one invocation on a pool of warm workers.
+    Every result is appended to a JSON-lines report as soon as it finishes, and items
+    already reported as successful are skipped, so an interrupted batch can be resumed.
+    """
+    from worker_pool import SeparationWorker
+    
+    items = load_batch_items(manifest_path, output_root)
+    report_path = report_path or manifest_path.rstrip('/') + '.results.jsonl'
+    completed = completed_batch_items(report_path)
+    pending = [item for item in items if item['id'] not in completed]
+    
+    logger.info(f"Batch: {len(items)} items, {len(items) - len(pending)} already completed, "
+                f"{len(pending)} to process with {workers} worker(s)")
+    if not pending:
+        return {'total': len(items), 'processed': 0, 'failed': 0, 'report': report_path}
+    
+    # Every pending item is queued up front, so the queue must hold all of them
+    worker = SeparationWorker(pool_size=workers, max_queue=len(pending))
+    ready = worker.start()
+    logger.info(f"Workers ready in {ready['startup_seconds']:.1f}s")
+    
+    lock = threading.Lock()
+    results = []
+    
+    with open(report_path, 'a') as report:
+        def record(item, result):
+            if 'event' in result:
+                # Queued / started / preview notices, not results
+                return
+            result['input'] = item['input']
+            result['output'] = item['output']
+            with lock:
+                report.write(json.dumps(result) + "\n")
+                report.flush()
+                results.append(result)
+                status = 'ok' if result['success'] else f"FAILED ({result.get('error', 'processor error')})"
+                logger.info(f"[{len(results)}/{len(pending)}] {item['id']}: {status}")
+        
+        for item in pending:
+            worker.submit(item, lambda result, item=item: record(item, result))
+        
+        # Waits until every queued and running job has been answered (and reported)
+        worker.shutdown()
+    
+    failed = [result['id'] for result in results if not result['success']]
+    return {
+        'total': len(items),
+        'processed': len(results),
+        'failed': len(failed),
+        'failed_ids': failed,
+        'report': report_path,
+    }
+
+def batch_main(argv):
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="ai-processor.py --batch",
+                                     description="Separate every item of a manifest or directory")
+    parser.add_argument('manifest', help="JSON-lines manifest or a directory of audio files")
+    parser.add_argument('--workers', type=int, default=1, help="Warm worker processes")
+    parser.add_argument('--report', help="Results file (default: <manifest>.results.jsonl)")
+    parser.add_argument('--output-root', default='separated',
+                        help="Output root for items without an explicit 'output'")
+    args = parser.parse_args(argv)
+    
+    summary = batch_separation(args.manifest, max(1, args.workers), args.report, args.output_root)
+    logger.info(f"Batch finished: {json.dumps(summary)}")
+    return 0 if summary['failed'] == 0 else 1
+
+def calibrate_main(argv):
+    import argparse
+    from processor_calibration import calibrate, cost_model_path
+    
+    parser = argparse.ArgumentParser(prog="ai-processor.py --calibrate",
+                                     description="Measure every processor on this host for select_processor()")
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30],
+                        help="Test signal durations in seconds")
+    parser.add_argument('--processors', nargs='+', default=list(QUALITY_ORDER), choices=list(QUALITY_ORDER))
+    parser.add_argument('--output', default=cost_model_path(), help="Cost model file")
+    args = parser.parse_args(argv)
+    
+    model = calibrate(args.processors, args.durations, args.output)
+    return 0 if model['processors'] else 1
+
 def main():
-    if len(sys.argv) != 3:
-        logger.error("Usage: python ai-processor.py <input_file> <output_directory>")
+    if len(sys.argv) >= 2 and sys.argv[1] == '--batch':
+        sys.exit(batch_main(sys.argv[2:]))
+    
+    if len(sys.argv) >= 2 and sys.argv[1] == '--calibrate':
+        sys.exit(calibrate_main(sys.argv[2:]))
+    
+    flags = sys.argv[1:]
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else None
+    progressive = '--progressive' in flags
+    args = [arg for arg in flags if arg not in ('--stereo', '--mid-side', '--progressive')]
+    if len(args) != 2:
+        logger.error("Usage: python ai-processor.py <input_file> <output_directory> [--stereo | --mid-side] [--progressive]")
+        logger.error("       python ai-processor.py --batch <manifest.jsonl|directory> [--workers N]")
+        logger.error("       python ai-processor.py --calibrate [--durations 10 30]")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_path = args[0]
+    output_dir = args[1]
     
     # Validate input file exists
     if not os.path.exists(input_path):
@@ -144,8 +577,14 @@ def main():
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Perform AI-powered separation
-    success = ai_separation(input_path, output_dir)
+    # Perform AI-powered separation (after a quick preview in progressive mode)
+    if progressive:
+        metrics = {}
+        success = progressive_separation(input_path, output_dir, metrics, channels=channels)
+        logger.info(f"Time to first audio: {metrics.get('time_to_first_audio_seconds')}s, "
+                    f"total: {metrics.get('total_seconds')}s")
+    else:
+        success = ai_separation(input_path, output_dir, channels=channels)
     
     if success:
         logger.info("SUCCESS: AI-powered audio separation completed!")
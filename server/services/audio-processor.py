@@ -3,9 +3,12 @@ import sys
 import os
 import logging
 import numpy as np
+from model_store import use_spleeter_store
+from audio_io import load_audio, write_stems
+
+# Before the import: Spleeter reads its model directory once, when first imported
+use_spleeter_store()
 from spleeter.separator import Separator
-import librosa
-import soundfile as sf
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,15 +21,10 @@ def separate_audio(input_path, output_dir):
     try:
         logger.info(f"Loading audio file: {input_path}")
         
-        # Load audio file with optimized settings for long files
-        waveform, sample_rate = librosa.load(input_path, sr=22050, mono=False)
-        logger.info(f"Sample rate: {sample_rate}")
-        
-        # Limit audio length to 5 minutes for processing (300 seconds)
-        max_length = 300 * sample_rate
-        if waveform.shape[-1] > max_length:
-            logger.info(f"Trimming audio from {waveform.shape[-1]/sample_rate:.1f}s to {max_length/sample_rate:.1f}s")
-            waveform = waveform[..., :max_length]
+        # Load audio file with optimized settings for long files; only the first
+        # 5 minutes (300 seconds) are decoded and processed
+        waveform, sample_rate = load_audio(input_path, sr=22050, mono=False, duration=300.0)
+        logger.info(f"Sample rate: {sample_rate}, duration: {waveform.shape[-1]/sample_rate:.1f}s")
         
         # Convert to stereo if needed
         if len(waveform.shape) == 1:
@@ -52,17 +50,10 @@ def separate_audio(input_path, output_dir):
         
         logger.info("Separation complete. Saving tracks...")
         
-        # Save each track
+        # Save each track (predictions are (samples, channels)), encoded concurrently
         track_names = ['vocals', 'drums', 'bass', 'other']
-        
-        for track_name in track_names:
-            if track_name in prediction:
-                track_data = prediction[track_name]
-                output_path = os.path.join(output_dir, f"{track_name}.wav")
-                
-                # Save as WAV file with original sample rate
-                sf.write(output_path, track_data, sample_rate)
-                logger.info(f"Saved {track_name} track to {output_path}")
+        tracks = {name: prediction[name].T for name in track_names if name in prediction}
+        write_stems(tracks, output_dir, sample_rate)
         
         logger.info("All tracks saved successfully!")
         return True
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import os
+import logging
+from math import gcd
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import soundfile as sf
+from stage_timer import stage
+
+logger = logging.getLogger(__name__)
+
+# librosa/soxr resampling presets, slowest and best first
+SOXR_QUALITIES = ('soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'soxr_qq')
+
+# Stem output format -> (file extension, libsndfile subtype)
+OUTPUT_FORMATS = {
+    'wav': ('wav', 'PCM_16'),
+    'flac': ('flac', 'PCM_16'),
+}
+
+# 'auto' uses polyphase filtering when the rate ratio reduces to up/down factors this small
+MAX_POLYPHASE_FACTOR = 8
+
+def polyphase_factors(orig_sr, target_sr):
+    """
+    (up, down) for an integer-ratio resample, e.g. 44100 -> 22050 is (1, 2)
+    """
+    divisor = gcd(int(orig_sr), int(target_sr))
+    return int(target_sr) // divisor, int(orig_sr) // divisor
+
+def resample(y, orig_sr, target_sr, quality='auto'):
+    """
+    Resample along the last axis.
+
+    quality is a soxr preset (SOXR_QUALITIES), 'polyphase' for scipy's
+    resample_poly, or 'auto': polyphase when the ratio reduces to small
+    integer factors (44.1k -> 22.05k, 48k -> 16k), otherwise soxr_hq.
+    """
+    if orig_sr == target_sr:
+        return y
+
+    up, down = polyphase_factors(orig_sr, target_sr)
+    if quality == 'auto':
+        quality = 'polyphase' if max(up, down) <= MAX_POLYPHASE_FACTOR else 'soxr_hq'
+
+    with stage('resample'):
+        if quality == 'polyphase':
+            from scipy.signal import resample_poly
+            return resample_poly(y, up, down, axis=-1).astype(np.float32, copy=False)
+
+        import librosa
+        return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr, res_type=quality)
+
+def load_audio(path, sr=None, mono=True, duration=None, offset=0.0, quality='auto'):
+    """
+    Decode an audio file like librosa.load: returns (y, sr) with y float32,
+    (samples,) if mono or single-channel, else (channels, samples).
+
+    The header is read first so only the requested offset/duration is decoded.
+    soundfile (libsndfile, which also reads MP3 from 1.1 on) does the decoding;
+    other formats fall back to librosa.load. sr=None keeps the native rate,
+    anything else is resampled with resample(quality=...).
+    """
+    with stage('load'):
+        try:
+            info = sf.info(path)
+            native_sr = info.samplerate
+            start = int(offset * native_sr)
+            frames = int(duration * native_sr) if duration is not None else -1
+            data, native_sr = sf.read(path, start=start, frames=frames, dtype='float32', always_2d=True)
+            y = data.mean(axis=1) if mono else np.ascontiguousarray(data.T)
+        except Exception as e:
+            import librosa
+            logger.info(f"soundfile cannot decode {path} ({e}), falling back to librosa")
+            y, native_sr = librosa.load(path, sr=None, mono=mono, offset=offset, duration=duration)
+
+    if y.ndim > 1 and y.shape[0] == 1:
+        y = y[0]
+
+    if sr is None:
+        return y, native_sr
+    return resample(y, native_sr, sr, quality), sr
+
+def stereo_frames(track_data, gains=(1.0, 1.0)):
+    """
+    (samples, 2) frames for writing: a (2, samples) stem as it is, a mono stem
+    duplicated with the given (left, right) gains
+    """
+    if track_data.ndim > 1:
+        return track_data.T
+    left_gain, right_gain = gains
+    return np.column_stack([track_data * left_gain, track_data * right_gain])
+
+def output_format_from_env():
+    """
+    Stem format for jobs from SEPARATION_OUTPUT_FORMAT ('wav' or 'flac'), default 'wav'
+    """
+    output_format = os.environ.get('SEPARATION_OUTPUT_FORMAT', 'wav').lower()
+    if output_format not in OUTPUT_FORMATS:
+        logger.warning(f"Unknown output format {output_format!r}, using wav")
+        return 'wav'
+    return output_format
+
+def write_stem(output_dir, track_name, track_data, sr, headroom=None, gains=(1.0, 1.0), output_format='wav'):
+    """
+    Normalize one stem to headroom (None keeps its level), build stereo frames and encode it
+    """
+    if headroom is not None:
+        peak = np.max(np.abs(track_data))
+        if peak > 0:
+            track_data = track_data * (headroom / peak)
+
+    extension, subtype = OUTPUT_FORMATS[output_format]
+    output_path = os.path.join(output_dir, f"{track_name}.{extension}")
+    sf.write(output_path, stereo_frames(track_data, gains), sr, subtype=subtype)
+    logger.info(f"Saved {track_name}: {track_data.shape[-1]/sr:.1f}s to {output_path}")
+    return output_path
+
+def write_stems(tracks, output_dir, sr, headroom=None, stereo_gains=None, output_format='wav', workers=None):
+    """
+    Post-process and encode every stem concurrently; returns {track_name: path}.
+
+    Each stem is normalized, turned into stereo frames (mono stems get their
+    stereo_gains entry) and written by write_stem() on a thread pool. NumPy
+    and libsndfile release the GIL, so the stems encode in parallel.
+    """
+    workers = workers or len(tracks) or 1
+    with stage('write'), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            track_name: pool.submit(write_stem, output_dir, track_name, track_data, sr, headroom,
+                                    (stereo_gains or {}).get(track_name, (1.0, 1.0)), output_format)
+            for track_name, track_data in tracks.items()
+        }
+        return {track_name: future.result() for track_name, future in futures.items()}
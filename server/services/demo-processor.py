@@ -3,8 +3,7 @@ import sys
 import os
 import logging
 import numpy as np
-import librosa
-import soundfile as sf
+from audio_io import load_audio, write_stems
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,15 +17,12 @@ def create_demo_separation(input_path, output_dir):
         logger.info(f"Loading audio file: {input_path}")
         
         # Load audio file - short duration for demo
-        waveform, sample_rate = librosa.load(input_path, sr=16000, mono=False, duration=30.0)
-        logger.info(f"Sample rate: {sample_rate}, duration: {len(waveform)/sample_rate:.1f}s")
+        waveform, sample_rate = load_audio(input_path, sr=16000, mono=False, duration=30.0)
+        logger.info(f"Sample rate: {sample_rate}, duration: {waveform.shape[-1]/sample_rate:.1f}s")
         
-        # Convert to stereo if needed
+        # (channels, samples): mono is duplicated, stereo keeps its channels
         if len(waveform.shape) == 1:
-            waveform = np.stack([waveform, waveform], axis=1)
-        else:
-            waveform = waveform.reshape(-1, 1)
-            waveform = np.repeat(waveform, 2, axis=1)
+            waveform = np.stack([waveform, waveform])
         
         logger.info(f"Waveform shape: {waveform.shape}")
         logger.info("Creating demo tracks...")
@@ -56,11 +52,8 @@ def create_demo_separation(input_path, output_dir):
         other = other * 0.5
         tracks['other'] = other
         
-        # Save tracks
-        for track_name, track_data in tracks.items():
-            output_path = os.path.join(output_dir, f"{track_name}.wav")
-            sf.write(output_path, track_data, sample_rate)
-            logger.info(f"Saved {track_name} track to {output_path}")
+        # Save tracks (levels as set above, no normalization)
+        write_stems(tracks, output_dir, sample_rate)
         
         logger.info("Demo separation completed successfully!")
         return True
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+CPU inference backends for the Demucs models.
+
+    torch      the stock PyTorch model in float32 (default)
+    int8       PyTorch dynamic int8 quantization of the Linear and LSTM layers
+               (transformer and BLSTM blocks; convolutions stay float32)
+    onnx       every sub-model exported to ONNX and run by ONNX Runtime
+    onnx-int8  the same export with dynamically quantized int8 weights
+
+The converted models are written once to DEMUCS_MODEL_CACHE_DIR (default
+separated/.models) and loaded from there by later processes. ONNX Runtime
+uses DEMUCS_THREADS intra-op threads, like torch does. Sub-models that do
+not export (htdemucs computes a complex STFT inside the graph) stay on
+torch, so 'onnx' is only fully ONNX for the waveform models (mdx_extra_q).
+
+    DEMUCS_BACKEND          torch, int8, onnx or onnx-int8
+    DEMUCS_MODEL_CACHE_DIR  where converted models are kept
+"""
+import os
+import logging
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+
+# Modules ORT needs for each backend
+BACKEND_REQUIREMENTS = {
+    'onnx': ('onnxruntime',),
+    'onnx-int8': ('onnxruntime', 'onnx'),
+}
+
+# Intra-op threads for ONNX Runtime sessions, set with set_num_threads
+_intra_op_threads = None
+
+def backend_from_env():
+    """
+    Backend named by DEMUCS_BACKEND (default 'torch')
+    """
+    backend = os.environ.get('DEMUCS_BACKEND', 'torch').lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown DEMUCS_BACKEND {backend}, using torch")
+        return 'torch'
+    return backend
+
+def resolve_backend(backend=None):
+    """
+    The requested backend (default: $DEMUCS_BACKEND), or 'torch' when its runtime is not installed
+    """
+    backend = backend or backend_from_env()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown Demucs backend: {backend}")
+    missing = [module for module in BACKEND_REQUIREMENTS.get(backend, ()) if importlib.util.find_spec(module) is None]
+    if missing:
+        logger.warning(f"Demucs backend {backend} needs {', '.join(missing)}, using torch")
+        return 'torch'
+    return backend
+
+def model_cache_dir():
+    return os.environ.get('DEMUCS_MODEL_CACHE_DIR', os.path.join(os.getcwd(), 'separated', '.models'))
+
+def artifact_path(model_name, backend, extension, index=None):
+    """
+    Cache file for a converted model; keyed by the torch version, since neither
+    pickled quantized modules nor exported graphs are portable across versions
+    """
+    import torch
+
+    version = torch.__version__.split('+')[0]
+    part = f"-{index}" if index is not None else ''
+    return os.path.join(model_cache_dir(), f"{model_name}{part}-{backend}-torch{version}.{extension}")
+
+def _write_atomically(path, write):
+    """
+    write(tmp_path) then rename, so concurrent workers never load a half-written file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def set_num_threads(threads):
+    """
+    Intra-op thread count for torch and for the ONNX Runtime sessions
+    """
+    global _intra_op_threads
+    import torch
+
+    torch.set_num_threads(threads)
+    _intra_op_threads = threads
+
+def _sub_models(model):
+    """
+    The individual networks of a model: the members of a bag, or the model itself
+    """
+    from demucs.apply import BagOfModels
+
+    return list(model.models) if isinstance(model, BagOfModels) else [model]
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of the Linear and LSTM layers: weights stored as int8,
+    activations quantized on the fly
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8,
+                                                  inplace=True)
+
+def load_int8(model_name, load_pretrained):
+    """
+    The quantized model, from the cache or quantized now and cached
+    """
+    import torch
+
+    path = artifact_path(model_name, 'int8', 'pt')
+    if os.path.exists(path):
+        logger.info(f"Loading int8 {model_name} from {path}")
+        # The whole module is pickled: quantized layers cannot be rebuilt from a state dict alone
+        return torch.load(path, map_location='cpu', weights_only=False)
+
+    model = load_pretrained(model_name).cpu().eval()
+    logger.info(f"Quantizing {model_name} to int8...")
+    model = quantize_int8(model)
+    _write_atomically(path, lambda tmp_path: torch.save(model, tmp_path))
+    return model
+
+class OnnxDemucs:
+    """
+    Stand-in for one Demucs network backed by an ONNX Runtime session.
+
+    Mirrors the attributes demucs.apply.apply_model uses; valid_length() always
+    returns the exported input length, so every chunk is padded to the one
+    shape the graph was exported with and trimmed back by apply_model.
+    Built by onnx_module(), which makes it a torch.nn.Module.
+    """
+    def __init__(self, path, network, input_length):
+        self.path = path
+        self.input_length = input_length
+        self.samplerate = network.samplerate
+        self.audio_channels = network.audio_channels
+        self.sources = network.sources
+        self.segment = network.segment
+        self._session = None
+        self._session_threads = None
+
+    def valid_length(self, length):
+        if length > self.input_length:
+            raise ValueError(f"Chunk of {length} samples is longer than the exported {self.input_length}")
+        return self.input_length
+
+    def session(self):
+        """
+        ONNX Runtime session, recreated when the thread count changed
+        """
+        if self._session is None or self._session_threads != _intra_op_threads:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = _intra_op_threads or 0
+            options.inter_op_num_threads = 1
+            self._session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+            self._session_threads = _intra_op_threads
+        return self._session
+
+    def forward(self, mix):
+        import torch
+
+        sources = self.session().run(None, {'mix': mix.detach().cpu().numpy()})[0]
+        return torch.from_numpy(sources)
+
+def onnx_module(path, network, input_length):
+    """
+    An OnnxDemucs that is also a torch.nn.Module, so it can replace a network
+    inside a BagOfModels and go through apply_model unchanged
+    """
+    import torch
+
+    class OnnxDemucsModule(OnnxDemucs, torch.nn.Module):
+        def __init__(self):
+            torch.nn.Module.__init__(self)
+            OnnxDemucs.__init__(self, path, network, input_length)
+            # apply_model reads the device of a sub-model's first parameter
+            self.placeholder = torch.nn.Parameter(torch.zeros(0), requires_grad=False)
+
+    return OnnxDemucsModule()
+
+def export_onnx(network, path, input_length):
+    """
+    Export one network for a fixed (1, channels, input_length) input
+    """
+    import torch
+
+    example = torch.zeros(1, network.audio_channels, input_length)
+    with torch.no_grad():
+        _write_atomically(path, lambda tmp_path: torch.onnx.export(
+            network, example, tmp_path, input_names=['mix'], output_names=['sources'], opset_version=17))
+
+def quantize_onnx(fp32_path, path):
+    """
+    int8 weights for the MatMul / Gemm / LSTM / Conv nodes of an exported graph
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    _write_atomically(path, lambda tmp_path: quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8))
+
+def load_onnx(model_name, load_pretrained, quantize=False):
+    """
+    The model with every exportable network replaced by an ONNX Runtime session.
+    Exports (and quantizes) what is not cached yet; networks that fail to export
+    keep running on torch.
+    """
+    from demucs.apply import BagOfModels
+
+    backend = 'onnx-int8' if quantize else 'onnx'
+    model = load_pretrained(model_name).cpu().eval()
+    networks = _sub_models(model)
+
+    replaced = []
+    for index, network in enumerate(networks):
+        segment_length = int(network.segment * network.samplerate)
+        input_length = network.valid_length(segment_length) if hasattr(network, 'valid_length') else segment_length
+        fp32_path = artifact_path(model_name, 'onnx', 'onnx', index)
+        path = artifact_path(model_name, backend, 'onnx', index)
+        try:
+            if not os.path.exists(fp32_path):
+                logger.info(f"Exporting {model_name} network {index} to ONNX...")
+                export_onnx(network, fp32_path, input_length)
+            if quantize and not os.path.exists(path):
+                logger.info(f"Quantizing {model_name} network {index} to int8...")
+                quantize_onnx(fp32_path, path)
+            replaced.append(onnx_module(path, network, input_length))
+        except Exception as e:
+            logger.warning(f"{model_name} network {index} cannot run on ONNX Runtime, keeping torch: {e}")
+            replaced.append(network)
+
+    if isinstance(model, BagOfModels):
+        model.models = type(model.models)(replaced)
+        return model
+    return replaced[0]
+
+def load_model(model_name, backend='torch'):
+    """
+    A pretrained Demucs model on CPU, in eval mode, converted for the given backend
+    """
+    # Memory-mapped from the offline model store when the model is there
+    from model_store import load_demucs as load_pretrained
+
+    if backend == 'int8':
+        return load_int8(model_name, load_pretrained)
+    if backend in ('onnx', 'onnx-int8'):
+        return load_onnx(model_name, load_pretrained, quantize=backend == 'onnx-int8')
+
+    model = load_pretrained(model_name)
+    model.cpu()
+    model.eval()
+    return model
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import soundfile as sf
+from stage_timer import stage
+from audio_io import OUTPUT_FORMATS
+from demucs_backends import load_model, resolve_backend, set_num_threads
+
+logger = logging.getLogger(__name__)
+
+# Models already loaded in this process, by (name, backend)
+_models = {}
+
+# Segment-parallel pools, by (model_name, backend, workers, threads)
+_pools = {}
+
+def get_model(model_name='htdemucs', backend=None):
+    """
+    Load a pretrained Demucs model once per process and keep it in memory.
+    backend is one of demucs_backends.BACKENDS (default: $DEMUCS_BACKEND or 'torch').
+    """
+    backend = resolve_backend(backend)
+    if (model_name, backend) not in _models:
+        logger.info(f"Loading Demucs model {model_name} ({backend})...")
+        _models[model_name, backend] = load_model(model_name, backend)
+    return _models[model_name, backend]
+
+def load_audio(input_path, model):
+    """
+    Decode the input into a (channels, samples) tensor at the model's sample rate
+    """
+    import torch
+    from demucs.audio import convert_audio
+
+    try:
+        data, sr = sf.read(input_path, dtype='float32', always_2d=True)
+        data = data.T
+    except Exception:
+        # Formats libsndfile cannot decode (older builds without MP3 support)
+        import librosa
+        data, sr = librosa.load(input_path, sr=None, mono=False)
+        data = np.atleast_2d(data).astype(np.float32)
+
+    wav = torch.from_numpy(np.ascontiguousarray(data))
+    return convert_audio(wav, sr, model.samplerate, model.audio_channels)
+
+def separate_tensor(model, wav, shifts=1, overlap=0.25):
+    """
+    Run the model on a (channels, samples) tensor; returns (sources, channels, samples)
+    """
+    import torch
+    from demucs.apply import apply_model
+
+    # Same input normalization as the demucs CLI
+    ref = wav.mean(0)
+    mean, std = ref.mean(), ref.std() + 1e-8
+
+    with torch.no_grad():
+        sources = apply_model(model, ((wav - mean) / std)[None], device='cpu',
+                              shifts=shifts, split=True, overlap=overlap, progress=False)[0]
+    return sources * std + mean
+
+def _init_segment_worker(model_name, backend, threads):
+    """
+    Pool initializer: pin the intra-op thread count and load the model once per worker
+    """
+    set_num_threads(threads)
+    get_model(model_name, backend)
+
+def _separate_segment(model_name, backend, segment, shifts):
+    """
+    Separate one (already normalized) segment inside a pool worker
+    """
+    import torch
+    from demucs.apply import apply_model
+
+    model = get_model(model_name, backend)
+    with torch.no_grad():
+        sources = apply_model(model, torch.from_numpy(segment)[None], device='cpu',
+                              shifts=shifts, split=True, overlap=0.25, progress=False)[0]
+    return sources.numpy()
+
+def _get_pool(model_name, backend, workers, threads):
+    key = (model_name, backend, workers, threads)
+    if key not in _pools:
+        _pools[key] = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_segment_worker,
+            initargs=(model_name, backend, threads),
+        )
+    return _pools[key]
+
+def segment_bounds(length, segment_length, overlap_length):
+    """
+    (start, end) sample ranges covering length with the given overlap between neighbours
+    """
+    step = segment_length - overlap_length
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + segment_length, length)
+        bounds.append((start, end))
+        if end >= length:
+            break
+        start += step
+    return bounds
+
+def crossfade_weights(start, end, length, overlap_length):
+    """
+    Trapezoid window for a segment: linear ramps where it overlaps its neighbours
+    """
+    n = end - start
+    weights = np.ones(n, dtype=np.float32)
+    ramp = min(overlap_length, n)
+    if start > 0:
+        weights[:ramp] = np.linspace(0, 1, ramp + 2, dtype=np.float32)[1:-1]
+    if end < length:
+        weights[n - ramp:] = np.linspace(1, 0, ramp + 2, dtype=np.float32)[1:-1]
+    return weights
+
+def separate_tensor_parallel(model_name, wav, workers, threads, segment_seconds=30.0,
+                             overlap_seconds=2.0, shifts=1, backend=None):
+    """
+    Split the track into overlapping segments, separate them on a process pool
+    (workers processes x threads intra-op threads each) and crossfade-merge the results
+    """
+    import torch
+
+    backend = resolve_backend(backend)
+    model = get_model(model_name, backend)
+    samplerate = model.samplerate
+    data = wav.numpy()
+
+    ref = data.mean(0)
+    mean, std = ref.mean(), ref.std() + 1e-8
+    data = ((data - mean) / std).astype(np.float32)
+
+    length = data.shape[-1]
+    overlap_length = int(overlap_seconds * samplerate)
+    bounds = segment_bounds(length, int(segment_seconds * samplerate), overlap_length)
+    logger.info(f"Separating {len(bounds)} segments on {workers} workers x {threads} threads")
+
+    pool = _get_pool(model_name, backend, workers, threads)
+    futures = [pool.submit(_separate_segment, model_name, backend, np.ascontiguousarray(data[:, start:end]), shifts)
+               for start, end in bounds]
+
+    merged = np.zeros((len(model.sources), data.shape[0], length), dtype=np.float32)
+    total_weight = np.zeros(length, dtype=np.float32)
+    for (start, end), future in zip(bounds, futures):
+        weights = crossfade_weights(start, end, length, overlap_length)
+        merged[..., start:end] += future.result() * weights
+        total_weight[start:end] += weights
+
+    merged /= np.maximum(total_weight, 1e-8)
+    return torch.from_numpy(merged * std + mean)
+
+def parallel_settings():
+    """
+    Segment-parallel knobs from the environment: DEMUCS_WORKERS x DEMUCS_THREADS.
+    Threads default to an even share of the CPU cores per worker.
+    """
+    workers = max(1, int(os.environ.get('DEMUCS_WORKERS', '1')))
+    threads = int(os.environ.get('DEMUCS_THREADS', '0')) or max(1, (os.cpu_count() or 1) // workers)
+    return workers, threads
+
+def write_sources(sources, model, output_dir, output_format='wav'):
+    """
+    Write every separated source straight to its final file at the model sample rate,
+    encoding the sources concurrently (libsndfile releases the GIL).
+    Sources that peak above full scale are rescaled like demucs.separate's clip='rescale':
+    libsndfile does not clip float to PCM conversion, loud samples would wrap around.
+    """
+    extension, subtype = OUTPUT_FORMATS[output_format]
+
+    def write(name, source):
+        output_path = os.path.join(output_dir, f"{name}.{extension}")
+        source = source / max(1.01 * source.abs().max().item(), 1)
+        sf.write(output_path, source.numpy().T, model.samplerate, subtype=subtype)
+        logger.info(f"Saved {name} track to {output_path}")
+        return output_path
+
+    with ThreadPoolExecutor(max_workers=len(model.sources)) as pool:
+        futures = {name: pool.submit(write, name, source) for source, name in zip(sources, model.sources)}
+        return {name: future.result() for name, future in futures.items()}
+
+def demucs_separate_file(input_path, output_dir, model_name='htdemucs', shifts=1, overlap=0.25,
+                         output_format='wav', workers=None, threads=None, backend=None):
+    """
+    In-process Demucs separation: no CLI subprocess, no MP3 round-trip, no resample to 22050Hz.
+    With workers > 1 (default: $DEMUCS_WORKERS) segments are separated in parallel.
+    backend selects the inference backend (default: $DEMUCS_BACKEND, see demucs_backends.py).
+    """
+    default_workers, default_threads = parallel_settings()
+    workers = workers or default_workers
+    threads = threads or default_threads
+    backend = resolve_backend(backend)
+
+    with stage('model_load'):
+        model = get_model(model_name, backend)
+
+    logger.info(f"Loading audio file: {input_path}")
+    with stage('load'):
+        wav = load_audio(input_path, model)
+    logger.info(f"Separating {wav.shape[-1] / model.samplerate:.1f}s with {model_name} ({backend})...")
+
+    with stage('inference'):
+        if workers > 1:
+            sources = separate_tensor_parallel(model_name, wav, workers, threads, shifts=shifts, backend=backend)
+        else:
+            set_num_threads(threads)
+            sources = separate_tensor(model, wav, shifts=shifts, overlap=overlap)
+    with stage('write'):
+        return write_sources(sources, model, output_dir, output_format)
@@ -2,113 +2,104 @@
 import sys
 import os
 import logging
-import numpy as np
-import librosa
-import soundfile as sf
+from functools import partial
 from scipy import signal
+from spectral_analysis import SpectralAnalysis, onset_gain
+from mask_engine import MaskEngine
+from streaming import stream_separation
+from audio_io import load_audio, write_stems
+from stage_timer import stage
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def fast_separation(input_path, output_dir):
+# Drum emphasis around onsets: frames before/after each onset and the gain applied
+ONSET_WINDOW = (5, 5)
+ONSET_GAIN = 1.5
+
+def fast_stems(y, sr, onset_window=ONSET_WINDOW, onset_gain_factor=ONSET_GAIN, mid_side=False, cache=None,
+               levels=None):
     """
-    Fast audio separation using frequency filtering and spectral subtraction
+    Fast mask pipeline: mono (samples,) or stereo (2, samples) signal -> {track_name: signal}.
+    The band masks are fixed weights; only onset detection depends on the signal's
+    level, through levels (see SpectralAnalysis.onset_frames).
     """
-    try:
-        logger.info(f"Loading audio file: {input_path}")
-        
-        # Load audio with reduced duration for speed
-        y, sr = librosa.load(input_path, sr=16000, mono=True, duration=45.0)
-        logger.info(f"Loaded audio: {len(y)/sr:.1f}s at {sr}Hz")
-        
-        # Get STFT
-        logger.info("Computing spectrogram...")
-        D = librosa.stft(y, n_fft=1024, hop_length=256)
-        magnitude, phase = np.abs(D), np.angle(D)
-        
-        # Frequency bins
-        freqs = librosa.fft_frequencies(sr=sr, n_fft=1024)
-        
-        logger.info("Creating frequency masks...")
-        
-        # Create frequency-based masks
-        vocals_mask = np.ones_like(magnitude)
-        bass_mask = np.ones_like(magnitude) 
-        drums_mask = np.ones_like(magnitude)
-        other_mask = np.ones_like(magnitude)
-        
+    # Get STFT (both channels in one batched pass for stereo input)
+    logger.info("Computing spectrogram...")
+    analysis = SpectralAnalysis(y, sr, n_fft=1024, hop_length=256, mid_side=mid_side, cache=cache)
+    engine = MaskEngine(analysis)
+    
+    logger.info("Creating frequency masks...")
+    
+    with stage('mask'):
+        # Frequency-based masks as per-bin weights (floor outside the band)
         # Vocals: 80Hz - 1000Hz (human voice range)
-        vocal_bins = np.where((freqs >= 80) & (freqs <= 1000))[0]
-        vocals_mask[:] = 0.1  # Start with low values
-        vocals_mask[vocal_bins, :] = 1.0
+        vocals_weights = engine.weights(0.1, [((80, 1000), 1.0)])
         
         # Bass: 20Hz - 200Hz 
-        bass_bins = np.where((freqs >= 20) & (freqs <= 200))[0]
-        bass_mask[:] = 0.1
-        bass_mask[bass_bins, :] = 1.0
+        bass_weights = engine.weights(0.1, [((20, 200), 1.0)])
         
         # Drums: 60Hz - 8000Hz with emphasis on transients
-        drum_bins = np.where((freqs >= 60) & (freqs <= 8000))[0]
-        drums_mask[:] = 0.2
-        drums_mask[drum_bins, :] = 0.8
+        drums_weights = engine.weights(0.2, [((60, 8000), 0.8)])
+        drum_rows = engine.band_rows(60, 8000)
         
-        # Enhance drums with onset detection
-        onset_strength = librosa.onset.onset_strength(y=y, sr=sr)
-        onset_times = librosa.onset.onset_detect(onset_envelope=onset_strength, sr=sr)
-        onset_frames = librosa.time_to_frames(onset_times, sr=sr, hop_length=256)
+        # Enhance drums with onset detection (onsets in STFT frames, no time conversion needed)
+        onset_frames = analysis.onset_frames(levels)
         
         # Boost drums around onset times
-        for frame in onset_frames:
-            if frame < drums_mask.shape[1]:
-                start = max(0, frame-5)
-                end = min(drums_mask.shape[1], frame+5)
-                drums_mask[drum_bins, start:end] *= 1.5
+        drums_gain = onset_gain(onset_frames, analysis.n_frames, *onset_window, gain=onset_gain_factor)
         
         # Other: emphasis on mid-high frequencies
-        other_bins = np.where((freqs >= 500) & (freqs <= 12000))[0]
-        other_mask[:] = 0.3
-        other_mask[other_bins, :] = 0.9
-        
-        logger.info("Generating separated tracks...")
-        
-        # Apply masks and convert back to time domain
-        tracks = {}
-        
-        # Vocals
-        vocals_stft = magnitude * vocals_mask * np.exp(1j * phase)
-        vocals = librosa.istft(vocals_stft, hop_length=256)
-        tracks['vocals'] = vocals
+        other_weights = engine.weights(0.3, [((500, 12000), 0.9)])
+    
+    logger.info("Generating separated tracks...")
+    
+    # Apply masks and convert back to time domain (one batched inverse STFT)
+    tracks = engine.reconstruct_stems({
+        'vocals': dict(mask=vocals_weights),
+        'bass': dict(mask=bass_weights),
+        'drums': dict(mask=drums_weights, frame_gain=drums_gain, gain_rows=drum_rows),
+        'other': dict(mask=other_weights),
+    })
+    
+    return tracks
+
+def fast_separation(input_path, output_dir, streaming=False, channels='mono', native_rate=False,
+                    output_format='wav', cache=None, duration=None):
+    """
+    Fast audio separation using frequency filtering and spectral subtraction.
+    The whole track is processed, in blocks with streaming=True (long inputs);
+    duration (seconds) limits it to the start of the track, e.g. for previews.
+    channels is 'mono', 'stereo' or 'mid_side' (see streaming.CHANNEL_MODES).
+    With native_rate=True the input is processed at its own sample rate (no resampling).
+    output_format is 'wav' or 'flac' (see audio_io.OUTPUT_FORMATS).
+    cache is the job's spectral_cache.SpectralCache, if it has one.
+    """
+    try:
+        separate = partial(fast_stems, mid_side=(channels == 'mid_side'))
+        target_sr = None if native_rate else 16000
+        if streaming:
+            # Onset envelope scale measured once on the loudest block and shared by all blocks
+            separate = partial(separate, levels={})
+            separate = cache.streamed(separate) if cache else separate
+            stream_separation(input_path, output_dir, separate, sr=target_sr, headroom=0.7, channels=channels,
+                              output_format=output_format, prime_block=separate)
+            logger.info("Fast separation completed!")
+            return True
         
-        # Bass
-        bass_stft = magnitude * bass_mask * np.exp(1j * phase)
-        bass = librosa.istft(bass_stft, hop_length=256)
-        tracks['bass'] = bass
+        logger.info(f"Loading audio file: {input_path}")
         
-        # Drums  
-        drums_stft = magnitude * drums_mask * np.exp(1j * phase)
-        drums = librosa.istft(drums_stft, hop_length=256)
-        tracks['drums'] = drums
+        # Full length unless a window was asked for: longer tracks take the streaming path
+        y, sr = load_audio(input_path, sr=target_sr, mono=(channels == 'mono'), duration=duration)
+        logger.info(f"Loaded audio: {y.shape[-1]/sr:.1f}s at {sr}Hz")
         
-        # Other
-        other_stft = magnitude * other_mask * np.exp(1j * phase)
-        other = librosa.istft(other_stft, hop_length=256)
-        tracks['other'] = other
+        tracks = separate(y, sr, cache=cache)
         
         logger.info("Saving tracks...")
         
-        # Normalize and save
-        for track_name, track_data in tracks.items():
-            # Normalize
-            if np.max(np.abs(track_data)) > 0:
-                track_data = track_data / np.max(np.abs(track_data)) * 0.7
-            
-            # Convert to stereo
-            stereo_data = np.column_stack([track_data, track_data])
-            
-            output_path = os.path.join(output_dir, f"{track_name}.wav")
-            sf.write(output_path, stereo_data, sr)
-            logger.info(f"Saved {track_name}: {len(track_data)/sr:.1f}s")
+        # Normalize, convert to stereo (mono stems are duplicated) and save, all stems concurrently
+        write_stems(tracks, output_dir, sr, headroom=0.7, output_format=output_format)
         
         logger.info("Fast separation completed!")
         return True
@@ -120,12 +111,18 @@ def fast_separation(input_path, output_dir):
         return False
 
 def main():
-    if len(sys.argv) != 3:
-        logger.error("Usage: python fast-processor.py <input_file> <output_directory>")
+    flags = sys.argv[1:]
+    streaming = '--stream' in flags
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else 'mono'
+    native_rate = '--native-rate' in flags
+    output_format = 'flac' if '--flac' in flags else 'wav'
+    args = [arg for arg in flags if arg not in ('--stream', '--stereo', '--mid-side', '--native-rate', '--flac')]
+    if len(args) != 2:
+        logger.error("Usage: python fast-processor.py <input_file> <output_directory> [--stream] [--stereo | --mid-side] [--native-rate] [--flac]")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_path = args[0]
+    output_dir = args[1]
     
     if not os.path.exists(input_path):
         logger.error(f"Input file does not exist: {input_path}")
@@ -133,7 +130,8 @@ def main():
     
     os.makedirs(output_dir, exist_ok=True)
     
-    success = fast_separation(input_path, output_dir)
+    success = fast_separation(input_path, output_dir, streaming=streaming, channels=channels,
+                              native_rate=native_rate, output_format=output_format)
     
     if success:
         logger.info("SUCCESS: Fast audio separation completed!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import logging
+from functools import lru_cache
+import numpy as np
+from scipy import fft, signal
+from stage_timer import stage
+
+logger = logging.getLogger(__name__)
+
+# Odd-extension padding on each side, as filtfilt does, long enough for the
+# lowest bands' responses to decay instead of wrapping around the FFT
+PAD_SECONDS = 1.0
+
+@lru_cache(maxsize=64)
+def butter_sos(sr, band, order=3):
+    """
+    Cached Butterworth SOS for band = (low_hz, high_hz); a None edge makes it a
+    low-pass (None, high) or high-pass (low, None)
+    """
+    low, high = band
+    if low is None:
+        return signal.butter(order, high, btype='low', fs=sr, output='sos')
+    if high is None:
+        return signal.butter(order, low, btype='high', fs=sr, output='sos')
+    return signal.butter(order, [low, high], btype='band', fs=sr, output='sos')
+
+def zero_phase_response(sr, bands, n_fft, order=3):
+    """
+    |H(f)|^2 on the rfft grid of n_fft for the cascade of bands, i.e. what
+    filtfilt of each filter in turn applies to the spectrum. Not cached itself:
+    responses are as long as the signal, cache the combined design instead.
+    """
+    sos = np.concatenate([butter_sos(sr, band, order) for band in bands])
+    _, h = signal.sosfreqz(sos, worN=fft.rfftfreq(n_fft, 1 / sr), fs=sr)
+    return (h.real ** 2 + h.imag ** 2).astype(np.float32)
+
+def _odd_extend(y, pad):
+    """
+    filtfilt-style odd extension by pad samples on both ends of the last axis
+    """
+    head = 2 * y[..., :1] - y[..., pad:0:-1]
+    tail = 2 * y[..., -1:] - y[..., -2:-pad - 2:-1]
+    return np.concatenate([head, y, tail], axis=-1)
+
+def crossover(y, sr, design, pad_seconds=PAD_SECONDS):
+    """
+    Run a zero-phase filter bank over y in one FFT pass.
+
+    design(sr, n_fft) returns the (outputs, n_fft // 2 + 1) power responses
+    of every output (linear combinations of zero_phase_response(); only worth
+    caching for streamed blocks, which share n_fft). y is (samples,) or
+    (channels, samples); the signal is transformed once, every output is a
+    product with its response, and all outputs come back from one batched
+    inverse FFT as a float32 (outputs, [channels,] samples) array.
+    """
+    length = y.shape[-1]
+    pad = min(int(pad_seconds * sr), length - 1)
+    n_fft = fft.next_fast_len(length + 2 * pad, real=True)
+
+    with stage('filter'):
+        spectrum = fft.rfft(_odd_extend(y.astype(np.float32, copy=False), pad), n=n_fft, axis=-1)
+        responses = design(sr, n_fft)
+        responses = responses.reshape(responses.shape[:1] + (1,) * (y.ndim - 1) + responses.shape[1:])
+        outputs = fft.irfft(responses * spectrum, n=n_fft, axis=-1, overwrite_x=True)
+    return outputs[..., pad:pad + length]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Admission control for concurrent separation jobs.
+
+Jobs wait in a priority queue (higher "priority" first, then arrival order)
+and are admitted only while a worker slot is free and the node's memory
+budget covers the job's reservation: the expected peak footprint of the
+processor chosen for it, planned against the memory the running jobs have
+not already reserved. So simultaneous jobs no longer all see the same free
+RAM and all pick Demucs; later ones get a cheaper processor or wait.
+
+When the queue is full new jobs are rejected instead of piling up, and
+every accepted job is told its queue position. stats() reports queue depth,
+reservations and wait times:
+
+    SEPARATION_MEMORY_MB   memory budget for running jobs (default 80% of available)
+    SEPARATION_MAX_QUEUE   queued jobs before new ones are rejected (default 32)
+"""
+import os
+import time
+import math
+import heapq
+import logging
+import threading
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE = 32
+
+# Job fields that must be numbers when present
+NUMERIC_FIELDS = ('priority', 'latency_budget', 'memory_limit_mb')
+
+def memory_budget_mb():
+    """
+    Memory the scheduler may reserve for running jobs, from SEPARATION_MEMORY_MB
+    or 80% of the currently available memory
+    """
+    if os.environ.get('SEPARATION_MEMORY_MB'):
+        return float(os.environ['SEPARATION_MEMORY_MB'])
+    return psutil.virtual_memory().available / (1024 * 1024) * 0.8
+
+def invalid_field(job):
+    """
+    Error message for the first numeric job field that is not a number, or None
+    """
+    for field in NUMERIC_FIELDS:
+        value = job.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"Job field '{field}' must be a number"
+    return None
+
+class JobScheduler:
+    """
+    Bounded, memory-aware dispatcher in front of a pool of workers.
+
+    plan(job, free_mb) returns (processor_type, reservation_mb) for a job given
+    the unreserved memory; launch(job, reply, processor_type, admission, done)
+    starts it and must call done() once it has been answered, which releases
+    the slot and its reservation. The head of the queue waits while its reservation does not
+    fit (unless nothing is running, so an oversized job cannot stall forever).
+    """
+    def __init__(self, plan, launch, workers=1, memory_mb=None, max_queue=None):
+        self.plan = plan
+        self.launch = launch
+        self.workers = workers
+        self.memory_mb = memory_mb if memory_mb is not None else memory_budget_mb()
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get('SEPARATION_MAX_QUEUE',
+                                                                                     DEFAULT_MAX_QUEUE))
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._queue = []
+        self._sequence = 0
+        self._running = 0
+        # Set while one thread runs plan() outside the lock
+        self._planning = False
+        self._reserved_mb = 0.0
+        self._admitted = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, job, reply):
+        """
+        Queue a job; reply() gets a {"event": "queued", "position"} notice, or the
+        rejection if the queue is full or the job has a non-numeric priority or
+        limit. Returns False when rejected.
+        """
+        error = invalid_field(job)
+        if error:
+            reply({'id': job.get('id'), 'success': False, 'error': error})
+            return False
+
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                depth = len(self._queue)
+            else:
+                depth = None
+                priority = float(job.get('priority') or 0)
+                entry = (-priority, self._sequence, {'job': job, 'reply': reply, 'queued_at': time.time()})
+                self._sequence += 1
+                heapq.heappush(self._queue, entry)
+                position = sum(1 for other in self._queue if other < entry) + 1
+
+        if depth is not None:
+            logger.warning(f"Rejecting job {job.get('id')}: {depth} jobs already queued")
+            reply({'id': job.get('id'), 'success': False, 'rejected': True,
+                   'error': "Separation queue is full, try again later", 'queue_depth': depth})
+            return False
+
+        reply({'id': job.get('id'), 'event': 'queued', 'position': position})
+        self._dispatch()
+        return True
+
+    def _dispatch(self):
+        """
+        Admit queued jobs while a slot is free and their reservations fit.
+
+        plan() reads the input and may import a processor, so it runs outside
+        the lock, by one dispatching thread at a time; its result is only used
+        if the head of the queue and the unreserved memory did not change
+        meanwhile, otherwise the loop takes a new snapshot.
+        """
+        while True:
+            with self._lock:
+                if not self._queue or self._running >= self.workers or self._planning:
+                    return
+                entry = self._queue[0][2]
+                free_mb = self.memory_mb - self._reserved_mb
+                plan = entry.get('plan')
+                # Re-plan when the unreserved memory changed since the last attempt
+                planning = plan is None or plan[2] != free_mb
+                self._planning = planning
+
+            if planning:
+                try:
+                    plan = self.plan(entry['job'], free_mb) + (free_mb,)
+                except Exception as e:
+                    # A job that cannot be planned is answered, not left blocking the queue
+                    with self._lock:
+                        self._planning = False
+                        self._queue = [queued for queued in self._queue if queued[2] is not entry]
+                        heapq.heapify(self._queue)
+                        self._idle.notify_all()
+                    logger.error(f"Cannot plan job {entry['job'].get('id')}: {e}")
+                    entry['reply']({'id': entry['job'].get('id'), 'success': False,
+                                    'error': f"Cannot plan job: {e}"})
+                    continue
+
+            with self._lock:
+                if planning:
+                    self._planning = False
+                    entry['plan'] = plan
+                if (not self._queue or self._queue[0][2] is not entry or self._running >= self.workers
+                        or self.memory_mb - self._reserved_mb != free_mb):
+                    continue
+
+                processor_type, reservation_mb, _ = plan
+                if reservation_mb > free_mb and self._running > 0:
+                    return
+
+                heapq.heappop(self._queue)
+                wait_seconds = time.time() - entry['queued_at']
+                self._running += 1
+                self._reserved_mb += reservation_mb
+                self._admitted += 1
+                self._total_wait += wait_seconds
+                self._max_wait = max(self._max_wait, wait_seconds)
+                admission = {
+                    'wait_seconds': round(wait_seconds, 3),
+                    'reserved_mb': round(reservation_mb, 1),
+                    'queue_depth': len(self._queue),
+                }
+
+            logger.info(f"Admitting job {entry['job'].get('id')}: {processor_type}, "
+                        f"{reservation_mb:.0f}MB reserved, waited {wait_seconds:.1f}s")
+            try:
+                self.launch(entry['job'], entry['reply'], processor_type, admission,
+                            lambda reservation_mb=reservation_mb: self._release(reservation_mb))
+            except Exception as e:
+                logger.error(f"Cannot launch job {entry['job'].get('id')}: {e}")
+                entry['reply']({'id': entry['job'].get('id'), 'success': False, 'error': str(e)})
+                self._release(reservation_mb)
+                return
+
+    def _release(self, reservation_mb):
+        with self._lock:
+            self._running -= 1
+            self._reserved_mb -= reservation_mb
+            self._idle.notify_all()
+        self._dispatch()
+
+    def wait_idle(self):
+        """
+        Block until nothing is queued or running (every job has been answered)
+        """
+        with self._idle:
+            self._idle.wait_for(lambda: not self._queue and self._running == 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': len(self._queue),
+                'running': self._running,
+                'workers': self.workers,
+                'reserved_mb': round(self._reserved_mb, 1),
+                'memory_mb': round(self.memory_mb, 1),
+                'admitted': self._admitted,
+                'rejected': self._rejected,
+                'mean_wait_seconds': round(self._total_wait / self._admitted, 3) if self._admitted else 0.0,
+                'max_wait_seconds': round(self._max_wait, 3),
+            }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MaskEngine:
+    """
+    Mask application and reconstruction shared by the spectral processors.
+
+    Band masks are per-bin float32 weight vectors broadcast over the frames
+    when a stem spectrum is built, instead of full (freq, frames) arrays.
+    Band rows always index the frequency axis, so the same masks broadcast
+    over a leading channel axis for stereo and mid/side analyses.
+    Stem spectra are complex64 and written into one reused buffer with out=,
+    and the mixture phase comes from the analysis (computed once). When the
+    source is the mixture itself, magnitude * phase is just the STFT, so no
+    phase multiply is needed at all.
+    Spectra are allocated from the analysis' scratch space and built one
+    frame block at a time, so they can be file-backed on long tracks.
+    """
+    def __init__(self, analysis):
+        self.analysis = analysis
+        self._buffer = None
+
+    def weights(self, floor, bands=()):
+        """
+        Per-bin weights: floor everywhere, then value for each ((low_hz, high_hz), value) band
+        """
+        weights = np.full(len(self.analysis.freqs), floor, dtype=np.float32)
+        for (low_hz, high_hz), value in bands:
+            weights[self.analysis.band(low_hz, high_hz)] = value
+        return weights
+
+    def band_rows(self, low_hz, high_hz):
+        """
+        Contiguous row slice for low_hz <= f <= high_hz (a view, unlike boolean indexing)
+        """
+        bins = np.flatnonzero(self.analysis.band(low_hz, high_hz))
+        if len(bins) == 0:
+            return slice(0, 0)
+        return slice(bins[0], bins[-1] + 1)
+
+    def buffer(self):
+        """
+        Complex64 ([channels,] freq, frames) scratch spectrum reused for every stem
+        """
+        if self._buffer is None:
+            self._buffer = self.analysis.scratch.empty(self.analysis.stft.shape, np.complex64)
+        return self._buffer
+
+    def masked(self, mask, source, rows=None, floor=0.0, out=None):
+        """
+        source * mask written into out (allocated like source if None).
+
+        mask is a per-bin weight vector or a (..., freq, frames) mask; with rows
+        it only covers that band and every other bin is scaled by floor. out may
+        have extra leading (channel) dimensions that source broadcasts over.
+        """
+        if out is None:
+            out = self.analysis.scratch.empty(source.shape, source.dtype)
+        if mask.ndim == 1:
+            mask = mask[:, None]
+
+        if rows is None:
+            np.multiply(source, mask, out=out)
+            return out
+
+        if floor == 0:
+            out.fill(0)
+        else:
+            np.multiply(source, floor, out=out)
+        np.multiply(source[..., rows, :], mask, out=out[..., rows, :])
+        return out
+
+    def spectrum(self, mask, source=None, rows=None, floor=0.0, frame_gain=None, gain_rows=None, out=None):
+        """
+        Masked stem spectrum: source magnitude * mask * mixture phase (complex64).
+
+        source is a magnitude spectrogram (e.g. the harmonic part) or None for
+        the mixture. frame_gain optionally scales the frames of gain_rows
+        (e.g. onset emphasis on the drum band).
+        """
+        if out is None:
+            out = self.buffer()
+        for _, _, frames in self.analysis.scratch.frame_blocks(self.analysis.n_frames):
+            self._spectrum_frames(frames, out, mask, source, rows, floor, frame_gain, gain_rows)
+        return out
+
+    def _spectrum_frames(self, frames, out, mask, source=None, rows=None, floor=0.0, frame_gain=None,
+                         gain_rows=None):
+        """
+        spectrum() for the frames slice only, written into out[..., frames]
+        """
+        out = out[..., frames]
+        if mask.ndim > 1:
+            mask = mask[..., frames]
+        self.masked(mask, (self.analysis.stft if source is None else source)[..., frames], rows, floor, out)
+
+        if frame_gain is not None:
+            gain_view = out[..., gain_rows if gain_rows is not None else slice(None), :]
+            np.multiply(gain_view, frame_gain[frames].astype(np.float32), out=gain_view)
+
+        if source is not None:
+            np.multiply(out, self.analysis.phase[..., frames], out=out)
+
+    def reconstruct(self, mask, source=None, rows=None, floor=0.0, frame_gain=None, gain_rows=None):
+        """
+        Masked stem back in the time domain
+        """
+        return self.analysis.istft(self.spectrum(mask, source, rows, floor, frame_gain, gain_rows))
+
+    def reconstruct_stems(self, stems):
+        """
+        All stems back in the time domain with one batched inverse STFT.
+
+        stems maps track name -> keyword arguments for spectrum(). Every stem
+        spectrum is written into its slot of one (stems, freq, frames) complex64
+        stack, which is inverted in a single call into a preallocated float32
+        (stems, [channels,] samples) array. Returns {track_name: view of that array}.
+        """
+        names = list(stems)
+        stack = self.analysis.scratch.empty((len(names),) + self.analysis.stft.shape, np.complex64)
+        for _, _, frames in self.analysis.scratch.frame_blocks(self.analysis.n_frames):
+            for i, name in enumerate(names):
+                self._spectrum_frames(frames, stack[i], **stems[name])
+
+        signals = np.empty((len(names),) + self.analysis.stft.shape[:-2] + (self.analysis.length,),
+                           dtype=np.float32)
+        self.analysis.istft(stack, out=signals)
+        return dict(zip(names, signals))
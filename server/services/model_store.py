@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Local, offline store of the pretrained separation models.
+
+    <store>/manifest.json                 models, their files, sizes and SHA-256
+    <store>/demucs/<model>/<index>.pt     one network each: class, init args, float32 weights
+    <store>/spleeter/<model_dir>/         Spleeter checkpoint, as its model provider lays it out
+
+install_ai_dependencies.py --models fills it (or `model_store.py install`).
+Demucs networks are then loaded with torch.load(mmap=True) into a model built
+on the meta device and load_state_dict(assign=True): the parameters are views
+of the mapped file, so every worker process on the node reads the same
+page-cache pages instead of deserializing its own copy, and nothing is
+downloaded. Spleeter checkpoints are TensorFlow files, read by Spleeter
+itself; the store only makes them available offline (MODEL_PATH).
+
+    SEPARATION_MODEL_STORE   store directory (default models/)
+    SEPARATION_OFFLINE=1     never download: a model missing from the store is an error
+
+    python server/services/model_store.py install demucs:htdemucs demucs:mdx_extra_q spleeter:4stems-wq-16kHz
+    python server/services/model_store.py verify
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from result_cache import hash_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+
+DEFAULT_MODELS = ('demucs:htdemucs', 'demucs:mdx_extra_q')
+
+def store_dir():
+    return os.environ.get('SEPARATION_MODEL_STORE', os.path.join(os.getcwd(), 'models'))
+
+def offline():
+    return os.environ.get('SEPARATION_OFFLINE', '0').lower() in ('1', 'on', 'true')
+
+def load_manifest(store=None):
+    path = os.path.join(store or store_dir(), MANIFEST)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'models': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(manifest, store):
+    path = os.path.join(store, MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _file_entries(store, paths):
+    """
+    {path relative to the store: {bytes, sha256}} for the given files
+    """
+    return {os.path.relpath(path, store): {'bytes': os.path.getsize(path), 'sha256': hash_file(path)}
+            for path in paths}
+
+def _register(store, key, entry):
+    manifest = load_manifest(store)
+    entry['installed_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    manifest['models'][key] = entry
+    _save_manifest(manifest, store)
+    logger.info(f"Stored {key}: {len(entry['files'])} files, "
+                f"{sum(info['bytes'] for info in entry['files'].values()) / 2**20:.0f}MB")
+
+def install_demucs(model_name, store=None):
+    """
+    Download a pretrained Demucs model once and store each network as a torch zip
+    file (class, init args and state) that torch.load can memory-map
+    """
+    import torch
+    from demucs.apply import BagOfModels
+    from demucs.pretrained import get_model as load_pretrained
+
+    store = store or store_dir()
+    model = load_pretrained(model_name)
+    networks = list(model.models) if isinstance(model, BagOfModels) else [model]
+
+    model_dir = os.path.join(store, 'demucs', model_name)
+    os.makedirs(model_dir, exist_ok=True)
+    paths = []
+    for index, network in enumerate(networks):
+        args, kwargs = network._init_args_kwargs
+        package = {
+            'klass': network.__class__,
+            'args': args,
+            'kwargs': kwargs,
+            'segment': network.segment,
+            # Dequantized float32 weights (mdx_extra_q ships them compressed), mapped as they are
+            'state': {name: tensor.detach().contiguous() for name, tensor in network.state_dict().items()},
+        }
+        path = os.path.join(model_dir, f"{index}.pt")
+        torch.save(package, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+
+    _register(store, f"demucs:{model_name}", {
+        'kind': 'demucs',
+        'bag': isinstance(model, BagOfModels),
+        'weights': [list(weights) for weights in model.weights] if isinstance(model, BagOfModels) else None,
+        'networks': [os.path.relpath(path, store) for path in paths],
+        'files': _file_entries(store, paths),
+    })
+
+def install_spleeter(config, store=None):
+    """
+    Fetch a Spleeter model into the store through Spleeter's own model provider
+    """
+    store = store or store_dir()
+    # Spleeter reads MODEL_PATH when it is first imported
+    os.environ['MODEL_PATH'] = os.path.join(store, 'spleeter')
+    from spleeter.model.provider import ModelProvider
+    from spleeter.utils.configuration import load_configuration
+
+    model_dir = ModelProvider.default().get(load_configuration(f"spleeter:{config}")['model_dir'])
+    paths = [os.path.join(root, name) for root, _, names in os.walk(model_dir) for name in names]
+    _register(store, f"spleeter:{config}", {'kind': 'spleeter', 'files': _file_entries(store, paths)})
+
+def install(models=DEFAULT_MODELS, store=None):
+    """
+    Populate the store with models named 'demucs:<name>' or 'spleeter:<config>'.
+    Returns the models that failed.
+    """
+    failed = []
+    for model in models:
+        kind, _, name = model.partition(':')
+        try:
+            if kind == 'demucs':
+                install_demucs(name, store)
+            elif kind == 'spleeter':
+                install_spleeter(name, store)
+            else:
+                raise ValueError(f"Unknown model kind: {kind}")
+        except Exception as e:
+            logger.error(f"Could not store {model}: {e}")
+            failed.append(model)
+    return failed
+
+def verify(store=None):
+    """
+    Re-hash every stored file; returns {model: [problems]} for the models that do not match
+    """
+    store = store or store_dir()
+    problems = {}
+    for key, entry in load_manifest(store)['models'].items():
+        for relpath, info in entry['files'].items():
+            path = os.path.join(store, relpath)
+            if not os.path.exists(path):
+                problems.setdefault(key, []).append(f"{relpath} is missing")
+            elif os.path.getsize(path) != info['bytes'] or hash_file(path) != info['sha256']:
+                problems.setdefault(key, []).append(f"{relpath} does not match its checksum")
+    return problems
+
+def _entry(key, store):
+    """
+    Manifest entry of a stored model whose files are all present with the recorded sizes
+    (full checksums are left to verify(), hashing GBs on every startup would defeat the point)
+    """
+    entry = load_manifest(store)['models'].get(key)
+    if entry is None:
+        return None
+    for relpath, info in entry['files'].items():
+        path = os.path.join(store, relpath)
+        if not os.path.exists(path) or os.path.getsize(path) != info['bytes']:
+            logger.warning(f"Model store entry {key} is incomplete ({relpath}), ignoring it")
+            return None
+    return entry
+
+def _build_network(path):
+    """
+    One Demucs network with its parameters mapped from the stored file
+    """
+    import torch
+
+    package = torch.load(path, map_location='cpu', mmap=True, weights_only=False)
+    klass, args, kwargs, state = package['klass'], package['args'], package['kwargs'], package['state']
+    try:
+        # No weights are allocated on the meta device; assign=True keeps the mapped tensors
+        with torch.device('meta'):
+            network = klass(*args, **kwargs)
+        network.load_state_dict(state, assign=True)
+        unmapped = [name for name, tensor in list(network.named_parameters()) + list(network.named_buffers())
+                    if tensor.is_meta]
+        if unmapped:
+            raise ValueError(f"tensors not in the stored state: {', '.join(unmapped[:3])}")
+    except Exception as e:
+        logger.warning(f"Cannot map {path} ({e}), copying its weights instead")
+        network = klass(*args, **kwargs)
+        network.load_state_dict(state)
+    network.segment = package['segment']
+    return network
+
+def load_demucs(model_name, store=None):
+    """
+    A pretrained Demucs model from the store (memory-mapped), or downloaded by
+    demucs when it is not stored and SEPARATION_OFFLINE is not set
+    """
+    store = store or store_dir()
+    entry = _entry(f"demucs:{model_name}", store)
+    if entry is None:
+        if offline():
+            raise RuntimeError(f"Demucs model {model_name} is not in the model store {store} "
+                               f"(run model_store.py install demucs:{model_name})")
+        from demucs.pretrained import get_model as load_pretrained
+        return load_pretrained(model_name)
+
+    networks = [_build_network(os.path.join(store, relpath)) for relpath in entry['networks']]
+    if not entry['bag']:
+        return networks[0]
+
+    from demucs.apply import BagOfModels
+    return BagOfModels(networks, entry['weights'])
+
+def use_spleeter_store(store=None):
+    """
+    Point Spleeter at the store when it holds Spleeter models; must run before spleeter is imported
+    """
+    store = store or store_dir()
+    if any(entry['kind'] == 'spleeter' for entry in load_manifest(store)['models'].values()):
+        os.environ.setdefault('MODEL_PATH', os.path.join(store, 'spleeter'))
+    elif offline():
+        logger.warning(f"No Spleeter model in the model store {store}; Spleeter will try to download it")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Offline model store")
+    parser.add_argument('--store', help="Store directory (default: $SEPARATION_MODEL_STORE or models/)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    install_parser = commands.add_parser('install', help="Download models into the store")
+    install_parser.add_argument('models', nargs='*', default=list(DEFAULT_MODELS),
+                                help="demucs:<name> or spleeter:<config> (default: %(default)s)")
+    commands.add_parser('verify', help="Check every stored file against its checksum")
+    commands.add_parser('list', help="Print the manifest")
+    args = parser.parse_args()
+
+    store = args.store or store_dir()
+    if args.command == 'install':
+        sys.exit(1 if install(args.models, store) else 0)
+    elif args.command == 'verify':
+        problems = verify(store)
+        for key, messages in problems.items():
+            for message in messages:
+                logger.error(f"{key}: {message}")
+        sys.exit(1 if problems else 0)
+    else:
+        print(json.dumps(load_manifest(store), indent=2))
+
+if __name__ == "__main__":
+    main()
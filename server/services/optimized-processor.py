@@ -2,107 +2,108 @@
 import sys
 import os
 import logging
-import numpy as np
+from functools import partial
 import librosa
-import soundfile as sf
+from spectral_analysis import SpectralAnalysis
+from mask_engine import MaskEngine
+from streaming import stream_separation
+from audio_io import load_audio, write_stems
+from stage_timer import stage
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def optimized_separation(input_path, output_dir):
+def optimized_stems(y, sr, mid_side=False, cache=None):
     """
-    Optimized audio separation using librosa and spectral techniques
+    Optimized mask pipeline: mono (samples,) or stereo (2, samples) signal -> {track_name: signal}
     """
-    try:
-        logger.info(f"Loading audio file: {input_path}")
-        
-        # Load audio file with optimized settings
-        y, sr = librosa.load(input_path, sr=22050, mono=False, duration=60.0)  # Limit to 1 minute
-        logger.info(f"Sample rate: {sr}, shape: {y.shape}")
-        
-        # Convert to mono for processing, then duplicate for stereo output
-        if len(y.shape) > 1:
-            y_mono = librosa.to_mono(y)
-        else:
-            y_mono = y
-            
-        logger.info("Performing harmonic-percussive separation...")
-        
-        # Harmonic-percussive separation
-        y_harmonic, y_percussive = librosa.effects.hpss(y_mono, margin=(1.0, 5.0))
-        
-        logger.info("Performing spectral analysis...")
-        
-        # Get spectrograms
-        S_full, phase = librosa.magphase(librosa.stft(y_mono))
-        S_harmonic = np.abs(librosa.stft(y_harmonic))
-        S_percussive = np.abs(librosa.stft(y_percussive))
-        
-        # Create frequency masks
-        freqs = librosa.fft_frequencies(sr=sr)
-        
+    logger.info("Performing spectral analysis and harmonic-percussive separation...")
+    
+    # Get spectrograms from a single STFT pass (HPSS on the spectrogram)
+    analysis = SpectralAnalysis(y, sr, hpss_margin=(1.0, 5.0), mid_side=mid_side, cache=cache)
+    engine = MaskEngine(analysis)
+    S_harmonic = analysis.harmonic
+    S_percussive = analysis.percussive
+    
+    # Create frequency masks (per-bin weights)
+    with stage('mask'):
         # Vocals mask (human voice frequencies: 80Hz - 1100Hz with peak around 300-3400Hz)
-        vocals_mask = np.zeros_like(S_full)
-        vocal_indices = np.where((freqs >= 80) & (freqs <= 3400))[0]
-        vocals_mask[vocal_indices, :] = 1.0
+        vocals_weights = engine.weights(0.0, [((80, 3400), 1.0)])
         
         # Bass mask (low frequencies: 20Hz - 250Hz)
-        bass_mask = np.zeros_like(S_full)
-        bass_indices = np.where((freqs >= 20) & (freqs <= 250))[0]
-        bass_mask[bass_indices, :] = 1.0
+        bass_weights = engine.weights(0.0, [((20, 250), 1.0)])
         
         # Drums mask (use percussive component + mid-high frequencies)
-        drums_mask = np.zeros_like(S_full)
-        drum_indices = np.where((freqs >= 60) & (freqs <= 8000))[0]
-        drums_mask[drum_indices, :] = 1.0
-        
-        logger.info("Creating separated tracks...")
-        
-        # Apply masks and create tracks
-        tracks = {}
-        
+        drums_weights = engine.weights(0.0, [((60, 8000), 1.0)])
+    
+    logger.info("Creating separated tracks...")
+    
+    # Apply masks and create tracks (one batched inverse STFT)
+    tracks = {}
+    stems = engine.reconstruct_stems({
+        'vocals': dict(mask=vocals_weights, source=S_harmonic),
+        'bass': dict(mask=bass_weights, source=S_harmonic),
+        'drums': dict(mask=drums_weights, source=S_percussive),
+    })
+    
+    # Per-stem post-filtering (normalizing and encoding run later, in the write pool)
+    with stage('postprocess'):
         # Vocals: harmonic content in vocal frequency range
-        vocals_stft = S_harmonic * vocals_mask * phase
-        vocals = librosa.istft(vocals_stft)
+        vocals = stems['vocals']
         # Enhance vocals by reducing bass frequencies
         vocals_filtered = librosa.effects.preemphasis(vocals)
         tracks['vocals'] = vocals_filtered
-        
+    
         # Bass: low frequency harmonic content
-        bass_stft = S_harmonic * bass_mask * phase
-        bass = librosa.istft(bass_stft)
+        bass = stems['bass']
         # Enhance bass with low-pass filtering
         bass_enhanced = librosa.effects.preemphasis(bass, coef=-0.97)  # Negative for bass boost
         tracks['bass'] = bass_enhanced
-        
+    
         # Drums: percussive content
-        drums_stft = S_percussive * drums_mask * phase
-        drums = librosa.istft(drums_stft)
+        drums = stems['drums']
         # Enhance drums with dynamic range compression
         tracks['drums'] = drums
-        
+    
         # Other: residual (original - vocals - bass - drums)
-        other = y_mono - (vocals_filtered + bass_enhanced + drums) * 0.3
+        other = y - (vocals_filtered + bass_enhanced + drums) * 0.3
         tracks['other'] = other
+    
+    return tracks
+
+def optimized_separation(input_path, output_dir, streaming=False, channels='mono', native_rate=False,
+                         output_format='wav', cache=None):
+    """
+    Optimized audio separation using librosa and spectral techniques.
+    With streaming=True the whole track is processed in blocks instead of the first minute.
+    channels is 'mono', 'stereo' or 'mid_side' (see streaming.CHANNEL_MODES).
+    With native_rate=True the input is processed at its own sample rate (no resampling).
+    output_format is 'wav' or 'flac' (see audio_io.OUTPUT_FORMATS).
+    cache is the job's spectral_cache.SpectralCache, if it has one.
+    """
+    try:
+        separate = partial(optimized_stems, mid_side=(channels == 'mid_side'))
+        target_sr = None if native_rate else 22050
+        if streaming:
+            stream_separation(input_path, output_dir, cache.streamed(separate) if cache else separate,
+                              sr=target_sr, headroom=0.8, channels=channels, output_format=output_format)
+            logger.info("Optimized separation completed successfully!")
+            return True
+        
+        logger.info(f"Loading audio file: {input_path}")
+        
+        # Load audio file with optimized settings
+        # Folded to mono unless processing in stereo
+        y, sr = load_audio(input_path, sr=target_sr, mono=(channels == 'mono'), duration=60.0)  # Limit to 1 minute
+        logger.info(f"Sample rate: {sr}, shape: {y.shape}")
+        
+        tracks = separate(y, sr, cache=cache)
         
         logger.info("Saving tracks...")
         
-        # Normalize and save tracks
-        for track_name, track_data in tracks.items():
-            # Normalize audio
-            if np.max(np.abs(track_data)) > 0:
-                track_data = track_data / np.max(np.abs(track_data)) * 0.8
-            
-            # Convert to stereo
-            if len(track_data.shape) == 1:
-                stereo_data = np.column_stack([track_data, track_data])
-            else:
-                stereo_data = track_data
-            
-            output_path = os.path.join(output_dir, f"{track_name}.wav")
-            sf.write(output_path, stereo_data, sr)
-            logger.info(f"Saved {track_name} track to {output_path}")
+        # Normalize, convert to stereo and save tracks concurrently
+        write_stems(tracks, output_dir, sr, headroom=0.8, output_format=output_format)
         
         logger.info("Optimized separation completed successfully!")
         return True
@@ -114,12 +115,18 @@ def optimized_separation(input_path, output_dir):
         return False
 
 def main():
-    if len(sys.argv) != 3:
-        logger.error("Usage: python optimized-processor.py <input_file> <output_directory>")
+    flags = sys.argv[1:]
+    streaming = '--stream' in flags
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else 'mono'
+    native_rate = '--native-rate' in flags
+    output_format = 'flac' if '--flac' in flags else 'wav'
+    args = [arg for arg in flags if arg not in ('--stream', '--stereo', '--mid-side', '--native-rate', '--flac')]
+    if len(args) != 2:
+        logger.error("Usage: python optimized-processor.py <input_file> <output_directory> [--stream] [--stereo | --mid-side] [--native-rate] [--flac]")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_path = args[0]
+    output_dir = args[1]
     
     # Validate input file exists
     if not os.path.exists(input_path):
@@ -130,7 +137,8 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     # Perform separation
-    success = optimized_separation(input_path, output_dir)
+    success = optimized_separation(input_path, output_dir, streaming=streaming, channels=channels,
+                                   native_rate=native_rate, output_format=output_format)
     
     if success:
         logger.info("Optimized audio separation completed successfully!")
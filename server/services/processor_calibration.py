@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Per-host cost model for processor selection.
+
+Calibration runs every available processor on the synthetic test mix of a
+few durations, each in a fresh interpreter, and fits
+
+    seconds = fixed_seconds + seconds_per_audio_second * duration
+    peak MB = fixed_mb + mb_per_audio_second * duration
+
+per processor. The model is stored as JSON (SEPARATION_COST_MODEL, default
+separated/.cost_model.json) and read by ai-processor's select_processor():
+
+    python ai-processor.py --calibrate --durations 10 30
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import resource
+import tempfile
+import numpy as np
+from synthetic import write_signal
+from subprocess_case import report_result, run_in_fresh_interpreter
+
+logger = logging.getLogger(__name__)
+
+# Bump when the file layout changes
+COST_MODEL_VERSION = 1
+
+# Best separation quality first
+QUALITY_ORDER = ('demucs', 'wiener', 'advanced', 'fast', 'simple')
+
+def cost_model_path():
+    return os.environ.get('SEPARATION_COST_MODEL',
+                          os.path.join(os.getcwd(), 'separated', '.cost_model.json'))
+
+def run_case(processor_type, input_path, output_dir):
+    """
+    Child side: run one processor the way ai-processor would and print the measurements
+    """
+    from processor_modules import load_processor_module
+    from streaming import should_stream
+
+    ai_processor = load_processor_module('ai-processor.py')
+    separation_function = ai_processor.get_processor_function(processor_type)
+    baseline_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    kwargs = {}
+    if processor_type in ai_processor.STREAMING_PROCESSORS and should_stream(input_path):
+        kwargs['streaming'] = True
+
+    start = time.perf_counter()
+    success = separation_function(input_path, output_dir, **kwargs)
+    seconds = time.perf_counter() - start
+
+    report_result({
+        'success': bool(success),
+        'seconds': round(seconds, 3),
+        'baseline_mb': round(baseline_mb, 1),
+        'peak_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+def measure(processor_type, input_path, work_dir, timeout):
+    """
+    Parent side: run a case in a fresh interpreter so peak RSS is not shared between cases
+    """
+    output_dir = tempfile.mkdtemp(prefix=f"{processor_type}-", dir=work_dir)
+    env = dict(os.environ, SEPARATION_STAGE_EVENTS='0')
+    try:
+        result = run_in_fresh_interpreter(__file__, [processor_type, input_path, output_dir], timeout, env=env)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    if 'error' in result:
+        logger.warning(f"Calibration of {processor_type} failed: {result['error']}")
+        return None
+    return result if result['success'] else None
+
+def fit_line(xs, ys):
+    """
+    Least-squares (intercept, slope), both clamped to be non-negative
+    """
+    if len(xs) < 2:
+        return 0.0, max(0.0, ys[0] / xs[0])
+    slope, intercept = np.polyfit(xs, ys, 1)
+    if intercept < 0:
+        # Refit through the origin rather than predicting negative cost for short inputs
+        return 0.0, max(0.0, float(np.dot(xs, ys) / np.dot(xs, xs)))
+    return float(intercept), max(0.0, float(slope))
+
+def calibrate(processor_types=QUALITY_ORDER, durations=(10, 30), output_path=None, timeout=1800):
+    """
+    Benchmark each processor on this host and write the cost model; returns it
+    """
+    output_path = output_path or cost_model_path()
+    work_dir = tempfile.mkdtemp(prefix='separation-calibration-')
+    processors = {}
+    try:
+        # The benchmarks' 'mix' signal (synthetic.py): bass, vocal-like partials, noise bursts and clicks
+        inputs = [(seconds, write_signal(os.path.join(work_dir, f"calibration_{seconds:g}s.wav"), 'mix', seconds))
+                  for seconds in durations]
+
+        for processor_type in processor_types:
+            samples = []
+            for seconds, input_path in inputs:
+                logger.info(f"Calibrating {processor_type} on {seconds:g}s...")
+                result = measure(processor_type, input_path, work_dir, timeout)
+                if result is None:
+                    break
+                samples.append((seconds, result))
+
+            if len(samples) < len(inputs):
+                logger.warning(f"Skipping {processor_type}: not available or failed on this host")
+                continue
+
+            xs = [seconds for seconds, _ in samples]
+            fixed_seconds, seconds_rate = fit_line(xs, [r['seconds'] for _, r in samples])
+            fixed_mb, mb_rate = fit_line(xs, [r['peak_mb'] for _, r in samples])
+            processors[processor_type] = {
+                'fixed_seconds': round(fixed_seconds, 4),
+                'seconds_per_audio_second': round(seconds_rate, 5),
+                'fixed_mb': round(fixed_mb, 1),
+                'mb_per_audio_second': round(mb_rate, 4),
+                'samples': [{'audio_seconds': seconds, **result} for seconds, result in samples],
+            }
+            logger.info(f"{processor_type}: {seconds_rate:.3f}s and {mb_rate:.2f}MB per audio second")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    model = {
+        'version': COST_MODEL_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'processors': processors,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(model, f, indent=2)
+    os.replace(temp_path, output_path)
+    logger.info(f"Cost model written to {output_path}")
+    return model
+
+def load_cost_model(path=None):
+    """
+    The stored cost model, or None if this host has not been calibrated
+    """
+    path = path or cost_model_path()
+    try:
+        with open(path) as f:
+            model = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if model.get('version') != COST_MODEL_VERSION or not model.get('processors'):
+        return None
+    return model
+
+def predict(model, processor_type, duration, streaming_seconds=None):
+    """
+    (seconds, peak MB) predicted for a processor on an input of the given duration.
+    streaming_seconds caps the audio held in memory at once for streamed runs.
+    """
+    costs = model['processors'][processor_type]
+    seconds = costs['fixed_seconds'] + costs['seconds_per_audio_second'] * duration
+    resident = min(duration, streaming_seconds) if streaming_seconds else duration
+    peak_mb = costs['fixed_mb'] + costs['mb_per_audio_second'] * resident
+    return seconds, peak_mb
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--run-case':
+        logging.basicConfig(level=logging.WARNING)
+        run_case(*sys.argv[2:5])
+        return
+    print("Usage: python ai-processor.py --calibrate [--durations 10 30] [--processors ...]", file=sys.stderr)
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
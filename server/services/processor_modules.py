@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+import os
+import sys
+import importlib.util
+
+# Directory holding the hyphenated processor scripts (fast-processor.py, ...)
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_processor_module(script_name):
+    """
+    Import a processor script such as 'fast-processor.py' as a module.
+    Modules are cached in sys.modules so each process only pays the import cost once.
+    """
+    module_name = os.path.splitext(script_name)[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    script_path = os.path.join(SERVICES_DIR, script_name)
+    if not os.path.exists(script_path):
+        raise ImportError(f"Processor script not found: {script_path}")
+
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[module_name]
+        raise
+    return module
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when processor output changes so stale stems are not served
+# (2: onset, crossover, streaming level and Demucs clipping changes)
+CACHE_VERSION = 2
+
+STEM_FILES = [f"{stem}.{extension}" for stem in ('vocals', 'drums', 'bass', 'other') for extension in ('wav', 'flac')]
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of the file contents, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(content_hash, processor, params=None):
+    """
+    Key for a separation result: input audio + processor + its parameters
+    """
+    description = json.dumps({
+        'audio': content_hash,
+        'processor': processor,
+        'params': params or {},
+        'version': CACHE_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+def _link_or_copy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Different filesystem or no hardlink support
+        shutil.copy2(source, destination)
+
+class ResultCache:
+    """
+    Content-addressed store of separated stems with an LRU size cap.
+
+    Each entry is a directory named by its key holding the stem files and a
+    manifest.json; its mtime is refreshed on every hit and used for eviction.
+    """
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key, output_dir):
+        """
+        Place cached stems for key into output_dir; returns True on a hit
+        """
+        entry_dir = self._entry_dir(key)
+        if not os.path.exists(os.path.join(entry_dir, 'manifest.json')):
+            return False
+
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            for stem_file in os.listdir(entry_dir):
+                if stem_file in STEM_FILES:
+                    _link_or_copy(os.path.join(entry_dir, stem_file), os.path.join(output_dir, stem_file))
+            os.utime(entry_dir)
+        except OSError as e:
+            # Entry evicted concurrently or unreadable: treat as a miss
+            logger.warning(f"Cache entry {key[:12]} unusable: {e}")
+            return False
+
+        logger.info(f"Result cache hit: {key[:12]}")
+        return True
+
+    def detach(self, output_dir):
+        """
+        Unlink existing stems in output_dir so a processor writing there can never
+        write through a hardlink into a cache entry
+        """
+        for stem_file in STEM_FILES:
+            path = os.path.join(output_dir, stem_file)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def store(self, key, output_dir, metadata=None):
+        """
+        Add the stems found in output_dir to the cache under key
+        """
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            os.utime(entry_dir)
+            return
+
+        stems = [f for f in STEM_FILES if os.path.exists(os.path.join(output_dir, f))]
+        if not stems:
+            return
+
+        staging_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(staging_dir, exist_ok=True)
+            for stem_file in stems:
+                _link_or_copy(os.path.join(output_dir, stem_file), os.path.join(staging_dir, stem_file))
+            with open(os.path.join(staging_dir, 'manifest.json'), 'w') as f:
+                json.dump({'stems': stems, 'created': time.time(), **(metadata or {})}, f)
+            os.rename(staging_dir, entry_dir)
+            logger.info(f"Stored separation result in cache: {key[:12]}")
+        except OSError as e:
+            # Another worker stored the same key first, or the disk is full
+            logger.warning(f"Could not store cache entry {key[:12]}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if '.tmp-' in name or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits max_bytes
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted cache entry {os.path.basename(path)[:12]} ({size / (1024 * 1024):.1f}MB)")
+
+def get_result_cache():
+    """
+    Cache configured from the environment, or None when disabled.
+
+    SEPARATION_CACHE=off disables caching, SEPARATION_CACHE_DIR sets the
+    location (default separated/.cache) and SEPARATION_CACHE_MAX_MB the size cap.
+    """
+    if os.environ.get('SEPARATION_CACHE', 'on').lower() in ('0', 'off', 'false'):
+        return None
+
+    cache_dir = os.environ.get('SEPARATION_CACHE_DIR', os.path.join(os.getcwd(), 'separated', '.cache'))
+    max_mb = float(os.environ.get('SEPARATION_CACHE_MAX_MB', '2048'))
+    try:
+        return ResultCache(cache_dir, int(max_mb * 1024 * 1024))
+    except OSError as e:
+        logger.warning(f"Result cache disabled: {e}")
+        return None
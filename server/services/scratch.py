@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import shutil
+import weakref
+import tempfile
+import numpy as np
+
+# Frames per block when the scratch space is file-backed
+BLOCK_FRAMES = 2048
+
+def scratch_dir_from_env():
+    """
+    Directory for file-backed spectrograms from SEPARATION_SCRATCH_DIR, None when unset
+    """
+    return os.environ.get('SEPARATION_SCRATCH_DIR') or None
+
+def _unmap(buffer):
+    """
+    Close a scratch mapping; False while a view of its array still uses it
+    """
+    try:
+        buffer.close()
+        return True
+    except BufferError:
+        return False
+
+class ScratchSpace:
+    """
+    Allocator for the large (freq, frames) intermediates of the spectral processors.
+
+    With a base directory every array is an ndarray over an mmap.mmap of a
+    file in a private directory under it (unlinked right away, so nothing is
+    left behind even if the process dies) and frame_blocks() walks the frames
+    in blocks of block_frames, flushing and dropping the mapped pages after
+    each block through the mmap objects the space keeps.
+    Resident memory then scales with the block size instead of the track
+    length. Without a directory arrays live in RAM and frame_blocks() yields
+    a single block, so the same code runs unchanged either way.
+    """
+    def __init__(self, base_dir=None, block_frames=BLOCK_FRAMES):
+        self.directory = None
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix='separation-scratch-', dir=base_dir)
+        self.block_frames = block_frames
+        self._maps = []
+        self._count = 0
+
+    @property
+    def mapped(self):
+        return self.directory is not None
+
+    def empty(self, shape, dtype=np.float32):
+        if not self.mapped:
+            return np.empty(shape, dtype=dtype)
+
+        self._count += 1
+        path = os.path.join(self.directory, f"{self._count}.dat")
+        # mmap cannot map an empty file
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        with open(path, 'w+b') as f:
+            f.truncate(size)
+            buffer = mmap.mmap(f.fileno(), size)
+        os.unlink(path)
+        array = np.ndarray(shape, dtype=dtype, buffer=buffer)
+        self._maps.append((weakref.ref(array), buffer))
+        return array
+
+    def zeros(self, shape, dtype=np.float32):
+        # Freshly truncated files read as zeros
+        return self.empty(shape, dtype) if self.mapped else np.zeros(shape, dtype=dtype)
+
+    def evict(self):
+        """
+        Write back and drop the resident pages of every live mapped array, and
+        unmap the files of arrays that are gone
+        """
+        live = []
+        for ref, buffer in self._maps:
+            if ref() is None and _unmap(buffer):
+                continue
+            live.append((ref, buffer))
+            buffer.flush()
+            if hasattr(mmap, 'MADV_DONTNEED'):
+                buffer.madvise(mmap.MADV_DONTNEED)
+        self._maps = live
+
+    def frame_blocks(self, n_frames, halo=0):
+        """
+        (read, inner, write) slices over the frame axis: process frames read
+        (the block plus halo context on each side), keep result[..., inner]
+        and store it at [..., write]
+        """
+        step = self.block_frames if self.mapped else max(n_frames, 1)
+        for start in range(0, n_frames, step):
+            end = min(start + step, n_frames)
+            read = slice(max(start - halo, 0), min(end + halo, n_frames))
+            yield read, slice(start - read.start, end - read.start), slice(start, end)
+            if self.mapped:
+                self.evict()
+
+    def max(self, array):
+        """
+        np.max over a (..., frames) array one frame block at a time
+        """
+        return max(float(np.max(array[..., frames])) for _, _, frames in self.frame_blocks(array.shape[-1]))
+
+    def close(self):
+        for _, buffer in self._maps:
+            _unmap(buffer)
+        self._maps = []
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
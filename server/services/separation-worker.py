@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Long-lived separation worker.
+
+Keeps librosa/numpy/scipy (and optionally torch/demucs) imported in a pool of
+warm processes and accepts jobs as JSON lines, either on stdin/stdout or on a
+local Unix socket:
+
+    {"id": "42", "input": "uploads/abc", "output": "separated/abc_separated"}
+
+Jobs may carry a "priority" (higher runs first) and "progressive": true.
+Each job is first acknowledged with its queue position, or rejected when the
+queue is full or a numeric field is not a number (see job_scheduler.py), and
+announced again when it leaves the queue; progressive jobs then announce
+preview stems (fast processor on the first 45s, in <output>/preview) and
+every job is finally answered with its result:
+
+    {"id": "42", "event": "queued", "position": 1}
+    {"id": "42", "event": "started", "processor": "fast"}
+    {"id": "42", "event": "preview", "path": ".../preview", "time_to_first_audio_seconds": 2.1}
+    {"id": "42", "success": true, "processor": "fast",
+     "timings": {"queued_seconds": 0.0, "analysis_seconds": 0.1, ...},
+     "scheduler": {"wait_seconds": 0.0, "reserved_mb": 1024.0, "queue_depth": 0}}
+
+{"id": "s", "event": "stats"} returns the scheduler metrics (queue depth,
+running jobs, reserved memory, wait times) instead of running a job.
+"""
+import sys
+import os
+import json
+import logging
+import argparse
+import threading
+import socketserver
+
+# Set up logging (stderr, stdout is reserved for the JSON-lines protocol)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from worker_pool import SeparationWorker
+
+def _serve_lines(worker, lines, write_line):
+    """
+    Read JSON job lines and dispatch them to the worker pool
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            write_line({'success': False, 'error': f"Invalid JSON: {e}"})
+            continue
+        if not isinstance(job, dict):
+            write_line({'success': False, 'error': "Job must be a JSON object"})
+            continue
+        if job.get('event') == 'stats':
+            write_line(dict(worker.stats(), id=job.get('id')))
+            continue
+        try:
+            worker.submit(job, write_line)
+        except Exception as e:
+            # One bad job must not take the daemon down
+            logger.error(f"Cannot submit job {job.get('id')}: {e}")
+            write_line({'id': job.get('id'), 'success': False, 'error': str(e)})
+
+def serve_stdio(worker):
+    """
+    JSON-lines protocol over stdin/stdout (used when spawned by the Node server)
+    """
+    lock = threading.Lock()
+
+    def write_line(message):
+        with lock:
+            sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+    write_line(worker.start())
+    _serve_lines(worker, sys.stdin, write_line)
+
+def serve_socket(worker, socket_path):
+    """
+    JSON-lines protocol over a local Unix socket, one job stream per connection
+    """
+    ready = worker.start()
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            answered = threading.Condition()
+            outstanding = [0]
+
+            def write_line(message):
+                with answered:
+                    try:
+                        self.wfile.write((json.dumps(message) + "\n").encode())
+                        self.wfile.flush()
+                    except OSError:
+                        logger.warning("Client disconnected before job finished")
+                    # Queue-position, start and preview notices are not answers
+                    if message.get('event') not in ('queued', 'started', 'preview'):
+                        outstanding[0] -= 1
+                        answered.notify_all()
+
+            for raw in self.rfile:
+                line = raw.decode()
+                if not line.strip():
+                    continue
+                with answered:
+                    outstanding[0] += 1
+                _serve_lines(worker, [line], write_line)
+
+            # Keep the connection open until every job of this client is answered
+            with answered:
+                answered.wait_for(lambda: outstanding[0] == 0)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, JobHandler) as server:
+        logger.info(f"Separation worker listening on {socket_path}: {json.dumps(ready)}")
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived audio separation worker")
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('SEPARATION_WORKERS', '1')),
+                        help="Number of warm worker processes (default: $SEPARATION_WORKERS or 1)")
+    parser.add_argument('--memory-mb', type=float,
+                        help="Memory budget for running jobs (default: $SEPARATION_MEMORY_MB or 80%% of available)")
+    parser.add_argument('--max-queue', type=int,
+                        help="Queued jobs before new ones are rejected (default: $SEPARATION_MAX_QUEUE or 32)")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument('--preload-demucs', action='store_true',
+                        help="Also import torch/demucs in each worker")
+    args = parser.parse_args()
+
+    preload = ['wiener', 'advanced', 'fast', 'simple']
+    if args.preload_demucs:
+        preload.insert(0, 'demucs')
+
+    logger.info(f"Starting separation worker with {args.workers} process(es)")
+    worker = SeparationWorker(pool_size=max(1, args.workers), preload=preload, memory_mb=args.memory_mb,
+                              max_queue=args.max_queue)
+
+    try:
+        if args.socket:
+            serve_socket(worker, args.socket)
+        else:
+            serve_stdio(worker)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Finishing queued and running jobs...")
+        worker.shutdown()
+        logger.info("Separation worker stopped")
+
+if __name__ == "__main__":
+    main()
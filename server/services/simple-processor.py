@@ -2,102 +2,96 @@
 import sys
 import os
 import logging
+from functools import lru_cache, partial
 import numpy as np
-import librosa
-import soundfile as sf
-from scipy.signal import butter, filtfilt
+from streaming import stream_separation
+from audio_io import load_audio, write_stems
+from filter_bank import crossover, zero_phase_response
+from stage_timer import stage
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def create_simple_separation(input_path, output_dir):
+def simple_responses(sr, n_fft):
     """
-    Create simple mock separation for testing - splits audio into frequency bands
+    Power responses of the simple stems for one FFT size:
+    vocals, bass, drums band (before the transient shaping), snare boost, other.
+    The filter designs are cached by sample rate (filter_bank.butter_sos); the
+    responses are as long as the signal, so only streaming caches them.
+    """
+    def band(*bands):
+        return zero_phase_response(sr, bands, n_fft)
+    
+    # Vocals: mid-frequency emphasis with vocal formant boost (1000-2000Hz)
+    vocals = 0.85 * (band((100, 3400)) + 0.4 * band((1000, 2000)))
+    # Bass: low frequencies with sub-bass (40-100Hz) punch, boosted
+    bass = 1.4 * (band((None, 250)) + 0.6 * band((40, 100)))
+    # Drums: high-pass at 80Hz, then 80-7000Hz (one cascaded response)
+    drums = band((80, None), (80, 7000))
+    # Snare frequencies
+    snare = 0.3 * band((150, 300))
+    # Other: mid-high frequencies with vocal and bass bleeding reduced
+    other = 0.75 * (band((500, 7000)) - 0.15 * vocals - 0.1 * bass)
+    return np.stack([vocals, bass, drums, snare, other])
+
+# Streamed blocks all share one FFT size, so a small cache covers a whole run
+streamed_responses = lru_cache(maxsize=2)(simple_responses)
+
+def simple_stems(y, sr, responses=simple_responses):
+    """
+    Filter-bank pipeline: mono (samples,) or stereo (2, samples) signal -> {track_name: signal}.
+    Filters run along the last axis, so stereo channels are filtered independently.
+    
+    Every band is a zero-phase 3rd-order Butterworth filter (what filtfilt applied),
+    so the whole bank runs as one FFT-domain crossover: one forward transform and
+    one batched inverse for all stems, with cached filter designs.
+    responses is simple_responses, or streamed_responses for fixed-size blocks.
+    """
+    logger.info("Creating separated tracks with enhanced processing...")
+    
+    vocals, bass, drums, snare, other = crossover(y, sr, responses)
+    
+    with stage('postprocess'):
+        # Transient emphasis with compression, plus the snare boost (in place)
+        drums *= 2.2
+        np.tanh(drums, out=drums)
+        drums *= 0.85
+        drums += snare
+    
+    return {'vocals': vocals, 'bass': bass, 'drums': drums, 'other': other}
+
+def create_simple_separation(input_path, output_dir, streaming=False, channels='mono', native_rate=False,
+                             output_format='wav'):
+    """
+    Create simple mock separation for testing - splits audio into frequency bands.
+    With streaming=True the file is processed in blocks so memory stays bounded.
+    channels is 'mono', 'stereo' or 'mid_side'; there are no masks to share
+    between channels, so 'mid_side' is processed as 'stereo'.
+    With native_rate=True the input is processed at its own sample rate (no resampling).
+    output_format is 'wav' or 'flac' (see audio_io.OUTPUT_FORMATS).
     """
     try:
+        target_sr = None if native_rate else 16000
+        if streaming:
+            separate_block = partial(simple_stems, responses=streamed_responses)
+            stream_separation(input_path, output_dir, separate_block, sr=target_sr, headroom=0.8, channels=channels,
+                              output_format=output_format)
+            logger.info("Simple separation completed successfully!")
+            return True
+        
         logger.info(f"Loading audio file: {input_path}")
         
         # Load audio - process full file with optimized sample rate
-        y, sr = librosa.load(input_path, sr=16000, mono=True, duration=None)
-        logger.info(f"Loaded: {len(y)/sr:.1f}s at {sr}Hz")
-        
-        # Fast filtering functions using scipy
-        def lowpass_filter(data, cutoff, fs, order=3):
-            nyquist = 0.5 * fs
-            normal_cutoff = cutoff / nyquist
-            b, a = butter(order, normal_cutoff, btype='low', analog=False)
-            return filtfilt(b, a, data)
-        
-        def highpass_filter(data, cutoff, fs, order=3):
-            nyquist = 0.5 * fs  
-            normal_cutoff = cutoff / nyquist
-            b, a = butter(order, normal_cutoff, btype='high', analog=False)
-            return filtfilt(b, a, data)
-        
-        def bandpass_filter(data, low_cutoff, high_cutoff, fs, order=3):
-            nyquist = 0.5 * fs
-            low = low_cutoff / nyquist
-            high = high_cutoff / nyquist
-            b, a = butter(order, [low, high], btype='band', analog=False)
-            return filtfilt(b, a, data)
-        
-        logger.info("Creating separated tracks with enhanced processing...")
-        
-        # Create different versions of the audio
-        tracks = {}
-        
-        # Fast spectral-based separation using numpy operations
-        
-        # Simple but effective separation using different frequency emphasis
-        
-        # Vocals: mid-frequency emphasis with vocal formant boost
-        vocals = bandpass_filter(y, 100, 3400, sr)  # Human voice range
-        # Add emphasis on vocal formants (1000-2000Hz)
-        vocal_formants = bandpass_filter(y, 1000, 2000, sr) * 0.4
-        vocals = vocals + vocal_formants
-        vocals = vocals * 0.85
-        tracks['vocals'] = vocals
-        
-        # Bass: low frequencies with punch
-        bass = lowpass_filter(y, 250, sr)
-        # Add sub-bass emphasis
-        sub_bass = bandpass_filter(y, 40, 100, sr) * 0.6
-        bass = bass + sub_bass
-        bass = bass * 1.4  # Boost bass
-        tracks['bass'] = bass
-        
-        # Drums: high-pass filtered with percussive emphasis
-        drums_base = highpass_filter(y, 80, sr)
-        drums = bandpass_filter(drums_base, 80, 7000, sr)
-        # Add transient emphasis with compression
-        drums = np.tanh(drums * 2.2) * 0.85
-        # Enhance snare frequencies
-        snare_boost = bandpass_filter(y, 150, 300, sr) * 0.3
-        drums = drums + snare_boost
-        tracks['drums'] = drums
+        y, sr = load_audio(input_path, sr=target_sr, mono=(channels == 'mono'))
+        logger.info(f"Loaded: {y.shape[-1]/sr:.1f}s at {sr}Hz")
         
-        # Other: mid-high frequencies avoiding vocal and bass ranges
-        other = bandpass_filter(y, 500, 7000, sr)
-        # Reduce bleeding from other tracks
-        other = other - (vocals * 0.15) - (bass * 0.1)
-        other = other * 0.75
-        tracks['other'] = other
+        tracks = simple_stems(y, sr)
         
         logger.info("Saving tracks...")
         
-        # Save tracks
-        for track_name, track_data in tracks.items():
-            # Normalize
-            if np.max(np.abs(track_data)) > 0:
-                track_data = track_data / np.max(np.abs(track_data)) * 0.8
-            
-            # Convert to stereo
-            stereo_data = np.column_stack([track_data, track_data])
-            
-            output_path = os.path.join(output_dir, f"{track_name}.wav")
-            sf.write(output_path, stereo_data, sr)
-            logger.info(f"Saved {track_name} track to {output_path}")
+        # Normalize, convert to stereo and save tracks concurrently
+        write_stems(tracks, output_dir, sr, headroom=0.8, output_format=output_format)
         
         logger.info("Simple separation completed successfully!")
         return True
@@ -109,12 +103,18 @@ def create_simple_separation(input_path, output_dir):
         return False
 
 def main():
-    if len(sys.argv) != 3:
-        logger.error("Usage: python simple-processor.py <input_file> <output_directory>")
+    flags = sys.argv[1:]
+    streaming = '--stream' in flags
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else 'mono'
+    native_rate = '--native-rate' in flags
+    output_format = 'flac' if '--flac' in flags else 'wav'
+    args = [arg for arg in flags if arg not in ('--stream', '--stereo', '--mid-side', '--native-rate', '--flac')]
+    if len(args) != 2:
+        logger.error("Usage: python simple-processor.py <input_file> <output_directory> [--stream] [--stereo | --mid-side] [--native-rate] [--flac]")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_path = args[0]
+    output_dir = args[1]
     
     # Validate input file exists
     if not os.path.exists(input_path):
@@ -125,7 +125,8 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     # Perform separation
-    success = create_simple_separation(input_path, output_dir)
+    success = create_simple_separation(input_path, output_dir, streaming=streaming, channels=channels,
+                                       native_rate=native_rate, output_format=output_format)
     
     if success:
         logger.info("Simple audio separation completed successfully!")
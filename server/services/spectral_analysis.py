@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+import logging
+import numpy as np
+import librosa
+from stage_timer import stage
+from scratch import ScratchSpace
+from spectral_cache import SpectralCache
+
+logger = logging.getLogger(__name__)
+
+# librosa.decompose.hpss median filter length (its default)
+HPSS_KERNEL = 31
+
+# FFT size of the onset envelope (librosa.onset.onset_strength's default), at the analysis hop
+ONSET_N_FFT = 2048
+
+def onset_gain(onset_frames, n_frames, before=3, after=3, gain=2.0):
+    """
+    Per-frame gain envelope for onset emphasis.
+
+    Every onset frame f scales frames [f - before, f + after) by gain; where
+    windows overlap the gains compound (gain ** number of covering onsets),
+    exactly like multiplying the mask once per onset. Multiply a mask band
+    by the result (broadcast over frequency) instead of looping over onsets.
+    """
+    impulses = np.zeros(n_frames)
+    onset_frames = np.asarray(onset_frames, dtype=int)
+    np.add.at(impulses, onset_frames[(onset_frames >= 0) & (onset_frames < n_frames)], 1)
+    # Box window over (t - after, t + before] counts the onsets covering frame t
+    counts = np.convolve(impulses, np.ones(before + after))[before:before + n_frames]
+    return np.power(gain, np.rint(counts))
+
+class SpectralAnalysis:
+    """
+    Single-pass spectral analysis shared by the spectral processors.
+
+    The complex STFT is computed once; magnitude, phase and the harmonic /
+    percussive split (HPSS done directly on the STFT) are all derived from it,
+    so no processor has to re-run librosa.stft on the same signal.
+
+    y may be mono (samples,) or stereo (2, samples). Stereo is analysed as one
+    batched (2, freq, frames) STFT, so masks and reconstruction run on both
+    channels in the same pass. With mid_side=True a stereo input is analysed as
+    [mid, side]: magnitude, HPSS and onsets come from the mid channel only, the
+    resulting masks are applied to both, and istft() decodes back to left/right.
+
+    scratch (a ScratchSpace) allocates the STFT and everything derived from it.
+    When it is file-backed, the STFT, magnitude, phase, HPSS and istft() all run
+    one frame block at a time (with enough overlap to give the same result), so
+    a long track never has a whole spectrogram resident.
+
+    cache (a SpectralCache, one per job) supplies the STFT and the onset
+    envelope, so analyses of the same signal share transforms and the onset
+    envelope reuses the STFT when the analysis runs at n_fft=ONSET_N_FFT.
+    File-backed analyses never put their STFT in the cache.
+    """
+    def __init__(self, y, sr, n_fft=2048, hop_length=512, hpss_margin=1.0, mid_side=False, scratch=None,
+                 cache=None):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.hpss_margin = hpss_margin
+        self.scratch = scratch if scratch is not None else ScratchSpace()
+        self.cache = cache if cache is not None else SpectralCache()
+        self.length = y.shape[-1]
+        self.mid_side = mid_side and y.ndim > 1
+        if self.mid_side:
+            y = np.stack([y[0] + y[1], y[0] - y[1]]) * 0.5
+        # Mono mixdown (the mid channel) for onset detection
+        self.y = y if y.ndim == 1 else (y[0] if self.mid_side else y.mean(axis=0))
+
+        with stage('stft'):
+            if self.scratch.mapped:
+                self.stft = self._stft_blocks(y)
+            else:
+                self.stft = self.cache.stft(y, n_fft=n_fft, hop_length=hop_length)
+            # Spectrum the masks are computed from: the mid channel in mid/side mode
+            self._mask_stft = self.stft[0] if self.mid_side else self.stft
+            self.magnitude = self.scratch.empty(self._mask_stft.shape, np.float32)
+            for _, _, frames in self.scratch.frame_blocks(self.n_frames):
+                np.abs(self._mask_stft[..., frames], out=self.magnitude[..., frames])
+        self.freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+
+        self._phase = None
+        self._harmonic = None
+        self._percussive = None
+
+    def _stft_blocks(self, y):
+        """
+        Centered STFT into a scratch array, one frame block at a time
+        """
+        n_fft, hop = self.n_fft, self.hop_length
+        # Same zero padding as librosa.stft(center=True); frame f starts at padded sample f * hop
+        padded = np.pad(y.astype(np.float32, copy=False), [(0, 0)] * (y.ndim - 1) + [(n_fft // 2, n_fft // 2)])
+        n_frames = 1 + (padded.shape[-1] - n_fft) // hop
+        stft = self.scratch.empty(y.shape[:-1] + (1 + n_fft // 2, n_frames), np.complex64)
+        for _, _, frames in self.scratch.frame_blocks(n_frames):
+            segment = padded[..., frames.start * hop:(frames.stop - 1) * hop + n_fft]
+            stft[..., frames] = librosa.stft(segment, n_fft=n_fft, hop_length=hop, center=False)
+        return stft
+
+    @property
+    def phase(self):
+        """
+        Unit-magnitude complex phase (same as the phase returned by librosa.magphase).
+
+        In mid/side mode this is stft / |mid| for both channels, so a mid-derived
+        magnitude times phase scales the side channel by the same ratio.
+        """
+        if self._phase is None:
+            # Silent bins get phase 1, as in magphase; one complex64 allocation, no temporaries
+            self._phase = self.scratch.empty(self.stft.shape, np.complex64)
+            for _, _, frames in self.scratch.frame_blocks(self.n_frames):
+                phase, magnitude = self._phase[..., frames], self.magnitude[..., frames]
+                phase.fill(1)
+                np.divide(self.stft[..., frames], magnitude, out=phase,
+                          where=np.broadcast_to(magnitude != 0, phase.shape))
+        return self._phase
+
+    def _compute_hpss(self):
+        with stage('hpss'):
+            self._harmonic = self.scratch.empty(self._mask_stft.shape, np.float32)
+            self._percussive = self.scratch.empty(self._mask_stft.shape, np.float32)
+            # The time-axis median filter sees HPSS_KERNEL // 2 frames either side
+            for read, inner, frames in self.scratch.frame_blocks(self.n_frames, halo=HPSS_KERNEL // 2):
+                harmonic, percussive = librosa.decompose.hpss(self._mask_stft[..., read], kernel_size=HPSS_KERNEL,
+                                                              margin=self.hpss_margin)
+                np.abs(harmonic[..., inner], out=self._harmonic[..., frames])
+                np.abs(percussive[..., inner], out=self._percussive[..., frames])
+
+    @property
+    def harmonic(self):
+        """
+        Magnitude of the harmonic component
+        """
+        if self._harmonic is None:
+            self._compute_hpss()
+        return self._harmonic
+
+    @property
+    def percussive(self):
+        """
+        Magnitude of the percussive component
+        """
+        if self._percussive is None:
+            self._compute_hpss()
+        return self._percussive
+
+    @property
+    def n_frames(self):
+        return self.stft.shape[-1]
+
+    def onset_frames(self, levels=None):
+        """
+        Onset positions in analysis frames (same hop as the STFT columns).
+        
+        Peak picking runs on the envelope scaled to 0..1 by its own range. With a
+        levels dict the range is levels['onset'], stored there from this signal
+        if it is not set yet, so streamed blocks share one track-level scale.
+        """
+        onset_strength = self.cache.onset_envelope(self.y, self.sr, n_fft=ONSET_N_FFT, hop_length=self.hop_length)
+        if levels is None:
+            return librosa.onset.onset_detect(onset_envelope=onset_strength, sr=self.sr,
+                                              hop_length=self.hop_length)
+        if 'onset' not in levels:
+            levels['onset'] = (float(np.min(onset_strength)), float(np.max(onset_strength)))
+        low, high = levels['onset']
+        return librosa.onset.onset_detect(onset_envelope=(onset_strength - low) / (high - low + 1e-12),
+                                          sr=self.sr, hop_length=self.hop_length, normalize=False)
+
+    def band(self, low_hz, high_hz):
+        """
+        Boolean frequency-bin selector for low_hz <= f <= high_hz
+        """
+        return (self.freqs >= low_hz) & (self.freqs <= high_hz)
+
+    def istft(self, spectrum, out=None):
+        """
+        Invert a (masked) spectrum back to a signal of the analysed length.
+
+        Leading dimensions are batched: a (stems, freq, frames) stack inverts to
+        (stems, samples) in one call, written into out if given. Mid/side
+        spectra come back as left/right.
+        """
+        with stage('istft'):
+            if self.scratch.mapped:
+                signal = self._istft_blocks(spectrum, out)
+            else:
+                signal = librosa.istft(spectrum, hop_length=self.hop_length, n_fft=self.n_fft,
+                                       length=self.length, out=out)
+            if self.mid_side:
+                # left = mid + side, right = mid - side, in place
+                mid, side = signal[..., 0, :], signal[..., 1, :]
+                mid += side
+                side *= -2
+                side += mid
+            return signal
+
+    def _istft_blocks(self, spectrum, out=None):
+        """
+        istft() of a scratch spectrum one frame block at a time.
+
+        Each block is overlap-added together with the frames that overlap its
+        edges (ceil(n_fft / hop) either side), so every sample it keeps has all
+        of its frames and window normalisation, exactly as in one full istft.
+        """
+        n_fft, hop = self.n_fft, self.hop_length
+        offset = n_fft // 2
+        if out is None:
+            out = np.empty(spectrum.shape[:-2] + (self.length,), dtype=np.float32)
+        for read, _, frames in self.scratch.frame_blocks(spectrum.shape[-1], halo=-(-n_fft // hop)):
+            block = librosa.istft(spectrum[..., read], hop_length=hop, n_fft=n_fft, center=False)
+            # Frame f starts at padded sample f * hop; the signal starts offset samples into the padding
+            start = max(frames.start * hop - offset, 0)
+            stop = self.length if frames.stop == spectrum.shape[-1] else frames.stop * hop - offset
+            base = read.start * hop - offset
+            out[..., start:stop] = block[..., start - base:stop - base]
+        return out
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+from collections import OrderedDict
+import numpy as np
+import librosa
+
+logger = logging.getLogger(__name__)
+
+def fingerprint(y):
+    """
+    Content key for a signal: shape, dtype and a hash of the samples
+    """
+    y = np.ascontiguousarray(y)
+    return y.shape, y.dtype.str, hashlib.blake2b(y.data, digest_size=16).hexdigest()
+
+class SpectralCache:
+    """
+    Per-job memo of spectral features, keyed by signal content and transform parameters.
+
+    STFTs are keyed by (n_fft, hop_length, window); mel spectrograms are
+    derived from the cached STFT of the same resolution, and an onset envelope
+    at the analysis' own n_fft/hop reuses its STFT (librosa.onset.onset_strength(y=...)
+    would compute its own). Only the last max_entries features are kept;
+    streamed() drops them after every block. Returned arrays are shared:
+    treat them as read-only.
+    """
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _get(self, key, compute):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def stft(self, y, n_fft=2048, hop_length=512, window='hann', signal=None):
+        """
+        librosa.stft(y) (centered); signal is fingerprint(y) if the caller already has it
+        """
+        signal = signal or fingerprint(y)
+        return self._get(('stft', signal, n_fft, hop_length, window),
+                         lambda: librosa.stft(y, n_fft=n_fft, hop_length=hop_length, window=window))
+
+    def mel(self, y, sr, n_fft=2048, hop_length=512, window='hann', n_mels=128, signal=None):
+        """
+        Power mel spectrogram from the cached STFT (what librosa.feature.melspectrogram(y=...) returns)
+        """
+        signal = signal or fingerprint(y)
+
+        def compute():
+            S = self.stft(y, n_fft, hop_length, window, signal=signal)
+            return librosa.feature.melspectrogram(S=np.abs(S) ** 2, sr=sr, n_fft=n_fft, n_mels=n_mels)
+
+        return self._get(('mel', signal, sr, n_fft, hop_length, window, n_mels), compute)
+
+    def onset_envelope(self, y, sr, n_fft=2048, hop_length=512, window='hann', signal=None):
+        """
+        Onset strength; with the default n_fft this matches
+        librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length).
+        Only the envelope is kept: the STFT is the cached one when the analysis
+        already made it, otherwise a temporary, so no whole-track transform
+        outlives the call (and memmap-backed analyses stay bounded).
+        """
+        signal = signal or fingerprint(y)
+
+        def compute():
+            stft_key = ('stft', signal, n_fft, hop_length, window)
+            if stft_key in self._entries:
+                S = self.stft(y, n_fft, hop_length, window, signal=signal)
+            else:
+                S = librosa.stft(y, n_fft=n_fft, hop_length=hop_length, window=window)
+            mel = librosa.feature.melspectrogram(S=np.abs(S) ** 2, sr=sr, n_fft=n_fft)
+            del S
+            return librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=sr, n_fft=n_fft,
+                                                hop_length=hop_length)
+
+        return self._get(('onset', signal, sr, n_fft, hop_length, window), compute)
+
+    def clear(self):
+        """
+        Drop every cached feature; the hit / miss counters keep counting
+        """
+        self._entries.clear()
+
+    def streamed(self, stems_function):
+        """
+        stems_function(y, sr, cache=...) wrapped for stream_separation: every block
+        uses this cache and its features are dropped afterwards (blocks never share
+        a signal), so the job's counters cover the whole track
+        """
+        def separate_block(y, sr):
+            try:
+                return stems_function(y, sr, cache=self)
+            finally:
+                self.clear()
+        return separate_block
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
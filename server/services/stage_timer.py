@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Lightweight per-stage timing for the processors.
+
+    with stage('stft'):
+        ...
+
+emits one JSON line on stdout per stage:
+
+    {"event": "stage", "stage": "stft", "processor": "fast", "job": "42",
+     "seconds": 0.412, "cpu_seconds": 0.405, "rss_mb": 310.2, "peak_rss_mb": 355.0}
+
+When a processor runs as a standalone script the Node server logs these
+lines; inside separation-worker.py stdout is the job protocol, so pool workers
+install a sink with set_sink() and return the per-stage summary with the job
+result instead. SEPARATION_STAGE_EVENTS=0 silences the events.
+
+SEPARATION_PROFILE=cprofile|tracemalloc|all additionally profiles each
+profile_run() block and writes the dumps to SEPARATION_PROFILE_DIR.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import resource
+import tempfile
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Fields attached to every event (processor, job id, ...)
+_context = {}
+
+# Accumulated seconds per stage for the current run
+_totals = {}
+
+# Callback receiving events instead of stdout (None = stdout)
+_sink = None
+
+def set_context(**fields):
+    """
+    Set fields (e.g. processor='fast', job='42') included in every following event
+    """
+    for key, value in fields.items():
+        if value is None:
+            _context.pop(key, None)
+        else:
+            _context[key] = value
+
+def set_sink(callback):
+    """
+    Send events to callback(dict) instead of stdout; None restores stdout
+    """
+    global _sink
+    _sink = callback
+
+def events_enabled():
+    return os.environ.get('SEPARATION_STAGE_EVENTS', '1').lower() not in ('0', 'off', 'false')
+
+def emit(event, **fields):
+    """
+    Write one structured event as a JSON line on stdout
+    """
+    if not events_enabled():
+        return
+    message = {'event': event, **_context, **fields}
+    if _sink is not None:
+        _sink(message)
+        return
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def _rss_mb():
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+@contextmanager
+def stage(name):
+    """
+    Time a processing stage (load, resample, stft, hpss, mask, filter, istft, postprocess, write;
+    model_load and inference for Demucs)
+    """
+    import tracemalloc
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _totals[name] = _totals.get(name, 0.0) + seconds
+
+        fields = {
+            'stage': name,
+            'seconds': round(seconds, 4),
+            'cpu_seconds': round(time.process_time() - cpu_start, 4),
+            'rss_mb': _rss_mb(),
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+        if tracing:
+            fields['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        emit('stage', **fields)
+
+def _profile_modes():
+    mode = os.environ.get('SEPARATION_PROFILE', '').lower()
+    if mode == 'all':
+        return {'cprofile', 'tracemalloc'}
+    return {m.strip() for m in mode.split(',') if m.strip()}
+
+@contextmanager
+def profile_run(name):
+    """
+    Wrap a whole processor run: emits a per-stage summary at the end and, if
+    SEPARATION_PROFILE is set, writes cProfile / tracemalloc dumps.
+    Yields a dict that holds the summary once the block exits.
+    """
+    _totals.clear()
+    summary = {}
+    modes = _profile_modes()
+    profile_dir = os.environ.get('SEPARATION_PROFILE_DIR',
+                                 os.path.join(tempfile.gettempdir(), 'separation-profiles'))
+    prefix = os.path.join(profile_dir, f"{name}-{_context.get('job', os.getpid())}-{int(time.time())}")
+
+    profiler = None
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+        yield summary
+    finally:
+        total = time.perf_counter() - start
+        dumps = {}
+
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            dumps['cprofile'] = f"{prefix}.prof"
+            profiler.dump_stats(dumps['cprofile'])
+
+        if 'tracemalloc' in modes:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            os.makedirs(profile_dir, exist_ok=True)
+            dumps['tracemalloc'] = f"{prefix}.tracemalloc.txt"
+            with open(dumps['tracemalloc'], 'w') as f:
+                f.write(f"traced peak: {traced_peak / (1024 * 1024):.1f}MB\n")
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+
+        for kind, path in dumps.items():
+            logger.info(f"Wrote {kind} profile to {path}")
+
+        summary.update({
+            'total_seconds': round(total, 4),
+            'stages': {key: round(value, 4) for key, value in _totals.items()},
+            'peak_rss_mb': _peak_rss_mb(),
+            'profiles': dumps or None,
+        })
+        emit('stage_summary', run=name, **summary)
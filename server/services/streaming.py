@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import os
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import soundfile as sf
+from audio_io import resample, stereo_frames, OUTPUT_FORMATS
+from stage_timer import stage
+
+logger = logging.getLogger(__name__)
+
+# Inputs longer than this are streamed instead of loaded whole
+STREAMING_THRESHOLD_SECONDS = 60.0
+
+# Channel modes of the spectral processors: mono fold, per-channel stereo, or
+# masks from the mid channel applied to mid and side
+CHANNEL_MODES = ('mono', 'stereo', 'mid_side')
+
+def should_stream(input_path, threshold_seconds=STREAMING_THRESHOLD_SECONDS):
+    """
+    True if the file is long enough that it should be processed block by block
+    """
+    try:
+        return sf.info(input_path).duration > threshold_seconds
+    except Exception:
+        return False
+
+def loudest_block_start(input_path, block_size, overlap):
+    """
+    Start frame of the block, as stream_separation reads them, with the highest mean power
+    """
+    best_start, best_power = 0, -1.0
+    blocks = sf.blocks(input_path, blocksize=block_size + overlap, overlap=overlap, dtype='float32', always_2d=True)
+    for index, block in enumerate(blocks):
+        power = float(np.mean(np.square(block)))
+        if power > best_power:
+            best_start, best_power = index * block_size, power
+    return best_start
+
+def stream_separation(input_path, output_dir, separate_block, sr, headroom=0.8,
+                      block_seconds=30, overlap_seconds=1, stereo_gains=None, channels='mono',
+                      resample_quality='auto', output_format='wav', prime_block=None):
+    """
+    Run a mask pipeline over the input in overlapping blocks with bounded memory.
+
+    separate_block(y, sr) receives a block at the processor sample rate, mono
+    or, unless channels is 'mono' or the input is mono, (2, samples), and
+    returns {track_name: signal}. Consecutive blocks are crossfaded over the
+    overlap region (overlap-add) and each stem is written incrementally, so peak
+    memory depends on block_seconds, not on track length. A second blockwise
+    pass applies the usual peak normalization with the given headroom (None keeps
+    the stems' level). sr=None
+    processes at the file's native rate; otherwise blocks are resampled with
+    audio_io.resample(quality=resample_quality). The normalization pass encodes
+    all stems concurrently in output_format (see audio_io.OUTPUT_FORMATS).
+
+    The final pass only fixes each stem's overall gain: a pipeline whose masks
+    are normalized by the block's own peaks would still change its stem balance
+    at every block. prime_block(y, sr), if given, runs once before the blocks on
+    the loudest one (an extra decode pass picks it by mean power) and its output
+    is discarded; pipelines fix their mask levels there, as a track-level
+    estimate that every block then shares (see advanced_stems' levels).
+    """
+    info = sf.info(input_path)
+    native_sr = info.samplerate
+    sr = sr or native_sr
+    block_size = int(block_seconds * native_sr)
+    overlap = int(overlap_seconds * native_sr)
+    out_overlap = int(round(overlap * sr / native_sr))
+
+    logger.info(f"Streaming {info.duration:.1f}s in {block_seconds}s blocks "
+                f"({overlap_seconds}s overlap) at {sr}Hz")
+
+    fade_in = np.sin(0.5 * np.pi * (np.arange(out_overlap) + 0.5) / out_overlap) ** 2
+    fade_out = 1.0 - fade_in
+
+    writers = {}
+    tails = {}
+    peaks = {}
+    partial_paths = {}
+
+    def prepare(block):
+        if channels != 'mono' and block.shape[1] == 2:
+            y = np.ascontiguousarray(block.T)
+        else:
+            y = block.mean(axis=1)
+        return resample(y, native_sr, sr, resample_quality)
+
+    try:
+        if prime_block is not None:
+            start = loudest_block_start(input_path, block_size, overlap)
+            logger.info(f"Measuring track-level mask levels on the block at {start / native_sr:.0f}s")
+            block, _ = sf.read(input_path, start=start, frames=block_size + overlap, dtype='float32',
+                               always_2d=True)
+            prime_block(prepare(block), sr)
+            del block
+
+        blocks = sf.blocks(input_path, blocksize=block_size + overlap, overlap=overlap,
+                           dtype='float32', always_2d=True)
+        n_blocks = 0
+        for block in blocks:
+            tracks = separate_block(prepare(block), sr)
+            # Only the final block is shorter than block_size + overlap
+            is_last = block.shape[0] < block_size + overlap
+
+            for track_name, track_data in tracks.items():
+                track_data = np.asarray(track_data, dtype=np.float32)
+                if track_name not in writers:
+                    partial_paths[track_name] = os.path.join(output_dir, f".{track_name}.partial.wav")
+                    writers[track_name] = sf.SoundFile(partial_paths[track_name], 'w', samplerate=sr,
+                                                       channels=track_data.ndim, subtype='FLOAT')
+                    peaks[track_name] = 0.0
+
+                if track_name in tails:
+                    tail = tails.pop(track_name)
+                    n = min(tail.shape[-1], track_data.shape[-1])
+                    track_data[..., :n] = track_data[..., :n] * fade_in[:n] + tail[..., :n]
+
+                if is_last or track_data.shape[-1] <= out_overlap:
+                    ready = track_data
+                else:
+                    ready = track_data[..., :-out_overlap]
+                    tails[track_name] = track_data[..., -out_overlap:] * fade_out
+
+                writers[track_name].write(ready.T)
+                if ready.size:
+                    peaks[track_name] = max(peaks[track_name], float(np.max(np.abs(ready))))
+
+            n_blocks += 1
+
+        # Flush tails left over when the input ended exactly on a block boundary
+        for track_name, tail in tails.items():
+            writers[track_name].write(tail.T)
+            peaks[track_name] = max(peaks[track_name], float(np.max(np.abs(tail))))
+
+        for writer in writers.values():
+            writer.close()
+
+        logger.info(f"Processed {n_blocks} blocks, normalizing stems...")
+
+        extension, subtype = OUTPUT_FORMATS[output_format]
+
+        def finalize(track_name):
+            gain = headroom / peaks[track_name] if headroom is not None and peaks[track_name] > 0 else 1.0
+            gains = (stereo_gains or {}).get(track_name, (1.0, 1.0))
+            output_path = os.path.join(output_dir, f"{track_name}.{extension}")
+            with sf.SoundFile(output_path, 'w', samplerate=sr, channels=2, subtype=subtype) as out:
+                for chunk in sf.blocks(partial_paths[track_name], blocksize=block_size, dtype='float32'):
+                    # Stereo partials come back as (samples, 2); stereo_frames expects channels first
+                    out.write(stereo_frames((chunk * gain).T, gains))
+            logger.info(f"Saved {track_name}: {sf.info(output_path).duration:.1f}s")
+
+        with stage('write'), ThreadPoolExecutor(max_workers=len(partial_paths) or 1) as pool:
+            # list() re-raises the first failure
+            list(pool.map(finalize, partial_paths))
+    finally:
+        for writer in writers.values():
+            if not writer.closed:
+                writer.close()
+        for partial_path in partial_paths.values():
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    return True
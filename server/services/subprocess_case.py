@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Measurements in a fresh interpreter, for calibration and the benchmarks.
+
+A script re-runs itself as `script --run-case <args...>`; the child does the
+work and prints one JSON result line with report_result(), the parent picks
+it out of everything else the child printed. Each case gets its own import
+cost and peak RSS:
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--run-case':
+        report_result(run_case(*sys.argv[2:]))
+    ...
+    result = run_in_fresh_interpreter(__file__, [processor, input_path], timeout)
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+RESULT_MARKER = 'CASE_RESULT '
+
+def report_result(result):
+    """
+    Child side: print the case's result where the parent looks for it
+    """
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+
+def parse_result(line):
+    """
+    The result reported on one line of the child's output, or None
+    """
+    if line.startswith(RESULT_MARKER):
+        return json.loads(line[len(RESULT_MARKER):])
+    return None
+
+def case_command(script, args):
+    return [sys.executable, os.path.abspath(script), '--run-case', *[str(arg) for arg in args]]
+
+def run_in_fresh_interpreter(script, args, timeout, env=None, verbose=False):
+    """
+    Run `script --run-case *args` to completion; returns the reported result,
+    or {'error': ...} on a timeout or when the child reported nothing
+    """
+    try:
+        completed = subprocess.run(case_command(script, args), capture_output=True, text=True,
+                                   timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        return {'error': f"timeout after {timeout}s"}
+
+    if verbose:
+        sys.stderr.write(completed.stderr)
+
+    for line in reversed(completed.stdout.splitlines()):
+        result = parse_result(line)
+        if result is not None:
+            return result
+    return {'error': (completed.stderr.strip().splitlines() or ['no result'])[-1]}
+
+def start_in_fresh_interpreter(script, args, env=None):
+    """
+    Start `script --run-case *args` without waiting, for cases that must run
+    side by side; read its result with wait_for_result(). The child's stdin is
+    a pipe, so it can block on it to stay alive until the parent closes it.
+    """
+    return subprocess.Popen(case_command(script, args), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, env=env)
+
+def wait_for_result(process, deadline):
+    """
+    The first result a started child reports, or {'error': ...} if it exits
+    first or the deadline (a time.time() value) passes
+    """
+    for line in process.stdout:
+        result = parse_result(line)
+        if result is not None:
+            return result
+        if time.time() > deadline:
+            return {'error': 'timed out waiting for the result'}
+    return {'error': 'no result'}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic test mixes for the benchmarks and for processor
+calibration (processor_calibration.py), so both measure the same signals.
+
+Every signal is generated from a fixed seed, so the same kind and duration
+always produce byte-identical files across machines and commits.
+"""
+import numpy as np
+import soundfile as sf
+
+KINDS = ('tones', 'noise_bursts', 'clicks', 'mix')
+
+def tones(t):
+    """
+    Bass line plus a sustained chord with slow vibrato (vocal-like partials)
+    """
+    bass = 0.4 * np.sin(2 * np.pi * 55 * t + 0.5 * np.sin(2 * np.pi * 0.5 * t))
+    vibrato = 1 + 0.01 * np.sin(2 * np.pi * 5 * t)
+    chord = sum(0.15 / k * np.sin(2 * np.pi * 220 * k * vibrato * t) for k in range(1, 6))
+    return bass + chord
+
+def noise_bursts(t, sr, rng):
+    """
+    Short decaying white-noise bursts (hi-hat / snare-like) twice per second
+    """
+    out = np.zeros_like(t)
+    envelope = np.exp(-np.arange(int(0.08 * sr)) / (0.015 * sr))
+    for start in range(int(0.25 * sr), len(t) - len(envelope), sr // 2):
+        out[start:start + len(envelope)] += 0.5 * envelope * rng.standard_normal(len(envelope))
+    return out
+
+def clicks(t, sr):
+    """
+    Kick-like click track at 120 BPM
+    """
+    impulses = np.zeros_like(t)
+    impulses[::sr // 2] = 1.0
+    n = np.arange(int(0.1 * sr))
+    kick = np.sin(2 * np.pi * 60 * n / sr) * np.exp(-n / (0.02 * sr))
+    return np.convolve(impulses, kick)[:len(t)]
+
+def make_signal(kind, seconds, sr=44100, seed=1234):
+    """
+    Stereo (samples, 2) float32 signal of the given kind, peak-normalized to 0.9
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+
+    if kind == 'tones':
+        y = tones(t)
+    elif kind == 'noise_bursts':
+        y = noise_bursts(t, sr, rng)
+    elif kind == 'clicks':
+        y = clicks(t, sr)
+    elif kind == 'mix':
+        y = tones(t) + noise_bursts(t, sr, rng) + clicks(t, sr)
+    else:
+        raise ValueError(f"Unknown synthetic signal kind: {kind}")
+
+    y = 0.9 * y / (np.max(np.abs(y)) + 1e-12)
+    # Small inter-channel delay so stereo inputs are not identical
+    stereo = np.column_stack([y, np.roll(y, int(0.0005 * sr))])
+    return stereo.astype(np.float32)
+
+def write_signal(path, kind, seconds, sr=44100):
+    sf.write(path, make_signal(kind, seconds, sr), sr, subtype='PCM_16')
+    return path
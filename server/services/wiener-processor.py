@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import sys
+import os
+import logging
+import numpy as np
+from spectral_analysis import SpectralAnalysis
+from wiener_filter import log_band, stem_powers, wiener_filter
+from streaming import stream_separation
+from audio_io import load_audio, write_stems
+from stage_timer import stage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STEMS = ('vocals', 'bass', 'drums', 'other')
+
+def wiener_priors(freqs):
+    """
+    (stems, [harmonic, percussive], freq) band priors: how the harmonic and the
+    percussive power of every bin is shared out between the stems
+    """
+    harmonic = np.stack([
+        log_band(freqs, 150, 5000),                  # vocals: fundamentals and formants
+        1.5 * log_band(freqs, None, 200),            # bass: low harmonic content
+        np.full(len(freqs), 0.05),                   # drums: little sustained content
+        0.3 + 0.7 * log_band(freqs, 3000, None),     # other: everything else, bright instruments
+    ])
+    percussive = np.stack([
+        0.1 * log_band(freqs, 200, 5000),            # vocals: consonants
+        0.3 * log_band(freqs, None, 100),            # bass: plucks
+        log_band(freqs, 40, 12000),                  # drums
+        np.full(len(freqs), 0.1),                    # other
+    ])
+    return np.stack([harmonic, percussive], axis=1)
+
+def wiener_stems(y, sr, cache=None):
+    """
+    Soft-mask pipeline: mono (samples,) or stereo (2, samples) signal -> {track_name: signal}.
+    
+    Per-stem power spectra come from the HPSS harmonic/percussive powers split
+    by smooth band priors; the stems are then a (multichannel, for stereo)
+    Wiener filter of the mixture, all computed together, so they sum back to
+    the input instead of each being an independently rescaled band.
+    """
+    logger.info("Estimating stem powers from harmonic-percussive separation...")
+    
+    # margin 1.0: the harmonic and percussive parts share out the whole mixture
+    analysis = SpectralAnalysis(y, sr, n_fft=2048, hop_length=512, cache=cache)
+    
+    with stage('mask'):
+        components = np.stack([analysis.harmonic, analysis.percussive])
+        components **= 2
+        if components.ndim == 4:
+            # Stereo: stem powers are shared by both channels
+            components = components.mean(axis=1)
+        powers = stem_powers(wiener_priors(analysis.freqs), components)
+        del components
+        
+        logger.info("Applying Wiener filter to all stems...")
+        spectra = wiener_filter(analysis.stft, powers)
+        del powers
+    
+    # One batched inverse STFT for every stem (and channel)
+    signals = analysis.istft(spectra)
+    return dict(zip(STEMS, signals))
+
+def wiener_separation(input_path, output_dir, streaming=False, channels='mono', native_rate=False,
+                      output_format='wav', cache=None):
+    """
+    Wiener soft-mask separation: better quality per CPU-second than the band masks of
+    the other spectral processors, far cheaper than Demucs.
+    With streaming=True the whole track is processed in blocks instead of the first 60s.
+    channels is 'mono', 'stereo' or 'mid_side'; stereo already gets a multichannel
+    filter with its own spatial model, so 'mid_side' is processed as 'stereo'.
+    With native_rate=True the input is processed at its own sample rate (no resampling).
+    output_format is 'wav' or 'flac' (see audio_io.OUTPUT_FORMATS).
+    Stems keep their level (no normalization), so they still add up to the input.
+    cache is the job's spectral_cache.SpectralCache, if it has one.
+    """
+    try:
+        target_sr = None if native_rate else 22050
+        if streaming:
+            stream_separation(input_path, output_dir, cache.streamed(wiener_stems) if cache else wiener_stems,
+                              sr=target_sr, headroom=None, channels=channels, output_format=output_format)
+            logger.info("Wiener separation completed successfully!")
+            return True
+        
+        logger.info(f"Loading audio file: {input_path}")
+        
+        # Folded to mono unless processing in stereo
+        y, sr = load_audio(input_path, sr=target_sr, mono=(channels == 'mono'), duration=60.0)
+        logger.info(f"Loaded: {y.shape[-1]/sr:.1f}s at {sr}Hz")
+        
+        tracks = wiener_stems(y, sr, cache=cache)
+        
+        logger.info("Saving tracks...")
+        write_stems(tracks, output_dir, sr, output_format=output_format)
+        
+        logger.info("Wiener separation completed successfully!")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error during Wiener separation: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def main():
+    flags = sys.argv[1:]
+    streaming = '--stream' in flags
+    channels = 'mid_side' if '--mid-side' in flags else 'stereo' if '--stereo' in flags else 'mono'
+    native_rate = '--native-rate' in flags
+    output_format = 'flac' if '--flac' in flags else 'wav'
+    args = [arg for arg in flags if arg not in ('--stream', '--stereo', '--mid-side', '--native-rate', '--flac')]
+    if len(args) != 2:
+        logger.error("Usage: python wiener-processor.py <input_file> <output_directory> [--stream] [--stereo | --mid-side] [--native-rate] [--flac]")
+        sys.exit(1)
+    
+    input_path = args[0]
+    output_dir = args[1]
+    
+    if not os.path.exists(input_path):
+        logger.error(f"Input file does not exist: {input_path}")
+        sys.exit(1)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    success = wiener_separation(input_path, output_dir, streaming=streaming, channels=channels,
+                                native_rate=native_rate, output_format=output_format)
+    
+    if success:
+        logger.info("Wiener audio separation completed successfully!")
+        sys.exit(0)
+    else:
+        logger.error("Wiener audio separation failed!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Relative diagonal loading of the 2x2 mixture covariances before inversion
+COVARIANCE_LOADING = 1e-3
+
+def log_band(freqs, low_hz=None, high_hz=None, width_octaves=0.5):
+    """
+    Smooth band prior: logistic roll-offs around low_hz / high_hz on a log-frequency
+    axis (None leaves that side open), instead of a hard 0/1 band
+    """
+    octaves = np.log2(np.maximum(freqs, 1.0))
+    prior = np.ones(len(freqs))
+    if low_hz is not None:
+        prior /= 1 + np.exp(-(octaves - np.log2(low_hz)) / (width_octaves / 4))
+    if high_hz is not None:
+        prior /= 1 + np.exp((octaves - np.log2(high_hz)) / (width_octaves / 4))
+    return prior
+
+def stem_powers(priors, components):
+    """
+    Per-stem power estimates as one batched product.
+
+    priors is (stems, components, freq): how much of each component's power
+    (e.g. harmonic, percussive) every stem takes at every bin, normalised so
+    each component is fully shared out. components is (components, freq, frames).
+    Returns (stems, freq, frames) float32.
+    """
+    priors = priors / (priors.sum(axis=0, keepdims=True) + 1e-12)
+    return np.einsum('jcf,cft->jft', priors.astype(np.float32), components, optimize=True)
+
+def soft_masks(powers, eps=1e-10):
+    """
+    Ratio (single-channel Wiener) masks for all stems at once: v_j / sum_k v_k.
+    eps is shared out equally so the masks sum to exactly 1 in silent bins too.
+    """
+    total = powers.sum(axis=0)
+    total += eps
+    return (powers + eps / len(powers)) / total
+
+def wiener_filter(stft, powers, eps=1e-10):
+    """
+    Stem spectra from a mixture STFT and (stems, freq, frames) power estimates.
+
+    Mono (freq, frames) mixtures get soft masks. Stereo (2, freq, frames)
+    mixtures get a multichannel Wiener filter: a 2x2 spatial covariance R_j(f)
+    per stem is estimated from its soft-masked image, and each stem is
+    v_j R_j (sum_k v_k R_k)^-1 x, with every bin of every stem computed in
+    batched einsum / inverse calls. What the regularised inverse leaves over is
+    shared out by the soft masks, so the stems always sum back to the mix.
+    Returns complex64 (stems,) + stft.shape.
+    """
+    masks = soft_masks(powers, eps)
+    if stft.ndim == 2:
+        return (masks * stft).astype(np.complex64)
+
+    channels = stft.shape[0]
+    images = masks[:, None] * stft[None]
+    # R_j(f) = sum_t s_j s_j^H / sum_t v_j: (stems, freq, channels, channels)
+    covariance = np.einsum('jaft,jbft->jfab', images, images.conj(), optimize=True)
+    covariance /= powers.sum(axis=-1)[..., None, None] + eps
+    del images
+
+    # Mixture model C_x(f, t) = sum_j v_j(f, t) R_j(f), diagonally loaded
+    mixture = np.einsum('jft,jfab->ftab', powers, covariance, optimize=True)
+    trace = np.einsum('ftaa->ft', mixture).real
+    loading = (COVARIANCE_LOADING * trace / channels + eps)[..., None, None] * np.eye(channels, dtype=np.float32)
+    mixture += loading
+    # C_x^-1 x once, then each stem is v_j R_j (C_x^-1 x)
+    whitened = np.einsum('ftab,bft->aft', np.linalg.inv(mixture), stft, optimize=True)
+    del mixture, loading
+    stems = np.einsum('jfab,bft->jaft', covariance, whitened, optimize=True)
+    stems *= powers[:, None]
+
+    residual = stft - stems.sum(axis=0)
+    stems += masks[:, None] * residual[None]
+    return stems.astype(np.complex64)
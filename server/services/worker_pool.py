@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from stage_timer import set_context, set_sink
+from job_scheduler import JobScheduler
+from processor_calibration import predict
+from streaming import STREAMING_THRESHOLD_SECONDS
+from scratch import scratch_dir_from_env
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of pool workers
+_worker_state = {}
+
+# Expected peak memory (MB) per processor without a calibrated cost model,
+# the free memory select_processor()'s fixed thresholds ask for
+DEFAULT_FOOTPRINT_MB = {'demucs': 4096, 'wiener': 3072, 'advanced': 2048, 'fast': 1024, 'simple': 512}
+
+_ai_processor = None
+
+def _selection_module():
+    """
+    ai-processor loaded in the scheduling process, for admission planning
+    """
+    global _ai_processor
+    if _ai_processor is None:
+        from processor_modules import load_processor_module
+        _ai_processor = load_processor_module('ai-processor.py')
+    return _ai_processor
+
+def expected_footprint_mb(processor_type, duration, cost_model=None):
+    """
+    Memory to reserve for a job: the calibrated peak prediction when there is one
+    """
+    if cost_model and processor_type in cost_model['processors']:
+        streamed = (processor_type in _selection_module().STREAMING_PROCESSORS
+                    and duration > STREAMING_THRESHOLD_SECONDS)
+        return predict(cost_model, processor_type, duration, streaming_seconds=31.0 if streamed else None)[1]
+    if processor_type == 'advanced' and scratch_dir_from_env():
+        # Memmap-backed spectrograms: select_processor() asks for 1GB instead of 2GB
+        return 1024
+    return DEFAULT_FOOTPRINT_MB.get(processor_type, DEFAULT_FOOTPRINT_MB['simple'])
+
+def plan_job(job, free_mb):
+    """
+    (processor_type, reservation_mb) for a job, selected as if only free_mb were available
+    """
+    ai_processor = _selection_module()
+    audio_info = ai_processor.analyze_audio_file(job.get('input'))
+    if audio_info:
+        audio_info['memory_gb'] = max(free_mb, 0) / 1024
+    memory_limit_mb = max(free_mb, 0)
+    if job.get('memory_limit_mb') is not None:
+        memory_limit_mb = min(memory_limit_mb, float(job['memory_limit_mb']))
+    processor_type = ai_processor.resolve_processor(
+        ai_processor.select_processor(audio_info, job.get('latency_budget'), memory_limit_mb))
+    duration = audio_info['duration_seconds'] if audio_info else 0.0
+    return processor_type, expected_footprint_mb(processor_type, duration, ai_processor.load_cost_model())
+
+def _init_worker(preload):
+    """
+    Pool initializer: import heavy modules once per worker process
+    """
+    start_time = time.time()
+    from processor_modules import load_processor_module
+    ai_processor = load_processor_module('ai-processor.py')
+    _worker_state['loaded'] = ai_processor.warm_up(preload)
+    _worker_state['ai_separation'] = ai_processor.ai_separation
+    _worker_state['ai_processor'] = ai_processor
+    _worker_state['warmup_seconds'] = round(time.time() - start_time, 3)
+    _worker_state['jobs'] = 0
+    # stdout belongs to the job protocol; stage timings are returned with each job instead
+    set_sink(lambda event: None)
+
+def _worker_info():
+    """
+    Report warm-up information for the current worker process
+    """
+    return {
+        'pid': os.getpid(),
+        'warmup_seconds': _worker_state.get('warmup_seconds'),
+        'loaded': _worker_state.get('loaded', []),
+    }
+
+def _run_preview(job_id, input_path, output_dir, submitted_at):
+    """
+    Progressive jobs: write the preview stems (see ai-processor's preview_separation())
+    """
+    set_context(job=job_id)
+    if not os.path.exists(input_path):
+        return {'success': False, 'error': f"Input file does not exist: {input_path}"}
+
+    ai_processor = _worker_state['ai_processor']
+    success = ai_processor.preview_separation(input_path, output_dir)
+    return {
+        'success': success,
+        'path': ai_processor.preview_dir(output_dir),
+        'processor': ai_processor.PREVIEW_PROCESSOR,
+        'time_to_first_audio_seconds': round(time.time() - submitted_at, 3),
+    }
+
+def _run_job(job_id, input_path, output_dir, submitted_at, latency_budget=None, memory_limit_mb=None,
+             channels=None, processor_type=None, progressive=False):
+    """
+    Execute one separation job inside a warm worker process
+    (after its preview, for progressive jobs: the full result replaces the preview)
+    """
+    started_at = time.time()
+    metrics = {}
+    set_context(job=job_id)
+
+    if not os.path.exists(input_path):
+        return {'success': False, 'error': f"Input file does not exist: {input_path}"}
+
+    os.makedirs(output_dir, exist_ok=True)
+    success = _worker_state['ai_separation'](input_path, output_dir, metrics=metrics,
+                                             latency_budget=latency_budget,
+                                             memory_limit_mb=memory_limit_mb,
+                                             channels=channels,
+                                             processor_type=processor_type)
+    _worker_state['jobs'] += 1
+    if success and progressive:
+        _worker_state['ai_processor'].discard_preview(output_dir)
+
+    finished_at = time.time()
+    return {
+        'success': bool(success),
+        'processor': metrics.get('processor'),
+        'cache_hit': metrics.get('cache_hit', False),
+        'output_format': metrics.get('output_format'),
+        'spectral_cache': metrics.get('spectral_cache'),
+        'worker_pid': os.getpid(),
+        'worker_jobs': _worker_state['jobs'],
+        'timings': {
+            'queued_seconds': round(started_at - submitted_at, 3),
+            'analysis_seconds': metrics.get('analysis_seconds'),
+            'processing_seconds': metrics.get('processing_seconds'),
+            'total_seconds': round(finished_at - submitted_at, 3),
+            # Import/warm-up cost this job did not have to pay
+            'saved_startup_seconds': _worker_state.get('warmup_seconds'),
+        },
+        'stages': metrics.get('stages'),
+    }
+
+class SeparationWorker:
+    """
+    Pool of warm separation processes shared by all connected clients.
+    Jobs go through a JobScheduler: at most pool_size run at once, and each is
+    admitted with a processor and memory reservation planned by plan_job().
+    """
+    def __init__(self, pool_size=1, preload=('wiener', 'advanced', 'fast', 'simple'), memory_mb=None,
+                 max_queue=None):
+        self.pool_size = pool_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=pool_size,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(tuple(preload),),
+        )
+        self.scheduler = JobScheduler(plan_job, self._launch, workers=pool_size, memory_mb=memory_mb,
+                                      max_queue=max_queue)
+
+    def start(self):
+        """
+        Spawn and warm every worker, returning their warm-up reports
+        """
+        start_time = time.time()
+        futures = [self.executor.submit(_worker_info) for _ in range(self.pool_size)]
+        workers = [future.result() for future in futures]
+        return {
+            'event': 'ready',
+            'workers': self.pool_size,
+            'startup_seconds': round(time.time() - start_time, 3),
+            'worker_info': workers,
+        }
+
+    def submit(self, job, reply):
+        """
+        Queue a job dict ({"id", "input", "output"}, optionally "latency_budget" seconds,
+        "memory_limit_mb", "channels", "priority" (higher first) and "progressive");
+        reply(response_dict) gets a queued notice (or a rejection when the queue is full),
+        a started notice when it is admitted, a preview notice for progressive jobs,
+        then the result
+        """
+        job_id = job.get('id')
+        input_path = job.get('input')
+        output_dir = job.get('output')
+
+        if not input_path or not output_dir:
+            reply({'id': job_id, 'success': False, 'error': "Job requires 'input' and 'output'"})
+            return
+
+        self.scheduler.submit(dict(job, submitted_at=time.time()), reply)
+
+    def _launch(self, job, reply, processor_type, admission, done):
+        """
+        Scheduler callback: run an admitted job on the pool, preview first if progressive
+        """
+        job_id = job.get('id')
+        progressive = bool(job.get('progressive'))
+        preview = {}
+
+        def on_done(finished):
+            try:
+                response = finished.result()
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed: {e}")
+                response = {'success': False, 'error': str(e)}
+            response['id'] = job_id
+            response['scheduler'] = admission
+            if preview.get('success') and 'timings' in response:
+                response['timings']['time_to_first_audio_seconds'] = preview['time_to_first_audio_seconds']
+            try:
+                reply(response)
+            finally:
+                # Only once answered, so shutdown() never returns before the last reply
+                done()
+
+        def run_full():
+            future = self.executor.submit(_run_job, job_id, job['input'], job['output'], job['submitted_at'],
+                                          job.get('latency_budget'), job.get('memory_limit_mb'),
+                                          job.get('channels'), processor_type, progressive)
+            future.add_done_callback(on_done)
+
+        def on_preview(finished):
+            try:
+                preview.update(finished.result())
+            except Exception as e:
+                logger.error(f"Preview of job {job_id} crashed: {e}")
+            if preview.get('success'):
+                reply(dict(preview, id=job_id, event='preview'))
+            try:
+                run_full()
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be started: {e}")
+                try:
+                    reply({'id': job_id, 'success': False, 'error': str(e), 'scheduler': admission})
+                finally:
+                    done()
+
+        # The job leaves the queue: clients time it from here, not from submission
+        reply({'id': job_id, 'event': 'started', 'processor': processor_type})
+        if progressive:
+            self.executor.submit(_run_preview, job_id, job['input'], job['output'],
+                                 job['submitted_at']).add_done_callback(on_preview)
+        else:
+            run_full()
+
+    def stats(self):
+        """
+        Scheduler metrics: queue depth, running jobs, reservations and wait times
+        """
+        return dict(self.scheduler.stats(), event='stats')
+
+    def shutdown(self):
+        """
+        Wait until every queued and running job has been answered, then stop the workers
+        """
+        self.scheduler.wait_idle()
+        self.executor.shutdown(wait=True)